@@ -26,6 +26,7 @@
     'depends': [
         'stock',
         'web',
+        'bus',
         'purchase',
         'sale',
         'stock_lot_dimensions',
@@ -40,6 +41,10 @@
         'views/formato_lot_create_wizard_views.xml',
         'views/stock_quant_formato_adjust_views.xml',
         'data/menu_policy.xml',
+        'data/exit_ledger.xml',
+        'data/formato_lot_job.xml',
+        'views/som_iv_slow_query_views.xml',
+        'views/som_iv_rpc_profile_views.xml',
     ],
     'assets': {
         'web.assets_backend': [
@@ -68,6 +73,11 @@
 
             # JS — utilidades primero (las importan los componentes)
             'inventory_visual_enhanced/static/src/utils/som_date.js',
+            'inventory_visual_enhanced/static/src/utils/photo_pipeline.js',
+            'inventory_visual_enhanced/static/src/utils/permission_profile.js',
+            'inventory_visual_enhanced/static/src/utils/offline_snapshot.js',
+            'inventory_visual_enhanced/static/src/utils/export_results.js',
+            'inventory_visual_enhanced/static/src/utils/typeahead_recent.js',
 
             'inventory_visual_enhanced/static/src/components/search_bar/search_bar.js',
             'inventory_visual_enhanced/static/src/components/product_details/product_details.js',
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Rutas HTTP del Inventario Visual.
+
+Solo lo que NO cabe bien en JSON-RPC: la subida de fotos viaja como
+binario (multipart). Por orm.call la foto comprimida se inflaba a base64
+dentro del JSON (~33 % más bytes) y el servidor tenía que parsear megas de
+texto antes de guardarla. Igual la exportación: un archivo, no un JSON.
+"""
+import base64
+import csv
+import io
+import json
+import logging
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
+from odoo import fields, http
+from odoo.http import content_disposition, request
+from odoo.tools.misc import xlsxwriter
+
+from odoo.addons.inventory_visual_enhanced.models.stock_quant_export import (
+    IV_EXPORT_COLUMNS,
+)
+
+_logger = logging.getLogger(__name__)
+
+# Tope defensivo: el worker ya entrega ~200 KB; nada legítimo de la galería
+# se acerca a esto.
+MAX_PHOTO_BYTES = 15 * 1024 * 1024
+
+
+def _read_photo(photo):
+    """Bytes de un archivo subido, o (None, error) si no sirve."""
+    mimetype = (getattr(photo, 'mimetype', '') or '').lower()
+    if mimetype and not mimetype.startswith('image/'):
+        return None, 'El archivo no es una imagen'
+    data = photo.read()
+    if not data:
+        return None, 'La foto llegó vacía'
+    if len(data) > MAX_PHOTO_BYTES:
+        return None, 'La foto excede el tamaño permitido'
+    return data, ''
+
+
+def _write_csv(fileobj, headers, rows):
+    # utf-8-sig: Excel abre el CSV con acentos correctos.
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(row)
+    text.flush()
+    # Suelta el archivo sin cerrarlo: lo sirve la respuesta.
+    text.detach()
+
+
+def _write_xlsx(fileobj, headers, rows):
+    # constant_memory: cada fila se baja a disco al escribir la siguiente.
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True})
+    sheet = workbook.add_worksheet('Inventario')
+    bold = workbook.add_format({'bold': True})
+    sheet.write_row(0, 0, headers, bold)
+    for row_idx, row in enumerate(rows, start=1):
+        sheet.write_row(row_idx, 0, row)
+    workbook.close()
+
+
+class InventoryVisualController(http.Controller):
+
+    @http.route('/inventory_visual_enhanced/export', type='http',
+                auth='user', methods=['POST'], csrf=True)
+    def export_inventory(self, mode='inventory', file_format='csv',
+                         filters='{}', **kwargs):
+        """Exporta lo que muestra la vista con los filtros dados. Las filas
+        se escriben al archivo temporal conforme se resuelven (ver
+        stock_quant_export.py) y el archivo se sirve por partes: nunca está
+        completo en memoria."""
+        if mode not in IV_EXPORT_COLUMNS:
+            mode = 'inventory'
+        file_format = 'xlsx' if file_format == 'xlsx' else 'csv'
+        try:
+            filters = json.loads(filters or '{}')
+        except ValueError:
+            filters = {}
+        if not isinstance(filters, dict):
+            filters = {}
+
+        headers = [label for _key, label in IV_EXPORT_COLUMNS[mode]]
+        rows = request.env['stock.quant']._iv_export_rows(mode, filters)
+
+        fileobj = tempfile.TemporaryFile()
+        if file_format == 'xlsx':
+            _write_xlsx(fileobj, headers, rows)
+            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        else:
+            _write_csv(fileobj, headers, rows)
+            mimetype = 'text/csv; charset=utf-8'
+        size = fileobj.tell()
+        fileobj.seek(0)
+
+        filename = '%s_%s.%s' % (
+            'walkthrough' if mode == 'walkthrough' else 'inventario',
+            fields.Date.context_today(request.env.user).isoformat(),
+            file_format,
+        )
+        response = request.make_response(
+            wrap_file(request.httprequest.environ, fileobj),
+            headers=[
+                ('Content-Type', mimetype),
+                ('Content-Length', str(size)),
+                ('Content-Disposition', content_disposition(filename)),
+            ],
+        )
+        response.direct_passthrough = True
+        return response
+
+    @http.route('/inventory_visual_enhanced/lot_photo/upload', type='http',
+                auth='user', methods=['POST'], csrf=True)
+    def upload_lot_photo(self, quant_id=None, name='', sequence=10, notas='',
+                         photo=None, **kwargs):
+        if not photo or not quant_id:
+            return request.make_json_response(
+                {'success': False, 'error': 'Falta la foto o el lote'})
+
+        data, error = _read_photo(photo)
+        if error:
+            return request.make_json_response({'success': False, 'error': error})
+
+        try:
+            quant_id = int(quant_id)
+            sequence = int(sequence or 10)
+        except (TypeError, ValueError):
+            return request.make_json_response(
+                {'success': False, 'error': 'Parámetros inválidos'})
+
+        photo_name = name or photo.filename or 'Foto'
+        result = request.env['stock.quant']._iv_store_lot_photo(
+            quant_id,
+            photo_name,
+            base64.b64encode(data),
+            sequence=sequence,
+            notas=notas or '',
+        )
+        return request.make_json_response(result)
+
+    @http.route('/inventory_visual_enhanced/lot_photo/upload_batch', type='http',
+                auth='user', methods=['POST'], csrf=True)
+    def upload_lot_photos_batch(self, manifest='[]', **kwargs):
+        """Subida masiva: 'manifest' (JSON) trae una entrada por archivo de
+        'photos', en el mismo orden: {key, quant_id, name, sequence, notas}.
+        Responde el resumen por foto de stock.quant._iv_store_lot_photos."""
+        try:
+            entries = json.loads(manifest or '[]')
+        except ValueError:
+            entries = None
+        files = request.httprequest.files.getlist('photos')
+        if not isinstance(entries, list) or len(entries) != len(files):
+            return request.make_json_response(
+                {'error': 'El manifiesto no coincide con los archivos enviados'},
+                status=400)
+
+        Quant = request.env['stock.quant']
+        photos = []
+        rejected = {}
+        for idx, (entry, photo) in enumerate(zip(entries, files)):
+            entry = entry if isinstance(entry, dict) else {}
+            data, error = _read_photo(photo)
+            if error:
+                rejected[idx] = error
+                data = b''
+            photos.append({
+                'key': entry.get('key') or '',
+                'quant_id': entry.get('quant_id'),
+                'name': entry.get('name') or photo.filename or 'Foto',
+                'data': base64.b64encode(data) if data else False,
+                'sequence': entry.get('sequence') or 10,
+                'notas': entry.get('notas') or '',
+            })
+
+        summary = Quant._iv_store_lot_photos(photos)
+        # Los rechazos de transporte (tipo/tamaño) pesan más que el genérico
+        # "llegó vacía" que deja el modelo para esas entradas.
+        for idx, error in rejected.items():
+            if not summary['results'][idx]['success']:
+                summary['results'][idx]['error'] = error
+        return request.make_json_response(summary)
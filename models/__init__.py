@@ -1,8 +1,22 @@
 # -*- coding: utf-8 -*-
 from . import som_date_format
+from . import som_lot_exit
+from . import som_formato_lot_job
+from . import som_block_key
+from . import som_iv_slow_query
+from . import som_iv_rpc_profile
 from . import stock_quant
 from . import stock_quant_transit_visibility
+from . import stock_quant_lot_history
+from . import stock_quant_block_report
 from . import stock_quant_sale_order_popup
 from . import stock_quant_packing_list
 from . import stock_quant_walkthrough
+from . import stock_quant_live_updates
+from . import stock_quant_export
+from . import stock_quant_typeahead
+# Medición: override al FINAL para envolver la versión efectiva de cada endpoint.
+from . import stock_quant_perf
+from . import stock_lot_image
+from . import ir_http
 from . import ir_ui_menu_policy
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Perfil de permisos del Inventario Visual dentro de session_info.
+
+El cliente lo lee de la sesión al abrir el Inventario Visual o el
+Walkthrough, sin RPC. La sesión se arma en cada carga del cliente web, así
+que un cambio de grupos se refleja al recargar.
+"""
+from odoo import models
+
+
+class IrHttp(models.AbstractModel):
+    _inherit = 'ir.http'
+
+    def session_info(self):
+        result = super().session_info()
+        if self.env.user._is_internal():
+            result['iv_permission_profile'] = (
+                self.env['stock.quant'].get_permission_profile()
+            )
+        return result
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Llave NORMALIZADA de bloque: "  BL-0042 " → "bl-0042".
+
+El bloque vive en cuatro modelos con nombres distintos (stock.lot.x_bloque,
+stock.quant.x_bloque, supplier.shipment.packing.row.bloque y
+supplier.shipment.block.image.block_name) y se buscaba con =ilike / ilike
+o, para el ícono de foto, con un SELECT DISTINCT LOWER(TRIM(...)) sobre
+TODA la tabla de imágenes. Con la llave cada búsqueda de bloque es una
+igualdad sobre un índice btree:
+
+- stock.lot / stock.quant: campo almacenado e indexado x_iv_block_key.
+- packing rows / imágenes de bloque: son de stock_lot_packing_import, que
+  no es dependencia; no se les puede agregar campo. Se crea un índice
+  FUNCIONAL lower(btrim(columna)) en init() si la tabla existe (si ese
+  módulo se instala después, actualizar este) y se consulta con la misma
+  expresión.
+
+_IV_BLOCK_SOURCES es el registro compartido; _iv_block_record_ids resuelve
+llaves → ids en cualquiera de los cuatro.
+"""
+from odoo import api, fields, models
+from odoo.tools import sql
+
+
+def som_block_key(value):
+    """Misma normalización que lower(btrim(...)) en PostgreSQL."""
+    return (value or '').strip(' ').lower()
+
+
+# modelo: (campo almacenado con la llave, columna cruda para el índice funcional)
+_IV_BLOCK_SOURCES = {
+    'stock.lot': ('x_iv_block_key', None),
+    'stock.quant': ('x_iv_block_key', None),
+    'supplier.shipment.packing.row': (None, 'bloque'),
+    'supplier.shipment.block.image': (None, 'block_name'),
+}
+
+
+class StockLot(models.Model):
+    _inherit = 'stock.lot'
+
+    x_iv_block_key = fields.Char(
+        string='Llave de bloque', compute='_compute_x_iv_block_key',
+        store=True, index=True, readonly=True)
+
+    @api.depends('x_bloque')
+    def _compute_x_iv_block_key(self):
+        for lot in self:
+            lot.x_iv_block_key = som_block_key(lot.x_bloque) or False
+
+
+class StockQuant(models.Model):
+    _inherit = 'stock.quant'
+
+    x_iv_block_key = fields.Char(
+        string='Llave de bloque', related='lot_id.x_iv_block_key',
+        store=True, index=True)
+
+    def init(self):
+        super().init()
+        cr = self.env.cr
+        for model_name, (_field, column) in _IV_BLOCK_SOURCES.items():
+            if not column:
+                continue
+            table = model_name.replace('.', '_')
+            if sql.table_exists(cr, table):
+                sql.create_index(
+                    cr, '%s_iv_block_key_idx' % table, table,
+                    ['lower(btrim(%s))' % column])
+
+    @api.model
+    def _iv_block_record_ids(self, model_name, block_names):
+        """{llave: [ids]} de model_name para esos bloques (ids descendentes).
+        Sin el modelo instalado regresa las llaves vacías."""
+        keys = {som_block_key(name) for name in block_names}
+        keys.discard('')
+        result = {key: [] for key in keys}
+        if not keys or model_name not in self.env:
+            return result
+        Model = self.env[model_name].sudo().with_context(active_test=False)
+        field_name, column = _IV_BLOCK_SOURCES[model_name]
+        if field_name:
+            for record in Model.search([(field_name, 'in', list(keys))], order='id desc'):
+                result[record[field_name]].append(record.id)
+            return result
+        Model.flush_model([column])
+        self.env.cr.execute(
+            "SELECT id, lower(btrim(%s)) FROM %s WHERE lower(btrim(%s)) = ANY(%%s) ORDER BY id DESC"
+            % (column, Model._table, column),
+            (list(keys),),
+        )
+        for record_id, key in self.env.cr.fetchall():
+            result[key].append(record_id)
+        return result
+
+    @api.model
+    def _iv_mark_block_photos(self, details):
+        """block_has_photo en cada detalle (ícono amarillo del bloque)."""
+        images = self._iv_block_record_ids(
+            'supplier.shipment.block.image',
+            [d.get('bloque') for d in details],
+        )
+        for detail in details:
+            detail['block_has_photo'] = bool(
+                images.get(som_block_key(detail.get('bloque'))))
+        return details
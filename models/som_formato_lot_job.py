@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Corridas GRANDES del wizard "Crear lotes de formato", en segundo plano.
+
+El wizard creaba los lotes en un create pero luego, lote por lote, el
+quant y su action_apply_inventory(): un movimiento de ajuste y un
+_action_done por lote. Por eso el tope era de 500 y aun así se cortaba
+por tiempo.
+
+_iv_create_formato_lots es el camino ÚNICO (wizard y cola): lotes en un
+create, quants en un create y la cantidad se aplica con UNA llamada a
+action_apply_inventory() sobre todos los quants (un solo _action_done).
+
+Hasta _SYNC_MAX_LOTS el wizard lo hace en la misma petición. Arriba de
+eso crea un som.formato.lot.job y dispara el cron, que avanza en tandas
+de _JOB_BATCH: cada tanda se confirma (commit) junto con su avance, así
+que si el worker se cae la siguiente corrida sigue donde se quedó. Al
+terminar se avisa al usuario por el bus.
+"""
+import logging
+
+from odoo import api, fields, models, _
+
+_logger = logging.getLogger(__name__)
+
+_SYNC_MAX_LOTS = 200
+_JOB_BATCH = 250
+
+
+class SomFormatoLotJob(models.Model):
+    _name = 'som.formato.lot.job'
+    _description = 'Corrida de creación de lotes de formato'
+    _order = 'id desc'
+
+    name = fields.Char(string='Serie', required=True, readonly=True)
+    state = fields.Selection([
+        ('queued', 'En cola'),
+        ('running', 'En proceso'),
+        ('done', 'Terminada'),
+        ('failed', 'Con error'),
+    ], string='Estado', default='queued', required=True, readonly=True, index=True)
+    user_id = fields.Many2one(
+        'res.users', string='Solicitó', required=True, readonly=True,
+        default=lambda self: self.env.user)
+    company_id = fields.Many2one(
+        'res.company', string='Compañía', required=True, readonly=True,
+        default=lambda self: self.env.company)
+    product_id = fields.Many2one('product.product', string='Producto', required=True, readonly=True)
+    location_id = fields.Many2one('stock.location', string='Ubicación', required=True, readonly=True)
+    qty_per_lot = fields.Float(
+        string='Cantidad por lote', digits='Product Unit of Measure', readonly=True)
+    lot_names = fields.Json(string='Nombres de lote', readonly=True)
+    lot_values = fields.Json(string='Datos del lote', readonly=True)
+    total_count = fields.Integer(string='Lotes a crear', readonly=True)
+    done_count = fields.Integer(string='Lotes creados', readonly=True)
+    progress = fields.Float(string='Avance', compute='_compute_progress')
+    lot_ids = fields.Many2many('stock.lot', string='Lotes', readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+    date_done = fields.Datetime(string='Terminó', readonly=True)
+
+    @api.depends('done_count', 'total_count')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = (
+                100.0 * job.done_count / job.total_count if job.total_count else 0.0)
+
+    # ------------------------------------------------------------------
+    # Creación (compartida con el wizard)
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_create_formato_lots(self, product, location, qty_per_lot, names, lot_values):
+        """Crea los lotes `names` con sus quants en `location` y, si hay
+        cantidad, la aplica como UN ajuste de inventario para todos."""
+        lots = self.env['stock.lot'].create([
+            dict(lot_values, name=name, product_id=product.id,
+                 company_id=self.env.company.id)
+            for name in names
+        ])
+        Quant = self.env['stock.quant'].with_context(inventory_mode=True)
+        quants = Quant.create([{
+            'product_id': product.id,
+            'lot_id': lot.id,
+            'location_id': location.id,
+            'inventory_quantity': qty_per_lot or 0.0,
+        } for lot in lots])
+        if qty_per_lot > 0:
+            quants.action_apply_inventory()
+        return lots
+
+    # ------------------------------------------------------------------
+    # Cola
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_enqueue(self, product, location, qty_per_lot, names, lot_values):
+        job = self.create({
+            'name': names[0] if len(names) == 1 else '%s … %s' % (names[0], names[-1]),
+            'product_id': product.id,
+            'location_id': location.id,
+            'qty_per_lot': qty_per_lot,
+            'lot_names': names,
+            'lot_values': lot_values,
+            'total_count': len(names),
+        })
+        self.env.ref('inventory_visual_enhanced.ir_cron_formato_lot_jobs')._trigger()
+        return job
+
+    @api.model
+    def _cron_process_jobs(self):
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            job.with_user(job.user_id).with_company(job.company_id)._iv_run()
+
+    def _iv_commit_progress(self, processed, remaining):
+        """Confirma la tanda. False si al cron ya no le queda tiempo en
+        esta corrida."""
+        Cron = self.env['ir.cron']
+        if hasattr(Cron, '_commit_progress'):
+            return bool(Cron._commit_progress(processed, remaining=remaining))
+        self.env.cr.commit()
+        return True
+
+    def _iv_run(self):
+        self.ensure_one()
+        names = self.lot_names or []
+        self.state = 'running'
+        while self.done_count < len(names):
+            chunk = names[self.done_count:self.done_count + _JOB_BATCH]
+            try:
+                with self.env.cr.savepoint():
+                    lots = self._iv_create_formato_lots(
+                        self.product_id, self.location_id, self.qty_per_lot,
+                        chunk, self.lot_values or {})
+            except Exception as e:
+                _logger.exception("Lotes de formato %s: falló la tanda", self.name)
+                self.write({'state': 'failed', 'error': str(e)})
+                self._iv_notify_user()
+                self._iv_commit_progress(0, 0)
+                return
+            self.write({
+                'done_count': self.done_count + len(chunk),
+                'lot_ids': [fields.Command.link(lot.id) for lot in lots],
+            })
+            remaining = len(names) - self.done_count
+            if not self._iv_commit_progress(len(chunk), remaining) and remaining:
+                # Sin tiempo en esta corrida del cron: sigue en la siguiente.
+                self.env.ref('inventory_visual_enhanced.ir_cron_formato_lot_jobs')._trigger()
+                return
+            # Tandas de miles de lotes: fuera la caché entre tanda y tanda.
+            self.env.invalidate_all()
+        self.write({'state': 'done', 'date_done': fields.Datetime.now()})
+        self._iv_notify_user()
+        self._iv_commit_progress(0, 0)
+
+    def _iv_notify_user(self):
+        if self.state == 'done':
+            payload = {
+                'type': 'success',
+                'title': _('Lotes de formato creados'),
+                'message': _('%(name)s: %(count)s lotes listos.') % {
+                    'name': self.name, 'count': self.done_count},
+            }
+        else:
+            payload = {
+                'type': 'danger',
+                'sticky': True,
+                'title': _('Error al crear lotes de formato'),
+                'message': _('%(name)s: se crearon %(done)s de %(total)s. %(error)s') % {
+                    'name': self.name, 'done': self.done_count,
+                    'total': self.total_count, 'error': self.error or ''},
+            }
+        self.env['bus.bus'].sudo()._sendone(
+            self.user_id.partner_id, 'simple_notification', payload)
+
+    # ------------------------------------------------------------------
+    # Acciones
+    # ------------------------------------------------------------------
+
+    def action_open_lots(self):
+        """Ajustes de Formatos con SOLO los lotes de esta corrida."""
+        self.ensure_one()
+        action = self.env['ir.actions.act_window']._for_xml_id(
+            'inventory_visual_enhanced.action_formato_adjustments')
+        action['domain'] = [('lot_id', 'in', self.lot_ids.ids)]
+        action['context'] = {'inventory_mode': True}
+        return action
+
+    def action_retry(self):
+        """Reintenta una corrida con error desde la tanda que falló."""
+        self.filtered(lambda job: job.state == 'failed').write({
+            'state': 'queued', 'error': False})
+        self.env.ref('inventory_visual_enhanced.ir_cron_formato_lot_jobs')._trigger()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Perfiles por MUESTREO de las RPC del Inventario Visual.
+
+Cuando un vendedor reporta "la búsqueda tardó 20 segundos", get_iv_perf_stats
+dice cuánto tardó y cuántas consultas hizo, pero no DÓNDE se fue el tiempo.
+Aquí, para una fracción de las llamadas o para las que pasan un umbral,
+_iv_perf_call (stock_quant_perf.py) corre un hilo que cada
+_SAMPLE_INTERVAL toma la pila del hilo de la petición
+(sys._current_frames) y al terminar la guarda en formato "collapsed
+stacks" (una línea por pila: marcos separados por ';' y el número de
+muestras), el que leen flamegraph.pl, speedscope y similares.
+
+Parámetros del sistema (vacíos o 0 = apagado):
+- _RATE_PARAM:    fracción de llamadas a perfilar (0.01 = 1%).
+- _SLOW_MS_PARAM: guardar además toda llamada que tarde al menos estos
+                  milisegundos. OJO: para saberlo hay que muestrear TODAS
+                  las llamadas; el hilo cuesta poco (una pila cada
+                  _SAMPLE_INTERVAL) pero no es gratis.
+
+Cada perfil queda con el endpoint, la forma, los filtros y el usuario; el
+archivo .folded se descarga desde el formulario. Se borran solos a los
+_RETENTION_DAYS días (autovacuum).
+"""
+import base64
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+_RATE_PARAM = 'inventory_visual_enhanced.profile_rate'
+_SLOW_MS_PARAM = 'inventory_visual_enhanced.profile_slow_ms'
+_SAMPLE_INTERVAL = 0.005
+_RETENTION_DAYS = 30
+
+# Marco desde el que se cortan las pilas: lo de arriba (werkzeug, http,
+# call_kw) es igual en todas y solo estorba en la gráfica.
+_ROOT_FRAME = '_iv_perf_call'
+
+
+def _iv_frame_label(frame):
+    code = frame.f_code
+    path = '/'.join(code.co_filename.split(os.sep)[-3:])
+    return '%s (%s:%s)' % (code.co_name, path, code.co_firstlineno)
+
+
+def _iv_collapse(frame):
+    """Pila de `frame` como 'exterior;...;interior', cortada en _ROOT_FRAME."""
+    frames = []
+    while frame is not None:
+        if frame.f_code.co_name == _ROOT_FRAME:
+            break
+        frames.append(_iv_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class _IvStackSampler(threading.Thread):
+    """Toma la pila del hilo `target_ident` cada `interval` segundos."""
+
+    def __init__(self, target_ident, interval=_SAMPLE_INTERVAL):
+        super().__init__(name='iv-rpc-profiler', daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            if frame is not None:
+                self.stacks[_iv_collapse(frame) or _ROOT_FRAME] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def collapsed(self):
+        return ''.join(
+            '%s %d\n' % (stack, count)
+            for stack, count in self.stacks.most_common()
+        )
+
+
+class SomIvRpcProfile(models.Model):
+    _name = 'som.iv.rpc.profile'
+    _description = 'Perfil de llamada del Inventario Visual'
+    _order = 'create_date desc, id desc'
+    _rec_name = 'endpoint'
+
+    endpoint = fields.Char(string='Endpoint', required=True, readonly=True, index=True)
+    shape = fields.Char(string='Forma', readonly=True,
+                        help="Qué filtros traían valor (no sus valores), o el tamaño de la lista de ids.")
+    filters = fields.Text(string='Filtros', readonly=True)
+    user_id = fields.Many2one('res.users', string='Usuario', readonly=True)
+    trigger = fields.Selection([
+        ('rate', 'Muestra'),
+        ('slow', 'Lenta'),
+    ], string='Motivo', readonly=True)
+    duration_ms = fields.Float(string='Duración (ms)', readonly=True, digits=(16, 1))
+    sql_count = fields.Integer(string='Consultas', readonly=True)
+    sql_time_ms = fields.Float(string='Tiempo SQL (ms)', readonly=True, digits=(16, 1))
+    sample_count = fields.Integer(string='Muestras', readonly=True)
+    profile_file = fields.Binary(string='Perfil (collapsed stacks)', attachment=True, readonly=True)
+    profile_filename = fields.Char(string='Archivo', readonly=True)
+
+    # ------------------------------------------------------------------
+    # Captura
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_params(self):
+        """(fracción, umbral en segundos); 0 = apagado."""
+        Param = self.env['ir.config_parameter'].sudo()
+        values = []
+        for key, scale in ((_RATE_PARAM, 1.0), (_SLOW_MS_PARAM, 1000.0)):
+            try:
+                values.append(max(float(Param.get_param(key) or 0), 0.0) / scale)
+            except (TypeError, ValueError):
+                values.append(0.0)
+        return values[0], values[1]
+
+    @api.model
+    def _iv_start_sampler(self):
+        """(sampler, por_muestra) si esta llamada se perfila; (None, False)
+        si no."""
+        rate, slow = self._iv_params()
+        by_rate = bool(rate) and random.random() < rate
+        if not by_rate and not slow:
+            return None, False
+        sampler = _IvStackSampler(threading.get_ident())
+        sampler.start()
+        return sampler, by_rate
+
+    @api.model
+    def _iv_record(self, perf, args, kwargs, sampler, by_rate):
+        """Guarda el perfil de UNA llamada medida si tocaba por muestra o
+        si pasó el umbral de lentitud."""
+        _rate, slow = self._iv_params()
+        if by_rate:
+            trigger = 'rate'
+        elif slow and perf['total_time'] >= slow:
+            trigger = 'slow'
+        else:
+            return self.browse()
+
+        collapsed = sampler.collapsed()
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        vals = {
+            'endpoint': perf['endpoint'],
+            'shape': perf['shape'],
+            'filters': json.dumps(
+                {'args': list(args), 'kwargs': kwargs},
+                default=str, ensure_ascii=False, indent=2),
+            'user_id': self.env.uid,
+            'trigger': trigger,
+            'duration_ms': perf['total_time'] * 1000.0,
+            'sql_count': perf['sql_count'],
+            'sql_time_ms': perf['sql_time'] * 1000.0,
+            'sample_count': sampler.samples,
+            'profile_file': base64.b64encode(collapsed.encode()),
+            'profile_filename': 'iv_%s_%s.folded' % (perf['endpoint'], stamp),
+        }
+        try:
+            with self.env.cr.savepoint():
+                return self.sudo().create(vals)
+        except Exception:
+            # Igual que en som.iv.slow.query: la petición del usuario no
+            # falla por no poder guardar su perfil.
+            _logger.warning("[IV PROFILE] No se pudo guardar el perfil de %s",
+                            perf['endpoint'], exc_info=True)
+            return self.browse()
+
+    @api.autovacuum
+    def _gc_rpc_profiles(self):
+        limit = fields.Datetime.now() - timedelta(days=_RETENTION_DAYS)
+        self.sudo().search([('create_date', '<', limit)]).unlink()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Consultas LENTAS de los endpoints del Inventario Visual, con su plan.
+
+Opt-in por parámetro del sistema _THRESHOLD_PARAM (milisegundos; vacío o
+0 = apagado). Encendido, _iv_perf_call (stock_quant_perf.py) cuelga un
+hook de consultas en el hilo (thread.query_hooks, el mismo que usa el
+profiler de Odoo) mientras corre el endpoint medido. Cada consulta de su
+cursor que pasa el umbral se apunta; AL TERMINAR el endpoint se corre
+EXPLAIN (ANALYZE, BUFFERS) sobre ella y se guarda aquí con la forma y los
+filtros que la originaron. Así se ven qué combinaciones de la búsqueda
+agrupada (child_of, ilike sobre relacionados, cadenas de OR) dan planes
+malos y se ajustan índices con tráfico real.
+
+- Solo lecturas: ANALYZE vuelve a EJECUTAR la consulta, así que nunca se
+  explica una escritura ni un SELECT ... FOR UPDATE.
+- El EXPLAIN va en savepoint: si falla se guarda la consulta sin plan.
+- A lo más _MAX_PER_CALL consultas por llamada (las más lentas).
+- ANALYZE duplica el costo de esas consultas: encender para muestrear y
+  apagar.
+- Se borran solas a los _RETENTION_DAYS días (autovacuum).
+"""
+import json
+import logging
+import re
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+_THRESHOLD_PARAM = 'inventory_visual_enhanced.slow_query_ms'
+_MAX_PER_CALL = 5
+_RETENTION_DAYS = 30
+
+_READ_RE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+_WRITE_RE = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE)\b', re.IGNORECASE)
+
+
+class SomIvSlowQuery(models.Model):
+    _name = 'som.iv.slow.query'
+    _description = 'Consulta lenta del Inventario Visual'
+    _order = 'create_date desc, id desc'
+    _rec_name = 'endpoint'
+
+    endpoint = fields.Char(string='Endpoint', required=True, readonly=True, index=True)
+    shape = fields.Char(string='Forma', readonly=True,
+                        help="Qué filtros traían valor (no sus valores), o el tamaño de la lista de ids.")
+    filters = fields.Text(string='Filtros', readonly=True)
+    user_id = fields.Many2one('res.users', string='Usuario', readonly=True)
+    duration_ms = fields.Float(string='Consulta (ms)', readonly=True, digits=(16, 1))
+    call_duration_ms = fields.Float(string='Llamada (ms)', readonly=True, digits=(16, 1))
+    query = fields.Text(string='SQL', readonly=True)
+    plan = fields.Text(string='Plan (EXPLAIN ANALYZE)', readonly=True)
+    error = fields.Char(string='Sin plan', readonly=True)
+
+    # ------------------------------------------------------------------
+    # Captura
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_threshold(self):
+        """Umbral en SEGUNDOS; 0 = apagado."""
+        value = self.env['ir.config_parameter'].sudo().get_param(_THRESHOLD_PARAM)
+        try:
+            return max(float(value or 0), 0.0) / 1000.0
+        except (TypeError, ValueError):
+            return 0.0
+
+    @api.model
+    def _iv_explain(self, query, params):
+        """(plan, error): sin plan si la consulta no es una lectura o si el
+        EXPLAIN falla."""
+        if not _READ_RE.match(query) or _WRITE_RE.search(query):
+            return None, 'No es una lectura: no se re-ejecuta'
+        cr = self.env.cr
+        try:
+            with cr.savepoint():
+                cr.execute('EXPLAIN (ANALYZE, BUFFERS) ' + query, params)
+                return '\n'.join(row[0] for row in cr.fetchall()), False
+        except Exception as e:
+            return None, str(e)[:250]
+
+    @api.model
+    def _iv_record(self, perf, args, kwargs, captured):
+        """Guarda las consultas lentas de UNA llamada medida.
+
+        captured: [(delay, query, params)] apuntadas por el hook."""
+        captured = sorted(captured, key=lambda item: item[0], reverse=True)[:_MAX_PER_CALL]
+        payload = json.dumps(
+            {'args': list(args), 'kwargs': kwargs},
+            default=str, ensure_ascii=False, indent=2)
+        cr = self.env.cr
+        vals_list = []
+        for delay, query, params in captured:
+            try:
+                statement = cr.mogrify(query, params).decode(errors='replace')
+            except Exception:
+                statement = query
+            plan, error = self._iv_explain(query, params)
+            vals_list.append({
+                'endpoint': perf['endpoint'],
+                'shape': perf['shape'],
+                'filters': payload,
+                'user_id': self.env.uid,
+                'duration_ms': delay * 1000.0,
+                'call_duration_ms': perf['total_time'] * 1000.0,
+                'query': statement,
+                'plan': plan or False,
+                'error': error or False,
+            })
+        try:
+            with cr.savepoint():
+                return self.sudo().create(vals_list)
+        except Exception:
+            # Cursor de solo lectura o similar: la consulta del usuario no
+            # debe fallar por la bitácora.
+            _logger.warning("[IV SLOW] No se pudieron guardar %s consultas lentas de %s",
+                            len(vals_list), perf['endpoint'], exc_info=True)
+            return self.browse()
+
+    @api.autovacuum
+    def _gc_slow_queries(self):
+        limit = fields.Datetime.now() - timedelta(days=_RETENTION_DAYS)
+        self.sudo().search([('create_date', '<', limit)]).unlink()
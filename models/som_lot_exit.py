@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Bitácora de SALIDAS de lotes (fuente del Walkthrough).
+
+El Walkthrough buscaba en vivo TODOS los quants positivos en ubicaciones de
+cliente (es decir, todo el histórico de ventas, que solo crece) y después
+sumaba bajas y ajustes recorriendo movimientos done. El costo dependía de
+los años de historia, no del filtro.
+
+Aquí cada movimiento done que saca (o regresa) un lote queda asentado una
+sola vez, con fecha, documento, cliente y cantidad:
+
+- delivery:   internal/transit → customer (+). Devolución customer → stock (−).
+- scrap:      movimiento de stock.scrap hacia la ubicación de desecho (+).
+- adjustment: ajuste de inventario (sin scrap) stock → inventory (+) y
+              su regreso inventory → stock (−).
+
+Se alimenta desde stock.move._action_done y se rellena UNA vez con el
+histórico (_iv_backfill, marcado en ir.config_parameter). Las correcciones
+POSTERIORES a líneas done (cantidad, lote o ubicaciones editadas tras
+desbloquear, líneas agregadas a un movimiento ya hecho) rehacen el asiento
+de esas líneas (stock.move.line.create / write); si la línea se borra, su
+asiento cae por ondelete='cascade'. La suma por
+(lot_id, exit_location_id, exit_type) es la salida neta; el Walkthrough la
+lee con _read_group sobre columnas indexadas.
+"""
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+_STOCK_USAGES = ('internal', 'transit')
+_BACKFILL_PARAM = 'inventory_visual_enhanced.exit_ledger_backfilled'
+_BACKFILL_BATCH = 2000
+
+
+class SomLotExit(models.Model):
+    _name = 'som.lot.exit'
+    _description = 'Salida de lote (Walkthrough)'
+    _order = 'date desc, id desc'
+
+    move_line_id = fields.Many2one(
+        'stock.move.line', string='Línea de movimiento', required=True,
+        index=True, ondelete='cascade', readonly=True)
+    lot_id = fields.Many2one(
+        'stock.lot', string='Lote', required=True, index=True,
+        ondelete='cascade', readonly=True)
+    product_id = fields.Many2one(
+        'product.product', string='Producto', required=True, index=True,
+        readonly=True)
+    company_id = fields.Many2one('res.company', string='Compañía', readonly=True)
+    exit_type = fields.Selection([
+        ('delivery', 'Entrega'),
+        ('scrap', 'Baja'),
+        ('adjustment', 'Ajuste'),
+    ], string='Tipo de salida', required=True, index=True, readonly=True)
+    date = fields.Datetime(string='Fecha', required=True, index=True, readonly=True)
+    quantity = fields.Float(
+        string='Cantidad', digits='Product Unit of Measure', readonly=True,
+        help='Positiva al salir, negativa al regresar (devolución o ajuste '
+             'de entrada). La suma por lote y ubicación es la salida neta.')
+    exit_location_id = fields.Many2one(
+        'stock.location', string='Ubicación de salida', required=True,
+        index=True, readonly=True,
+        help='Ubicación de cliente o de desecho/ajuste donde quedó el material.')
+    picking_id = fields.Many2one('stock.picking', string='Transferencia', readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Cliente', readonly=True)
+    document = fields.Char(string='Documento', readonly=True)
+
+    _move_line_unique = models.Constraint(
+        'UNIQUE(move_line_id)',
+        'Cada línea de movimiento se asienta una sola vez.',
+    )
+
+    # ------------------------------------------------------------------
+    # Clasificación
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_classify(self, line):
+        """(exit_type, signo, ubicación de salida) o None si la línea no es
+        una salida del stock."""
+        src = line.location_id.usage
+        dest = line.location_dest_id.usage
+        move = line.move_id
+
+        if src in _STOCK_USAGES and dest == 'customer':
+            return 'delivery', 1.0, line.location_dest_id
+        if src == 'customer' and dest in _STOCK_USAGES:
+            return 'delivery', -1.0, line.location_id
+
+        if move.scrap_id:
+            if dest == 'inventory':
+                return 'scrap', 1.0, line.location_dest_id
+            return None
+
+        if 'is_inventory' in move._fields and not move.is_inventory:
+            return None
+        if src in _STOCK_USAGES and dest == 'inventory':
+            return 'adjustment', 1.0, line.location_dest_id
+        if src == 'inventory' and dest in _STOCK_USAGES:
+            return 'adjustment', -1.0, line.location_id
+        return None
+
+    @api.model
+    def _iv_vals_from_line(self, line):
+        classified = self._iv_classify(line)
+        if not classified:
+            return None
+        exit_type, sign, location = classified
+        picking = line.picking_id
+        document = (picking and picking.name) or line.reference or ''
+        origin = line.move_id.origin
+        if origin and not (picking and picking.partner_id):
+            document = '%s (%s)' % (document, origin) if document else origin
+        return {
+            'move_line_id': line.id,
+            'lot_id': line.lot_id.id,
+            'product_id': line.product_id.id,
+            'company_id': line.company_id.id,
+            'exit_type': exit_type,
+            'date': line.date or line.write_date,
+            'quantity': sign * (line.quantity or 0.0),
+            'exit_location_id': location.id,
+            'picking_id': picking.id,
+            'partner_id': picking.partner_id.id,
+            'document': document,
+        }
+
+    @api.model
+    def _iv_record_move_lines(self, lines):
+        """Asienta las líneas done con lote que sean salidas. Idempotente:
+        las ya asentadas se saltan."""
+        lines = lines.filtered(lambda l: l.state == 'done' and l.lot_id)
+        if not lines:
+            return self.browse()
+        existing = set(self.sudo().search([
+            ('move_line_id', 'in', lines.ids),
+        ]).mapped('move_line_id').ids)
+        vals_list = []
+        for line in lines:
+            if line.id in existing:
+                continue
+            vals = self._iv_vals_from_line(line)
+            if vals:
+                vals_list.append(vals)
+        return self.sudo().create(vals_list) if vals_list else self.browse()
+
+    @api.model
+    def _iv_rebuild_move_lines(self, lines):
+        """Rehace el asiento de líneas done ya corregidas: borra el que
+        tenían y vuelve a clasificarlas con sus valores actuales."""
+        if not lines:
+            return self.browse()
+        self.sudo().search([('move_line_id', 'in', lines.ids)]).unlink()
+        return self._iv_record_move_lines(lines)
+
+    # ------------------------------------------------------------------
+    # Relleno inicial
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_backfill(self):
+        """Rellena la bitácora con el histórico UNA sola vez. Corre desde
+        data/exit_ledger.xml en cada actualización, pero sale de inmediato
+        si ya se hizo."""
+        params = self.env['ir.config_parameter'].sudo()
+        if params.get_param(_BACKFILL_PARAM):
+            return
+        MoveLine = self.env['stock.move.line'].sudo().with_context(active_test=False)
+        line_ids = MoveLine.search([
+            ('state', '=', 'done'),
+            ('lot_id', '!=', False),
+            '|',
+            ('location_id.usage', 'in', ('customer', 'inventory')),
+            ('location_dest_id.usage', 'in', ('customer', 'inventory')),
+        ], order='id').ids
+        total = 0
+        for start in range(0, len(line_ids), _BACKFILL_BATCH):
+            batch = MoveLine.browse(line_ids[start:start + _BACKFILL_BATCH])
+            total += len(self._iv_record_move_lines(batch))
+            # Libera la caché del ORM entre lotes: el histórico puede ser
+            # de cientos de miles de líneas.
+            self.env.invalidate_all()
+        params.set_param(_BACKFILL_PARAM, fields.Datetime.now())
+        _logger.info("Bitácora de salidas: %s asientos rellenados", total)
+
+
+class StockMove(models.Model):
+    _inherit = 'stock.move'
+
+    def _action_done(self, cancel_backorder=False):
+        moves = super()._action_done(cancel_backorder=cancel_backorder)
+        self.env['som.lot.exit']._iv_record_move_lines(moves.move_line_ids)
+        return moves
+
+
+# Campos de stock.move.line que cambian el asiento de la bitácora.
+_LEDGER_LINE_FIELDS = {
+    'quantity', 'lot_id', 'product_id', 'location_id', 'location_dest_id',
+    'date', 'picking_id', 'move_id',
+}
+
+
+class StockMoveLine(models.Model):
+    _inherit = 'stock.move.line'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        # Líneas agregadas a un movimiento ya hecho (picking desbloqueado):
+        # nacen done y no pasan por _action_done.
+        done = lines.filtered(lambda l: l.state == 'done')
+        if done:
+            self.env['som.lot.exit']._iv_record_move_lines(done)
+        return lines
+
+    def write(self, vals):
+        if not _LEDGER_LINE_FIELDS.intersection(vals):
+            return super().write(vals)
+        was_done = self.filtered(lambda l: l.state == 'done')
+        res = super().write(vals)
+        # Antes done o done ahora: las dos versiones pueden cambiar (un lote
+        # corregido sale de un renglón y entra a otro).
+        lines = was_done | self.filtered(lambda l: l.state == 'done')
+        if lines:
+            self.env['som.lot.exit']._iv_rebuild_move_lines(lines)
+        return res
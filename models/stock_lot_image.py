@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields
+
+
+class StockLotImage(models.Model):
+    _inherit = 'stock.lot.image'
+
+    # Llave de subida que genera el cliente (galería): hace idempotente el
+    # reintento de una subida masiva tras una conexión caída.
+    x_iv_upload_key = fields.Char(
+        string='Llave de subida', index=True, copy=False, readonly=True)
@@ -1,11 +1,21 @@
 # -*- coding: utf-8 -*-
-from odoo import models, api, fields
+from odoo import models, api, fields, tools
 from odoo.exceptions import UserError
+from odoo.tools.image import image_process
 from odoo.addons.inventory_visual_enhanced.models.som_date_format import som_format_date
+from odoo.addons.inventory_visual_enhanced.models.som_block_key import som_block_key
+from datetime import datetime, timedelta
+import base64
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Fotos por envío en la subida masiva (el cliente parte en trozos menores).
+IV_PHOTO_BATCH_MAX = 50
+# Ventana en la que una llave de subida ya guardada se toma como reintento
+# (conexión caída) y no como una subida nueva.
+IV_PHOTO_RETRY_WINDOW = timedelta(hours=2)
+
 
 class StockQuant(models.Model):
     _inherit = 'stock.quant'
@@ -17,15 +27,43 @@ class StockQuant(models.Model):
             'name': self.env.user.name
         }
     
+    @api.model
+    def get_permission_profile(self):
+        """Perfil de permisos del usuario en UNA sola llamada.
+
+        Las vistas antes hacían dos RPC (ventas + inventario) antes de ser
+        usables. El perfil viaja además en session_info (ver ir_http.py),
+        así que normalmente el cliente ni siquiera llama a este método.
+        """
+        return dict(self._iv_permission_profile())
+
+    @api.model
+    @tools.ormcache('self.env.uid')
+    def _iv_permission_profile(self):
+        """Perfil cacheado por usuario. El caché del registro se limpia
+        cuando cambian los grupos de un usuario, así que no hay que
+        invalidarlo a mano."""
+        user = self.env.user
+        return {
+            'is_sales_user': bool(
+                user.has_group('sales_team.group_sale_salesman')
+                or user.has_group('sales_team.group_sale_salesman_all_leads')
+                or user.has_group('sales_team.group_sale_manager')
+            ),
+            'is_inventory_user': bool(user.has_group('stock.group_stock_user')),
+            'is_purchase_user': bool(
+                user.has_group('purchase.group_purchase_user')
+                or user.has_group('purchase.group_purchase_manager')
+            ),
+        }
+
     @api.model
     def check_sales_permissions(self):
-        return self.env.user.has_group('sales_team.group_sale_salesman') or \
-               self.env.user.has_group('sales_team.group_sale_salesman_all_leads') or \
-               self.env.user.has_group('sales_team.group_sale_manager')
+        return self._iv_permission_profile()['is_sales_user']
     
     @api.model
     def check_inventory_permissions(self):
-        return self.env.user.has_group('stock.group_stock_user')
+        return self._iv_permission_profile()['is_inventory_user']
 
     @api.model
     def _iv_get_workshop_lot_ids(self, lot_ids):
@@ -440,9 +478,7 @@ class StockQuant(models.Model):
         quants = self.browse(quant_ids)
         result = []
 
-        is_sales_user = self.env.user.has_group('sales_team.group_sale_salesman') or \
-                        self.env.user.has_group('sales_team.group_sale_salesman_all_leads') or \
-                        self.env.user.has_group('sales_team.group_sale_manager')
+        is_sales_user = self._iv_permission_profile()['is_sales_user']
 
         workshop_lot_ids = self._iv_get_workshop_lot_ids(
             [q.lot_id.id for q in quants if q.lot_id]
@@ -711,28 +747,9 @@ class StockQuant(models.Model):
 
             result.append(detail)
 
-        # Marca por bloque si tiene foto (para colorear el ícono amarillo).
-        # Matching NORMALIZADO en Python (strip + lower): el =ilike anterior
-        # fallaba con espacios al final o comodines (_ %) en el nombre y
-        # además leía los binarios. Un solo query ligero de todos los
-        # nombres de bloque con foto (la tabla es chica).
-        blocks_with_photo = set()
-        block_names = {(d.get('bloque') or '').strip().lower()
-                       for d in result}
-        block_names.discard('')
-        if block_names and 'supplier.shipment.block.image' in self.env:
-            self.env.cr.execute("""
-                SELECT DISTINCT LOWER(TRIM(block_name))
-                FROM supplier_shipment_block_image
-                WHERE COALESCE(block_name, '') != ''
-            """)
-            photo_names = {r[0] for r in self.env.cr.fetchall()}
-            blocks_with_photo = block_names & photo_names
-        for d in result:
-            d['block_has_photo'] = (
-                (d.get('bloque') or '').strip().lower() in blocks_with_photo)
-
-        return result
+        # Marca por bloque si tiene foto (para colorear el ícono amarillo):
+        # igualdad sobre la llave normalizada (som_block_key.py).
+        return self._iv_mark_block_photos(result)
 
     @api.model
     def get_workshop_info(self, quant_id=None):
@@ -826,328 +843,21 @@ class StockQuant(models.Model):
         }
 
     @api.model
-    def get_lot_history(self, quant_id):
-        # Historial disponible para ventas E inventario (el rol de almacén lo
-        # necesita para etiquetas/traslados aunque no pueda vender ni apartar).
-        if not (self.check_sales_permissions() or self.check_inventory_permissions()):
-            raise UserError("No tiene permisos para ver el historial detallado. Contacte al administrador.")
-        
-        quant = self.browse(quant_id)
-        if not quant.exists() or not quant.lot_id:
-            return {'error': 'Lote no encontrado'}
-        
-        lot = quant.lot_id
-        
-        has_purchase_permissions = self.env.user.has_group('purchase.group_purchase_user') or \
-                                   self.env.user.has_group('purchase.group_purchase_manager')
-        
-        general_info = {
-            'product_name': lot.product_id.display_name,
-            'product_code': lot.product_id.default_code or '',
-            'lot_name': lot.name,
-            'fecha_creacion': som_format_date(lot.create_date, empty=''),
-            'estado_actual': 'Disponible',
-            'ubicacion_actual': quant.location_id.complete_name,
-            'cantidad_actual': quant.quantity,
-            'cantidad_reservada': quant.reserved_quantity,
-            'cantidad_disponible': quant.quantity - quant.reserved_quantity,
-        }
-        
-        # Acotado a los 300 movimientos más recientes: el historial del diálogo
-        # no necesita la vida completa de un lote muy movido, y sin límite el
-        # popup podía cargar miles de líneas.
-        move_lines = self.env['stock.move.line'].search([
-            ('lot_id', '=', lot.id)
-        ], order='date desc', limit=300)
-        
-        from datetime import datetime
-        dias_inventario = 0
-        if lot.create_date:
-            dias_inventario = (datetime.now() - lot.create_date).days
-        
-        statistics = {
-            'total_movimientos': len(move_lines),
-            'total_entradas': len(move_lines.filtered(lambda m: m.location_dest_id.usage == 'internal')),
-            'total_salidas': len(move_lines.filtered(lambda m: m.location_id.usage == 'internal')),
-            'total_ventas': 0,
-            'total_apartados': 0,
-            'total_entregas': 0,
-            'dias_en_inventario': dias_inventario,
-        }
-        
-        general_logs = []
-        min_date = datetime.min
-        
-        # 1. COMPRAS
-        purchase_info = []
-        if has_purchase_permissions:
-            purchase_lines = self.env['purchase.order.line'].search([
-                ('product_id', '=', lot.product_id.id)
-            ], limit=5, order='create_date desc')
-            
-            for pol in purchase_lines:
-                purchase_info.append({
-                    'orden_compra': pol.order_id.name,
-                    'proveedor': pol.order_id.partner_id.name,
-                    'fecha_orden': som_format_date(pol.order_id.date_order, empty=''),
-                    'cantidad': pol.product_qty,
-                    'precio_unitario': pol.price_unit,
-                    'total': pol.price_subtotal,
-                    'moneda': pol.order_id.currency_id.symbol,
-                    'estado': dict(pol.order_id._fields['state'].selection).get(pol.order_id.state, ''),
-                })
-                
-                fecha_obj = pol.order_id.date_order or pol.create_date
-                general_logs.append({
-                    'fecha_obj': fecha_obj,
-                    'fecha': som_format_date(fecha_obj, empty='', with_time=True),
-                    'usuario': pol.create_uid.name if pol.create_uid else 'Sistema',
-                    'origen': 'Compra',
-                    'descripcion': f"Orden de compra {pol.order_id.name} al proveedor {pol.order_id.partner_id.name} (Cant: {pol.product_qty})"
-                })
-        
-        # 2. MOVIMIENTOS
-        movements = []
-        for ml in move_lines.sorted('date', reverse=True):
-            icon = 'fa-arrow-right'
-            tipo = 'Transferencia'
-            
-            if ml.location_id.usage != 'internal' and ml.location_dest_id.usage == 'internal':
-                icon = 'fa-arrow-down'
-                tipo = 'Entrada'
-            elif ml.location_id.usage == 'internal' and ml.location_dest_id.usage != 'internal':
-                icon = 'fa-arrow-up'
-                tipo = 'Salida'
-            
-            ref = ml.reference or ml.picking_id.name if ml.picking_id else ''
-            movements.append({
-                'fecha': som_format_date(ml.date, empty='', with_time=True),
-                'tipo': tipo,
-                'icon': icon,
-                'origen': ml.location_id.complete_name,
-                'destino': ml.location_dest_id.complete_name,
-                'cantidad': ml.qty_done,
-                'referencia': ref,
-                'usuario': ml.write_uid.name if ml.write_uid else '',
-            })
-            
-            fecha_obj = ml.date or ml.create_date
-            general_logs.append({
-                'fecha_obj': fecha_obj,
-                'fecha': som_format_date(fecha_obj, empty='', with_time=True),
-                'usuario': ml.write_uid.name if ml.write_uid else 'Sistema',
-                'origen': f"Movimiento ({tipo})",
-                'descripcion': f"De: {ml.location_id.name} -> A: {ml.location_dest_id.name}. Documento: {ref}. Cantidad: {ml.qty_done}"
-            })
-        
-        # 3. VENTAS
-        sales_orders = []
-        sale_lines = self.env['sale.order.line'].search([
-            ('product_id', '=', lot.product_id.id),
-            ('order_id.state', 'in', ['sale', 'done'])
-        ], limit=10, order='create_date desc')
-        
-        for sol in sale_lines:
-            used_in_line = self.env['stock.move.line'].search([
-                ('lot_id', '=', lot.id),
-                ('move_id.sale_line_id', '=', sol.id)
-            ], limit=1)
-            
-            if used_in_line:
-                statistics['total_ventas'] += 1
-                sales_orders.append({
-                    'orden_venta': sol.order_id.name,
-                    'cliente': sol.order_id.partner_id.name,
-                    'vendedor': sol.order_id.user_id.name if sol.order_id.user_id else '',
-                    'fecha_orden': som_format_date(sol.order_id.date_order, empty=''),
-                    'cantidad': sol.product_uom_qty,
-                    'precio_unitario': sol.price_unit,
-                    'total': sol.price_subtotal,
-                    'moneda': sol.order_id.currency_id.symbol,
-                    'estado': dict(sol.order_id._fields['state'].selection).get(sol.order_id.state, ''),
-                })
-                
-                fecha_obj = sol.order_id.date_order or sol.create_date
-                general_logs.append({
-                    'fecha_obj': fecha_obj,
-                    'fecha': som_format_date(fecha_obj, empty='', with_time=True),
-                    'usuario': sol.order_id.user_id.name if sol.order_id.user_id else 'Sistema',
-                    'origen': 'Venta',
-                    'descripcion': f"Orden de venta {sol.order_id.name} confirmada al cliente {sol.order_id.partner_id.name}"
-                })
-        
-        # 4. APARTADOS
-        reservations = []
-        if hasattr(quant, 'x_hold_ids'):
-            for hold in quant.x_hold_ids:
-                statistics['total_apartados'] += 1
-                
-                estado_raw = hold.estado or ''
-                try:
-                    estado_display = dict(hold._fields['estado'].selection).get(hold.estado, hold.estado)
-                except Exception:
-                    estado_display = estado_raw
-                
-                cancel_info = {}
-                if estado_raw in ('cancelado', 'expirado'):
-                    cancel_info = {
-                        'tipo_cancelacion': 'Expiración automática' if estado_raw == 'expirado' else 'Cancelación manual',
-                        'cancelado_por': 'Sistema (Cron)' if estado_raw == 'expirado' else (hold.write_uid.name if hold.write_uid else 'Desconocido'),
-                        'fecha_cancelacion': som_format_date(hold.write_date, empty='', with_time=True),
-                    }
-                
-                duracion_dias = 0
-                if hold.fecha_inicio:
-                    if estado_raw in ('cancelado', 'expirado') and hold.write_date:
-                        duracion_dias = (hold.write_date - hold.fecha_inicio).days
-                    else:
-                        duracion_dias = (fields.Datetime.now() - hold.fecha_inicio).days
-                
-                general_logs.append({
-                    'fecha_obj': hold.create_date,
-                    'fecha': som_format_date(hold.create_date, empty='', with_time=True),
-                    'usuario': hold.create_uid.name if hold.create_uid else 'Sistema',
-                    'origen': 'Apartado (Creación)',
-                    'descripcion': f"Apartado creado para cliente: {hold.partner_id.name if hold.partner_id else '-'}"
-                })
-
-                if estado_raw in ('cancelado', 'expirado') and hold.write_date:
-                    general_logs.append({
-                        'fecha_obj': hold.write_date,
-                        'fecha': som_format_date(hold.write_date, empty='', with_time=True),
-                        'usuario': hold.write_uid.name if hold.write_uid and estado_raw != 'expirado' else 'Sistema',
-                        'origen': f"Apartado ({estado_raw.capitalize()})",
-                        'descripcion': f"El apartado cambió a estado: {estado_raw.upper()}"
-                    })
-
-                reservation_data = {
-                    'id': hold.id,
-                    'name': hold.name or '',
-                    'tipo': 'Apartado Manual',
-                    'estado': estado_display,
-                    'estado_raw': estado_raw,
-                    'partner': hold.partner_id.name if hold.partner_id else '',
-                    'partner_ref': hold.partner_id.ref or '' if hold.partner_id else '',
-                    'partner_email': hold.partner_id.email or '' if hold.partner_id else '',
-                    'vendedor': hold.user_id.name if hold.user_id else '',
-                    'vendedor_email': hold.user_id.email if hold.user_id else '',
-                    'proyecto': hold.project_id.name if hold.project_id else '',
-                    'arquitecto': hold.arquitecto_id.name if hold.arquitecto_id else '',
-                    'fecha_inicio': som_format_date(hold.fecha_inicio, empty='', with_time=True),
-                    'fecha_expiracion': som_format_date(hold.fecha_expiracion, empty='', with_time=True),
-                    'fecha_creacion': som_format_date(hold.create_date, empty='', with_time=True),
-                    'ultima_modificacion': som_format_date(hold.write_date, empty='', with_time=True),
-                    'creado_por': hold.create_uid.name if hold.create_uid else '',
-                    'modificado_por': hold.write_uid.name if hold.write_uid else '',
-                    'lote_nombre': hold.lot_id.name if hold.lot_id else '',
-                    'ubicacion': hold.ubicacion_id.complete_name if hold.ubicacion_id else '',
-                    'duracion_dias': duracion_dias,
-                    'dias_restantes': hold.dias_restantes if estado_raw == 'activo' else 0,
-                    'notas': hold.notas or '',
-                    'cancel_info': cancel_info,
-                    'hold_order_name': '',
-                    'hold_order_state': '',
-                    'hold_order_sale': '',
-                }
-                
-                try:
-                    hold_order_line = self.env['stock.lot.hold.order.line'].search([('hold_id', '=', hold.id)], limit=1)
-                    if hold_order_line and hold_order_line.order_id:
-                        order = hold_order_line.order_id
-                        reservation_data['hold_order_name'] = order.name or ''
-                        reservation_data['hold_order_state'] = dict(order._fields['state'].selection).get(order.state, order.state)
-                        reservation_data['hold_order_sale'] = order.sale_order_id.name if order.sale_order_id else ''
-                except Exception:
-                    pass
-                
-                # Clave de ORDEN: el datetime crudo. 'fecha_creacion' ya viene
-                # formateado para el usuario ("13 ago 2026 14:30") y NO se puede
-                # ordenar como texto. Se elimina tras ordenar.
-                reservation_data['fecha_creacion_obj'] = hold.create_date
-
-                reservations.append(reservation_data)
-
-            reservations.sort(key=lambda r: (0 if r['estado_raw'] == 'activo' else 1, r.get('fecha_creacion_obj') or min_date))
-            for reservation in reservations:
-                reservation.pop('fecha_creacion_obj', None)
-        
-        # 4.b BITÁCORA DE ASIGNACIÓN (stock.lot.assignment.log)
-        # Responde "¿a qué pedido se asignó esta placa y quién se la quitó?".
-        # Es la ÚNICA fuente: sale.order.line.lot_ids es un many2many sin
-        # tracking, así que antes de esta bitácora una desasignación no
-        # dejaba rastro en la base.
-        assignments = []
-        for entry in self.env['stock.lot.assignment.log'].som_get_lot_trail(lot.id):
-            fecha_obj = entry.pop('date_obj', None)
-            entry['fecha'] = som_format_date(fecha_obj, empty='', with_time=True)
-            assignments.append(entry)
-
-            descripcion = '%s %s' % (
-                'Asignada a' if entry['action'] == 'assign' else 'Desasignada de',
-                entry['documento'] or 'documento sin nombre')
-            if entry['cliente']:
-                descripcion += ' (cliente %s)' % entry['cliente']
-            if entry['motivo']:
-                descripcion += ' — %s' % entry['motivo']
-
-            general_logs.append({
-                'fecha_obj': fecha_obj,
-                'fecha': entry['fecha'],
-                'usuario': entry['usuario'],
-                'origen': 'Asignación' if entry['action'] == 'assign' else 'Desasignación',
-                'descripcion': descripcion,
-            })
-
-        statistics['total_asignaciones'] = sum(
-            1 for a in assignments if a['action'] == 'assign')
-        statistics['total_desasignaciones'] = sum(
-            1 for a in assignments if a['action'] == 'unassign')
-
-        # 5. ENTREGAS
-        deliveries = []
-        delivery_moves = self.env['stock.move.line'].search([
-            ('lot_id', '=', lot.id),
-            ('picking_id.picking_type_code', '=', 'outgoing')
-        ])
-        
-        for dm in delivery_moves:
-            if dm.picking_id:
-                statistics['total_entregas'] += 1
-                deliveries.append({
-                    'referencia': dm.picking_id.name,
-                    'cliente': dm.picking_id.partner_id.name if dm.picking_id.partner_id else '',
-                    'fecha_programada': som_format_date(dm.picking_id.scheduled_date, empty=''),
-                    'fecha_efectiva': som_format_date(dm.date, empty=''),
-                    'cantidad': dm.qty_done,
-                    'origen': dm.location_id.complete_name,
-                    'estado': dict(dm.picking_id._fields['state'].selection).get(dm.picking_id.state, ''),
-                })
-        
-        general_logs.sort(key=lambda x: x.get('fecha_obj') or min_date, reverse=True)
-        
-        for log in general_logs:
-            log.pop('fecha_obj', None)
+    def _iv_resolve_lot_ref(self, quant_id=None, lot_id=None):
+        """(quant, lot) para los diálogos de lote. Las filas del Walkthrough
+        no tienen quant propio y mandan lot_id: ahí quant regresa vacío y
+        los datos de existencia salen en cero."""
+        if lot_id:
+            lot = self.env['stock.lot'].with_context(active_test=False).browse(int(lot_id)).exists()
+            return self.browse(), lot
+        quant = self.browse(quant_id).exists() if quant_id else self.browse()
+        return quant, quant.lot_id
 
-        return {
-            'general_info': general_info,
-            'statistics': statistics,
-            'purchase_info': purchase_info,
-            'has_purchase_permissions': has_purchase_permissions,
-            'movements': movements,
-            'sales_orders': sales_orders,
-            'reservations': reservations,
-            'assignments': assignments,
-            'deliveries': deliveries,
-            'general_logs': general_logs,
-        }
-    
     @api.model
-    def get_lot_photos(self, quant_id):
-        quant = self.browse(quant_id)
-        if not quant.exists() or not quant.lot_id:
+    def get_lot_photos(self, quant_id=None, lot_id=None):
+        quant, lot = self._iv_resolve_lot_ref(quant_id, lot_id)
+        if not lot:
             return {'error': 'Lote no encontrado'}
-        
-        lot = quant.lot_id
         photos = []
         
         if hasattr(lot, 'x_fotografia_ids'):
@@ -1166,6 +876,40 @@ class StockQuant(models.Model):
             'photos': photos,
         }
 
+    @api.model
+    def get_lot_photo_thumbnails(self, quant_ids, limit_per_lot=3):
+        """Miniaturas de las fotos de varios lotes en UNA llamada, para la
+        copia sin conexión de las tabletas del patio. Misma forma que
+        get_lot_photos, indexada por quant_id, con imágenes de 256 px."""
+        result = {}
+        for quant in self.browse(quant_ids or []).exists():
+            lot = quant.lot_id
+            if not lot or not hasattr(lot, 'x_fotografia_ids'):
+                continue
+            photos = []
+            for photo in lot.x_fotografia_ids[:limit_per_lot]:
+                thumb = False
+                if photo.image:
+                    try:
+                        thumb = base64.b64encode(image_process(
+                            base64.b64decode(photo.image), size=(256, 256)))
+                    except Exception:
+                        _logger.warning("Miniatura inválida para la foto %s", photo.id)
+                        continue
+                photos.append({
+                    'id': photo.id,
+                    'name': photo.name,
+                    'image': thumb,
+                    'fecha_captura': som_format_date(photo.fecha_captura, empty='', with_time=True),
+                    'notas': photo.notas or '',
+                })
+            result[quant.id] = {
+                'lot_name': lot.name,
+                'product_name': lot.product_id.display_name,
+                'photos': photos,
+            }
+        return result
+
     @api.model
     def get_block_photos(self, block_name):
         """Fotos de un BLOQUE (subidas desde el Portal Proveedor). El bloque es
@@ -1177,7 +921,9 @@ class StockQuant(models.Model):
             return {'block_name': block_name, 'photos': []}
 
         Model = self.env['supplier.shipment.block.image'].sudo()
-        images = Model.search([('block_name', '=ilike', block_name)], order='id desc')
+        image_ids = self._iv_block_record_ids(
+            'supplier.shipment.block.image', [block_name]).get(som_block_key(block_name), [])
+        images = Model.browse(image_ids)
         photos = []
         product_names = []
         for img in images:
@@ -1205,170 +951,11 @@ class StockQuant(models.Model):
         }
 
     @api.model
-    def get_block_purchase_report(self, block_name):
-        """Reporte de compra de un BLOQUE: costo por lote, info general de la
-        compra, todo lo comprado en la(s) misma(s) orden(es) y facturas. Camino:
-        stock.lot(x_bloque) → stock.move.line(incoming) → purchase.order.line → PO."""
-        block_name = (block_name or '').strip()
-        empty = {'block_name': block_name, 'has_data': False}
-        if not block_name:
-            return empty
-
-        Lot = self.env['stock.lot'].sudo()
-        lots = Lot.search([('x_bloque', '=ilike', block_name)])
-        if not lots:
-            return empty
-
-        MoveLine = self.env['stock.move.line'].sudo()
-        lot_info = []          # por lote del bloque: qty + po_line
-        block_po_line_ids = set()
-        for lot in lots:
-            mls = MoveLine.search([
-                ('lot_id', '=', lot.id),
-                ('picking_id.picking_type_id.code', '=', 'incoming'),
-            ])
-            qty = sum(mls.mapped('quantity'))
-            po_line = mls.mapped('move_id.purchase_line_id')[:1]
-
-            # FALLBACK A — Lotes ya en STOCK: la recepción física (Torre de
-            # Control) recrea/renumera lotes en un picking INTERNO, por lo que
-            # no tienen move lines de entrada. Se busca cualquier move line del
-            # lote cuyo move venga de una línea de compra.
-            if not po_line:
-                any_mls = MoveLine.search([
-                    ('lot_id', '=', lot.id),
-                    ('move_id.purchase_line_id', '!=', False),
-                ], limit=1)
-                po_line = any_mls.mapped('move_id.purchase_line_id')[:1]
-
-            if not qty:
-                # Sin recepción de entrada: usa la existencia actual del lote.
-                qty = lot.product_qty or 0.0
-
-            if po_line:
-                block_po_line_ids.add(po_line.id)
-            lot_info.append({'lot': lot, 'qty': qty, 'po_line': po_line})
-
-        pos = self.env['purchase.order.line'].sudo().browse(list(block_po_line_ids)).mapped('order_id')
-
-        # FALLBACK B — Bloques del portal del proveedor: la fila de packing
-        # capturada por el proveedor conserva el nombre del bloque y su packing
-        # está ligado a la PO (related almacenado). Cubre lotes históricos sin
-        # ningún vínculo por move lines. Retroactivo: todo se resuelve al vuelo.
-        if not pos and 'supplier.shipment.packing.row' in self.env:
-            rows = self.env['supplier.shipment.packing.row'].sudo().search([
-                ('bloque', '=ilike', block_name),
-            ])
-            if rows:
-                pos = rows.mapped('packing_id.purchase_id')
-
-        valid_pos = pos.filtered(lambda p: p.state in ('purchase', 'done')) or pos
-
-        # Costo por lote sin vínculo directo: empatar por producto dentro de
-        # las órdenes encontradas (mejor aproximación que el costo estándar).
-        if valid_pos:
-            for info in lot_info:
-                if not info['po_line']:
-                    info['po_line'] = valid_pos.mapped('order_line').filtered(
-                        lambda l: l.product_id == info['lot'].product_id
-                    )[:1]
-        main_po = valid_pos[:1]
-        currency = (main_po.currency_id if main_po else self.env.company.currency_id)
-        cur_symbol = currency.symbol or '$'
-
-        def _g(rec, field):
-            return getattr(rec, field) if hasattr(rec, field) else ''
-
-        # --- Costo por lote (de ESTE bloque) ---
-        block_lots = []
-        block_total_cost = 0.0
-        block_total_qty = 0.0
-        for info in lot_info:
-            lot = info['lot']
-            unit = info['po_line'].price_unit if info['po_line'] else (lot.product_id.standard_price or 0.0)
-            total = unit * (info['qty'] or 0.0)
-            block_total_cost += total
-            block_total_qty += info['qty'] or 0.0
-            block_lots.append({
-                'lot_name': lot.name,
-                'numero_placa': _g(lot, 'x_numero_placa') or '',
-                'product': lot.product_id.display_name,
-                'qty': info['qty'] or 0.0,
-                'unit_cost': unit,
-                'total_cost': total,
-            })
-        block_lots.sort(key=lambda x: x['lot_name'])
-        block_po_line_set = {info['po_line'].id for info in lot_info if info['po_line']}
-
-        # --- Todo lo comprado en la(s) misma(s) orden(es) ---
-        purchase_lines = []
-        po_total = 0.0
-        for po in valid_pos:
-            for pl in po.order_line:
-                uom = getattr(pl, 'product_uom_id', False) or getattr(pl, 'product_uom', False)
-                purchase_lines.append({
-                    'po_name': po.name,
-                    'product': pl.product_id.display_name,
-                    'qty': pl.product_qty,
-                    'uom': uom.name if uom else '',
-                    'unit_price': pl.price_unit,
-                    'subtotal': pl.price_subtotal,
-                    'is_block': pl.id in block_po_line_set,
-                })
-            po_total += po.amount_total
-
-        # --- Facturas ---
-        invoices = self.env['account.move'].sudo()
-        for po in valid_pos:
-            invoices |= po.invoice_ids
-        invoice_list = [{
-            'id': inv.id,
-            'name': inv.name or inv.ref or '(borrador)',
-            'date': som_format_date(inv.invoice_date, empty=''),
-            'amount': inv.amount_total,
-            'currency': inv.currency_id.symbol or '$',
-            'state': dict(inv._fields['state'].selection).get(inv.state, inv.state or ''),
-            'payment_state': dict(inv._fields['payment_state'].selection).get(inv.payment_state, '') if inv.payment_state else '',
-        } for inv in invoices]
-
-        # --- Info general (de los lotes del bloque) ---
-        def first_lot_attr(field):
-            for lot in lots:
-                v = _g(lot, field)
-                if v:
-                    return v
-            return ''
-
-        return {
-            'block_name': block_name,
-            'has_data': bool(valid_pos),
-            'supplier': main_po.partner_id.name if main_po else '',
-            'po_names': valid_pos.mapped('name'),
-            'po_ids': valid_pos.ids,
-            'date': som_format_date(main_po.date_order, empty='') if main_po else '',
-            'currency': cur_symbol,
-            'partner_ref': main_po.partner_ref if main_po else '',
-            'incoterm': (main_po.incoterm_id.code if main_po and main_po.incoterm_id else ''),
-            'pedimento': first_lot_attr('x_pedimento'),
-            'contenedor': first_lot_attr('x_contenedor'),
-            'ref_proveedor': first_lot_attr('x_referencia_proveedor'),
-            'lots_count': len(lots),
-            'block_lots': block_lots,
-            'block_total_cost': block_total_cost,
-            'block_total_qty': block_total_qty,
-            'purchase_lines': purchase_lines,
-            'po_total': po_total,
-            'invoices': invoice_list,
-        }
-
-    @api.model
-    def get_lot_notes(self, quant_id):
-        quant = self.browse(quant_id)
-        if not quant.exists() or not quant.lot_id:
+    def get_lot_notes(self, quant_id=None, lot_id=None):
+        quant, lot = self._iv_resolve_lot_ref(quant_id, lot_id)
+        if not lot:
             return {'error': 'Lote no encontrado'}
         
-        lot = quant.lot_id
-        
         return {
             'lot_name': lot.name,
             'product_name': lot.product_id.display_name,
@@ -1377,37 +964,164 @@ class StockQuant(models.Model):
     
     @api.model
     def save_lot_photo(self, quant_id, photo_name, photo_data, sequence=10, notas=''):
-        quant = self.browse(quant_id)
-        if not quant.exists() or not quant.lot_id:
-            return {'success': False, 'error': 'Lote no encontrado'}
-        
-        try:
-            self.env['stock.lot.image'].create({
-                'lot_id': quant.lot_id.id,
-                'name': photo_name,
-                'image': photo_data,
-                'sequence': sequence,
-                'notas': notas,
-            })
-            
+        """Camino JSON-RPC (base64 en el payload). La galería sube por la
+        ruta binaria del controlador; esto queda para integraciones."""
+        return self._iv_store_lot_photo(
+            quant_id, photo_name, photo_data, sequence=sequence, notas=notas)
+
+    @api.model
+    def _iv_store_lot_photo(self, quant_id, photo_name, photo_data, sequence=10, notas=''):
+        """Alta de una foto de lote. photo_data llega en base64 (lo que
+        esperan los campos Binary); lo comparten save_lot_photo y la subida
+        multipart de controllers/main.py."""
+        res = self._iv_store_lot_photos([{
+            'quant_id': quant_id,
+            'name': photo_name,
+            'data': photo_data,
+            'sequence': sequence,
+            'notas': notas,
+        }])['results'][0]
+        if res['success']:
             return {
                 'success': True,
                 'message': f'Fotografía "{photo_name}" guardada correctamente'
             }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Error al guardar fotografía: {str(e)}'
+        return {'success': False, 'error': res['error']}
+
+    @api.model
+    def save_lot_photos_batch(self, photos):
+        """Subida MASIVA de fotos (uno o varios lotes) por JSON-RPC. La
+        galería usa la ruta multipart equivalente; ver _iv_store_lot_photos."""
+        return self._iv_store_lot_photos(photos or [])
+
+    @api.model
+    def _iv_store_lot_photos(self, photos):
+        """Alta en lote de fotos de placa con UN solo create.
+
+        Cada entrada: {key, quant_id, name, data (base64), sequence, notas}.
+        'key' es la llave de subida que genera el cliente (única por foto y
+        por envío): si una foto de ESE lote con esa llave se guardó dentro
+        de IV_PHOTO_RETRY_WINDOW (la conexión se cayó después del commit y
+        el cliente reintenta), se reporta como ya guardada y NO se duplica.
+        Fuera de la ventana, o en otro lote, se guarda como foto nueva.
+
+        Devuelve un resultado POR FOTO, en el mismo orden de entrada:
+        {key, success, photo_id, duplicate, error}."""
+        if len(photos) > IV_PHOTO_BATCH_MAX:
+            raise UserError(
+                'Máximo %s fotos por envío.' % IV_PHOTO_BATCH_MAX)
+
+        Image = self.env['stock.lot.image']
+
+        results = [{
+            'key': (p or {}).get('key') or '',
+            'success': False,
+            'photo_id': False,
+            'duplicate': False,
+            'error': '',
+        } for p in photos]
+
+        quant_ids = set()
+        for p in photos:
+            try:
+                quant_ids.add(int((p or {}).get('quant_id')))
+            except (TypeError, ValueError):
+                continue
+        lot_by_quant = {
+            q.id: q.lot_id.id
+            for q in self.browse(list(quant_ids)).exists() if q.lot_id
+        }
+
+        keys = {r['key'] for r in results if r['key']}
+        stored = {}
+        if keys and lot_by_quant:
+            # sudo solo para ver lo recién guardado por el mismo reintento; la
+            # búsqueda queda acotada a los lotes del envío y a la ventana.
+            recent = Image.sudo().search([
+                ('x_iv_upload_key', 'in', list(keys)),
+                ('lot_id', 'in', list(set(lot_by_quant.values()))),
+                ('create_date', '>=', fields.Datetime.now() - IV_PHOTO_RETRY_WINDOW),
+            ])
+            for img in recent:
+                stored[(img.lot_id.id, img.x_iv_upload_key)] = img.id
+
+        vals_list = []
+        pending_idx = []
+        seen_keys = set()
+        for idx, p in enumerate(photos):
+            res = results[idx]
+            p = p or {}
+            key = res['key']
+            try:
+                lot_id = lot_by_quant.get(int(p.get('quant_id')))
+            except (TypeError, ValueError):
+                lot_id = False
+            if not lot_id:
+                res['error'] = 'Lote no encontrado'
+                continue
+            if key and (lot_id, key) in stored:
+                res.update(success=True, duplicate=True, photo_id=stored[(lot_id, key)])
+                continue
+            if key and (lot_id, key) in seen_keys:
+                res.update(success=True, duplicate=True)
+                continue
+            if not p.get('data'):
+                res['error'] = 'La foto llegó vacía'
+                continue
+            vals = {
+                'lot_id': lot_id,
+                'name': p.get('name') or 'Foto',
+                'image': p['data'],
+                'sequence': int(p.get('sequence') or 10),
+                'notas': p.get('notas') or '',
             }
+            if key:
+                vals['x_iv_upload_key'] = key
+                seen_keys.add((lot_id, key))
+            vals_list.append(vals)
+            pending_idx.append(idx)
+
+        if not vals_list:
+            return self._iv_photo_batch_summary(results)
+
+        try:
+            with self.env.cr.savepoint():
+                images = Image.create(vals_list)
+            for idx, img in zip(pending_idx, images):
+                results[idx].update(success=True, photo_id=img.id)
+        except Exception as exc:
+            # Una foto corrupta no debe tumbar el lote entero: se reintenta
+            # una por una (cada una en su savepoint) para reportar cuál falló.
+            _logger.warning(
+                "[Inventario Visual] Alta masiva de fotos falló (%s); "
+                "se reintenta por foto.", exc)
+            for idx, vals in zip(pending_idx, vals_list):
+                try:
+                    with self.env.cr.savepoint():
+                        img = Image.create(vals)
+                    results[idx].update(success=True, photo_id=img.id)
+                except Exception as e:
+                    results[idx]['error'] = f'Error al guardar fotografía: {str(e)}'
+
+        return self._iv_photo_batch_summary(results)
+
+    @api.model
+    def _iv_photo_batch_summary(self, results):
+        return {
+            'results': results,
+            'saved': sum(1 for r in results if r['success'] and not r['duplicate']),
+            'duplicates': sum(1 for r in results if r['duplicate']),
+            'failed': sum(1 for r in results if not r['success']),
+        }
     
     @api.model
-    def save_lot_notes(self, quant_id, notes):
-        quant = self.browse(quant_id)
-        if not quant.exists() or not quant.lot_id:
+    def save_lot_notes(self, quant_id=None, notes='', lot_id=None):
+        quant, lot = self._iv_resolve_lot_ref(quant_id, lot_id)
+        if not lot:
             return {'success': False, 'error': 'Lote no encontrado'}
         
         try:
-            quant.lot_id.write({
+            lot.write({
                 'x_detalles_placa': notes
             })
             
@@ -1421,36 +1135,6 @@ class StockQuant(models.Model):
                 'error': f'Error al guardar notas: {str(e)}'
             }
     
-    @api.model
-    def search_partners(self, name=''):
-        if not self.check_sales_permissions():
-            raise UserError("No tiene permisos para buscar clientes. Contacte al administrador.")
-        
-        domain = [('customer_rank', '>', 0)]
-        
-        if name:
-            domain = ['|', '|', '|',
-                ('name', 'ilike', name),
-                ('vat', 'ilike', name),
-                ('ref', 'ilike', name),
-                ('email', 'ilike', name)
-            ] + domain
-        
-        partners = self.env['res.partner'].search(domain, limit=20, order='name')
-        
-        result = []
-        for partner in partners:
-            result.append({
-                'id': partner.id,
-                'name': partner.name,
-                'display_name': partner.display_name,
-                'vat': partner.vat or '',
-                'ref': partner.ref or '',
-                'email': partner.email or '',
-            })
-        
-        return result
-    
     @api.model
     def create_partner(self, name, vat='', ref=''):
         if not self.check_sales_permissions():
@@ -1485,36 +1169,6 @@ class StockQuant(models.Model):
         except Exception as e:
             return {'error': f'Error al crear cliente: {str(e)}'}
     
-    @api.model
-    def get_projects(self, search_term='', partner_id=None):
-        if not self.check_sales_permissions():
-            raise UserError("No tiene permisos para consultar proyectos. Contacte al administrador.")
-
-        domain = []
-
-        if hasattr(self.env['project.project'], 'x_es_proyecto_marmol'):
-            domain.append(('x_es_proyecto_marmol', '=', True))
-
-        # Regla cliente→proyectos: con un cliente seleccionado solo se ofrecen
-        # SUS proyectos (o proyectos aún sin cliente); nunca los de otro cliente.
-        if partner_id:
-            domain += ['|', ('partner_id', '=', False),
-                       ('partner_id', 'child_of', int(partner_id))]
-
-        if search_term:
-            domain.append(('name', 'ilike', search_term))
-
-        projects = self.env['project.project'].search(domain, limit=20, order='name')
-        
-        result = []
-        for project in projects:
-            result.append({
-                'id': project.id,
-                'name': project.name,
-            })
-        
-        return result
-    
     @api.model
     def create_project(self, name, partner_id=None):
         if not self.check_sales_permissions():
@@ -1548,37 +1202,6 @@ class StockQuant(models.Model):
         except Exception as e:
             return {'error': f'Error al crear proyecto: {str(e)}'}
     
-    @api.model
-    def get_architects(self, search_term=''):
-        if not self.check_sales_permissions():
-            raise UserError("No tiene permisos para consultar embajadores. Contacte al administrador.")
-        
-        domain = []
-        
-        if hasattr(self.env['res.partner'], 'x_es_arquitecto'):
-            domain.append(('x_es_arquitecto', '=', True))
-        
-        if search_term:
-            domain = ['|', '|',
-                ('name', 'ilike', search_term),
-                ('vat', 'ilike', search_term),
-                ('ref', 'ilike', search_term)
-            ] + domain
-        
-        architects = self.env['res.partner'].search(domain, limit=20, order='name')
-        
-        result = []
-        for architect in architects:
-            result.append({
-                'id': architect.id,
-                'name': architect.name,
-                'display_name': architect.display_name,
-                'vat': architect.vat or '',
-                'ref': architect.ref or '',
-            })
-        
-        return result
-    
     @api.model
     def create_architect(self, name, vat='', ref=''):
         if not self.check_sales_permissions():
@@ -1614,126 +1237,276 @@ class StockQuant(models.Model):
             return {'error': f'Error al crear embajador: {str(e)}'}
     
     @api.model
-    def create_lot_hold_enhanced(self, quant_id, partner_id, project_id, architect_id,
-                                   notas='', currency_code='USD', product_prices=None):
+    def _iv_hold_project_error(self, partner_id, project_id):
+        """Regla cliente→proyectos: el proyecto debe ser del cliente elegido
+        (o no tener cliente aún). Validación en servidor."""
+        if not (partner_id and project_id):
+            return ''
+        project = self.env['project.project'].browse(int(project_id)).exists()
+        partner = self.env['res.partner'].browse(int(partner_id)).exists()
+        if project and partner and project.partner_id and \
+                project.partner_id.commercial_partner_id != partner.commercial_partner_id:
+            return ('El proyecto "%s" pertenece al cliente %s. '
+                    'Selecciona un proyecto del cliente elegido.' % (
+                        project.name, project.partner_id.display_name))
+        return ''
+
+    @api.model
+    def _iv_hold_notes(self, notas, currency_code, product_prices):
+        full_notes = notas or ''
+        if product_prices and isinstance(product_prices, dict):
+            full_notes += f'\n\n=== PRECIOS ({currency_code}) ===\n'
+            product_ids = []
+            for product_id_str in product_prices:
+                try:
+                    product_ids.append(int(product_id_str))
+                except (TypeError, ValueError):
+                    _logger.warning(f"Error procesando precio del producto {product_id_str}")
+            products = {
+                p.id: p for p in self.env['product.product'].browse(product_ids).exists()
+            }
+            for product_id_str, price in product_prices.items():
+                try:
+                    product = products.get(int(product_id_str))
+                    if product:
+                        full_notes += f'• {product.display_name}: {price:.2f} {currency_code}/m²\n'
+                except Exception as e:
+                    _logger.warning(f"Error procesando precio del producto {product_id_str}: {e}")
+        return full_notes
+
+    @api.model
+    def _iv_hold_expiration(self, fecha_inicio):
+        """5 días hábiles (lunes a viernes) después del inicio."""
+        fecha_expiracion = fecha_inicio
+        dias_agregados = 0
+        while dias_agregados < 5:
+            fecha_expiracion += timedelta(days=1)
+            if fecha_expiracion.weekday() < 5:
+                dias_agregados += 1
+        return fecha_expiracion
+
+    @api.model
+    def create_lot_holds_bulk(self, quant_ids, partner_id, project_id, architect_id,
+                              notas='', currency_code='USD', product_prices=None):
+        """Aparta VARIOS lotes en una sola transacción: se validan juntos, se
+        pide a lo más UNA autorización de precio agrupada por producto y los
+        apartados se crean con un solo create. Resultado por lote en
+        'results' ({quant_id, lot_id, lot_name, success, hold_id | error})."""
         if not self.check_sales_permissions():
             raise UserError("No tiene permisos para crear apartados. Contacte al administrador.")
-        
-        quant = self.browse(quant_id)
-        if not quant.exists() or not quant.lot_id:
-            return {'error': 'Lote no encontrado'}
 
-        if hasattr(quant, 'x_tiene_hold') and quant.x_tiene_hold:
-            return {'error': 'Este lote ya tiene un apartado activo'}
-
-        # Regla cliente→proyectos: el proyecto debe ser del cliente elegido
-        # (o no tener cliente aún). Validación en servidor.
-        if partner_id and project_id:
-            project = self.env['project.project'].browse(int(project_id)).exists()
-            partner = self.env['res.partner'].browse(int(partner_id)).exists()
-            if project and partner and project.partner_id and \
-                    project.partner_id.commercial_partner_id != partner.commercial_partner_id:
-                return {'error': 'El proyecto "%s" pertenece al cliente %s. '
-                                 'Selecciona un proyecto del cliente elegido.' % (
-                                     project.name, project.partner_id.display_name)}
-        
+        project_error = self._iv_hold_project_error(partner_id, project_id)
+        if project_error:
+            return {'error': project_error}
+
+        if 'stock.lot.hold' not in self.env:
+            return {'error': 'El modelo stock.lot.hold no está disponible.'}
+
+        quant_ids = [int(qid) for qid in (quant_ids or [])]
+        quants = {q.id: q for q in self.browse(quant_ids).exists()}
+
+        results = []
+        valid = self.browse()
+        seen_lots = set()
+        for quant_id in quant_ids:
+            quant = quants.get(quant_id)
+            entry = {
+                'quant_id': quant_id,
+                'lot_id': quant.lot_id.id if quant else False,
+                'lot_name': quant.lot_id.name if quant and quant.lot_id else '',
+                'success': False,
+            }
+            if not quant or not quant.lot_id:
+                entry['error'] = 'Lote no encontrado'
+            elif hasattr(quant, 'x_tiene_hold') and quant.x_tiene_hold:
+                entry['error'] = 'Este lote ya tiene un apartado activo'
+            elif quant.lot_id.id in seen_lots:
+                entry['error'] = 'Lote repetido en la selección'
+            else:
+                seen_lots.add(quant.lot_id.id)
+                valid |= quant
+            results.append(entry)
+
+        if not valid:
+            return {
+                'success': False,
+                'created': 0,
+                'error': 'Ningún lote de la selección se puede apartar',
+                'results': results,
+            }
+
         if product_prices and isinstance(product_prices, dict):
             auth_check = self.env['product.template'].check_price_authorization_needed(
-                product_prices, 
+                product_prices,
                 currency_code
             )
-            
+
             if auth_check['needs_authorization']:
                 product_groups = {}
-                pid = quant.product_id.id
-                product_groups[str(pid)] = {
-                    'name': quant.product_id.display_name,
-                    'lots': [{
-                        'id': quant_id,
+                for quant in valid:
+                    group = product_groups.setdefault(str(quant.product_id.id), {
+                        'name': quant.product_id.display_name,
+                        'lots': [],
+                        'total_quantity': 0.0,
+                    })
+                    group['lots'].append({
+                        'id': quant.id,
                         'lot_name': quant.lot_id.name,
                         'quantity': quant.quantity
-                    }],
-                    'total_quantity': quant.quantity
-                }
-                
+                    })
+                    group['total_quantity'] += quant.quantity
+
                 result = self.create_price_authorization(
                     operation_type='hold',
                     partner_id=partner_id,
                     project_id=project_id,
-                    selected_lots=[quant_id],
+                    selected_lots=valid.ids,
                     currency_code=currency_code,
                     product_prices=product_prices,
                     product_groups=product_groups,
                     notes=notas,
                     architect_id=architect_id
                 )
-                
+
                 if result['success']:
+                    for entry in results:
+                        if entry['quant_id'] in valid.ids:
+                            entry['pending_authorization'] = True
                     return {
                         'needs_authorization': True,
                         'authorization_id': result['authorization_id'],
                         'authorization_name': result['authorization_name'],
-                        'message': f'Solicitud de autorización {result["authorization_name"]} creada. Espere aprobación del autorizador.'
+                        'message': f'Solicitud de autorización {result["authorization_name"]} creada. Espere aprobación del autorizador.',
+                        'results': results,
                     }
-        
-        try:
-            full_notes = notas or ''
-            
-            if product_prices and isinstance(product_prices, dict):
-                full_notes += f'\n\n=== PRECIOS ({currency_code}) ===\n'
-                for product_id_str, price in product_prices.items():
-                    try:
-                        product = self.env['product.product'].browse(int(product_id_str))
-                        if product.exists():
-                            full_notes += f'• {product.display_name}: {price:.2f} {currency_code}/m²\n'
-                    except Exception as e:
-                        _logger.warning(f"Error procesando precio del producto {product_id_str}: {e}")
-            
-            from datetime import datetime, timedelta
-            fecha_inicio = datetime.now()
-            fecha_expiracion = fecha_inicio
-            dias_agregados = 0
-            
-            while dias_agregados < 5:
-                fecha_expiracion += timedelta(days=1)
-                if fecha_expiracion.weekday() < 5:
-                    dias_agregados += 1
-            
-            if 'stock.lot.hold' not in self.env:
-                return {'error': 'El modelo stock.lot.hold no está disponible.'}
-            
-            hold_vals = {
-                'lot_id': quant.lot_id.id,
-                'partner_id': partner_id,
-                'user_id': self.env.user.id,
-                'fecha_inicio': fecha_inicio,
-                'fecha_expiracion': fecha_expiracion,
-                'notas': full_notes,
-            }
-            
-            hold_model = self.env['stock.lot.hold']
+
+        full_notes = self._iv_hold_notes(notas, currency_code, product_prices)
+        fecha_inicio = datetime.now()
+        fecha_expiracion = self._iv_hold_expiration(fecha_inicio)
+
+        hold_model = self.env['stock.lot.hold']
+        base_vals = {
+            'partner_id': partner_id,
+            'user_id': self.env.user.id,
+            'fecha_inicio': fecha_inicio,
+            'fecha_expiracion': fecha_expiracion,
+            'notas': full_notes,
+        }
+        if 'project_id' in hold_model._fields and project_id:
+            base_vals['project_id'] = project_id
+        if 'arquitecto_id' in hold_model._fields and architect_id:
+            base_vals['arquitecto_id'] = architect_id
+
+        vals_list = []
+        for quant in valid:
+            vals = dict(base_vals, lot_id=quant.lot_id.id)
             if 'quant_id' in hold_model._fields:
-                hold_vals['quant_id'] = quant.id
-            if 'project_id' in hold_model._fields and project_id:
-                hold_vals['project_id'] = project_id
-            if 'arquitecto_id' in hold_model._fields and architect_id:
-                hold_vals['arquitecto_id'] = architect_id
-            
-            hold = hold_model.create(hold_vals)
-            
-            return {
-                'success': True,
-                'message': f'Apartado creado exitosamente para el lote {quant.lot_id.name}',
-                'hold_id': hold.id,
-                'fecha_expiracion': fecha_expiracion.strftime('%Y-%m-%d %H:%M'),
-            }
-            
+                vals['quant_id'] = quant.id
+            vals_list.append(vals)
+
+        try:
+            # Todo o nada: si un apartado falla, no queda ninguno a medias.
+            with self.env.cr.savepoint():
+                holds = hold_model.create(vals_list)
         except Exception as e:
             import traceback
             error_msg = traceback.format_exc()
-            _logger.error(f"Error al crear apartado: {error_msg}")
-            return {'error': f'Error al crear apartado: {str(e)}'}
-    
+            _logger.error(f"Error al crear apartados: {error_msg}")
+            return {'error': f'Error al crear apartado: {str(e)}', 'results': results}
+
+        self._iv_queue_live_changes_for_lots(valid.mapped('lot_id'), {'hold'})
+
+        hold_by_quant = dict(zip(valid.ids, holds.ids))
+        for entry in results:
+            if entry['quant_id'] in hold_by_quant:
+                entry['success'] = True
+                entry['hold_id'] = hold_by_quant[entry['quant_id']]
+
+        created = len(holds)
+        return {
+            'success': True,
+            'created': created,
+            'failed': len(results) - created,
+            'message': f'{created} apartado(s) creado(s) exitosamente',
+            'fecha_expiracion': fecha_expiracion.strftime('%Y-%m-%d %H:%M'),
+            'results': results,
+        }
+
+    @api.model
+    def create_lot_hold_enhanced(self, quant_id, partner_id, project_id, architect_id,
+                                   notas='', currency_code='USD', product_prices=None):
+        """Apartado de UN lote: create_lot_holds_bulk con un solo quant y la
+        respuesta de siempre."""
+        result = self.create_lot_holds_bulk(
+            [quant_id], partner_id, project_id, architect_id,
+            notas=notas, currency_code=currency_code, product_prices=product_prices)
+
+        if result.get('needs_authorization'):
+            result.pop('results', None)
+            return result
+
+        entry = (result.get('results') or [{}])[0]
+        if not entry.get('success'):
+            return {'error': entry.get('error') or result.get('error') or 'Error al crear apartado'}
+
+        return {
+            'success': True,
+            'message': f'Apartado creado exitosamente para el lote {entry["lot_name"]}',
+            'hold_id': entry['hold_id'],
+            'fecha_expiracion': result['fecha_expiracion'],
+        }
+
+    @api.model
+    def _iv_compact_authorization_payload(self, selected_lots, product_prices,
+                                          product_groups, architect_id):
+        """temp_data de la autorización normalizado: lotes sin repetir y
+        precios / cantidades como float. Las llaves que manda el llamador
+        (por grupo y por lote) se conservan TAL CUAL: el módulo de
+        autorizaciones, fuera de este addon, lee esta estructura al
+        aprobar."""
+        lots_seen = set()
+        compact_lots = []
+        for lot_id in selected_lots or []:
+            lot_id = int(lot_id)
+            if lot_id not in lots_seen:
+                lots_seen.add(lot_id)
+                compact_lots.append(lot_id)
+
+        compact_prices = {}
+        for product_id, price in (product_prices or {}).items():
+            try:
+                compact_prices[str(product_id)] = float(price or 0)
+            except (TypeError, ValueError):
+                compact_prices[str(product_id)] = 0.0
+
+        compact_groups = {}
+        for product_id, group in (product_groups or {}).items():
+            group_lots_seen = set()
+            lots = []
+            for lot in group.get('lots') or []:
+                lot_key = lot.get('id')
+                if lot_key:
+                    if lot_key in group_lots_seen:
+                        continue
+                    group_lots_seen.add(lot_key)
+                lot = dict(lot)
+                lot['quantity'] = round(float(lot.get('quantity') or 0), 4)
+                lots.append(lot)
+            group = dict(group)
+            group.update({
+                'name': group.get('name') or '',
+                'lots': lots,
+                'total_quantity': round(float(group.get('total_quantity') or 0), 4),
+            })
+            compact_groups[str(product_id)] = group
+
+        return {
+            'selected_lots': compact_lots,
+            'product_prices': compact_prices,
+            'product_groups': compact_groups,
+            'architect_id': architect_id or False,
+        }
+
     @api.model
     def create_price_authorization(self, operation_type, partner_id, project_id,
                                     selected_lots, currency_code, product_prices,
@@ -1741,9 +1514,11 @@ class StockQuant(models.Model):
         if not self.check_sales_permissions():
             raise UserError("No tiene permisos para crear autorizaciones. Contacte al administrador.")
         
-        if isinstance(product_prices, dict):
-            product_prices = {str(k): v for k, v in product_prices.items()}
-        
+        temp_data = self._iv_compact_authorization_payload(
+            selected_lots, product_prices, product_groups, architect_id)
+        product_prices = temp_data['product_prices']
+        product_groups = temp_data['product_groups']
+
         auth = self.env['price.authorization'].create({
             'seller_id': self.env.user.id,
             'operation_type': operation_type,
@@ -1751,37 +1526,39 @@ class StockQuant(models.Model):
             'project_id': project_id,
             'currency_code': currency_code,
             'notes': notes or '',
-            'temp_data': {
-                'selected_lots': selected_lots,
-                'product_prices': product_prices,
-                'product_groups': product_groups,
-                'architect_id': architect_id
-            }
+            'temp_data': temp_data,
         })
-        
-        for product_id_str, group in product_groups.items():
-            product_id = int(product_id_str)
-            product = self.env['product.product'].browse(product_id)
-            
-            if currency_code == 'USD':
-                medium_price = product.product_tmpl_id.x_price_usd_2
-                minimum_price = product.product_tmpl_id.x_price_usd_3
-            else:
-                medium_price = product.product_tmpl_id.x_price_mxn_2
-                minimum_price = product.product_tmpl_id.x_price_mxn_3
-            
-            requested_price = float(product_prices.get(str(product_id), 0))
-            
-            self.env['price.authorization.line'].create({
+
+        # Precios de lista de TODOS los productos en una lectura; luego las
+        # líneas en un solo create.
+        if currency_code == 'USD':
+            medium_field, minimum_field = 'x_price_usd_2', 'x_price_usd_3'
+        else:
+            medium_field, minimum_field = 'x_price_mxn_2', 'x_price_mxn_3'
+        products = self.env['product.product'].browse(
+            [int(pid) for pid in product_groups])
+        tmpl_prices = {
+            row['id']: row
+            for row in products.product_tmpl_id.read([medium_field, minimum_field])
+        }
+
+        line_vals = []
+        for product in products:
+            group = product_groups[str(product.id)]
+            prices = tmpl_prices.get(product.product_tmpl_id.id, {})
+            requested_price = float(product_prices.get(str(product.id), 0))
+            line_vals.append({
                 'authorization_id': auth.id,
-                'product_id': product_id,
+                'product_id': product.id,
                 'quantity': group['total_quantity'],
                 'lot_count': len(group['lots']),
                 'requested_price': requested_price,
                 'authorized_price': requested_price,
-                'medium_price': medium_price,
-                'minimum_price': minimum_price
+                'medium_price': prices.get(medium_field) or 0.0,
+                'minimum_price': prices.get(minimum_field) or 0.0,
             })
+        if line_vals:
+            self.env['price.authorization.line'].create(line_vals)
         
         return {
             'success': True,
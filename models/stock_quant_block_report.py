@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""Reporte de compra de un BLOQUE (BlockReportDialog).
+
+Antes se recorría cada lote del bloque con una búsqueda de move lines de
+entrada y, si fallaba, otra de cualquier move line con línea de compra: un
+bloque de 120 placas eran hasta 240 consultas. Aquí la resolución
+lote → línea de compra (con el mismo fallback) es UNA consulta con joins
+para todos los lotes del bloque (_iv_block_lot_purchase_lines).
+
+El reporte terminado se guarda en la ormcache por nombre de bloque
+normalizado y una HUELLA transaccional (_iv_block_report_stamp: conteos y
+write_date máximos de lotes, productos, move lines, órdenes de compra y sus
+líneas, más el estado de las facturas, en UNA consulta). Como la huella se
+lee con el MISMO snapshot que el reporte, una petición nunca guarda datos
+viejos bajo una llave nueva; recepciones, cambios de compra o facturas
+nuevas cambian la huella y la entrada vieja deja de usarse sola.
+"""
+import copy
+
+from odoo import api, models, tools
+from odoo.addons.inventory_visual_enhanced.models.som_date_format import som_format_date
+from odoo.addons.inventory_visual_enhanced.models.som_block_key import som_block_key
+
+
+class StockQuantBlockReport(models.Model):
+    _inherit = 'stock.quant'
+
+    # ------------------------------------------------------------------
+    # Huella (llave de la caché)
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_block_report_stamp(self, block_key):
+        """Huella de todo lo que lee el reporte del bloque, en UNA consulta.
+
+        Transaccional a propósito: una secuencia avanzada después del commit
+        (como antes) podía leerse NUEVA desde un snapshot VIEJO y el reporte
+        viejo quedaba en caché bajo la llave nueva para siempre."""
+        self.env.flush_all()
+        # Órdenes del bloque: por las move lines de sus lotes y, como en el
+        # FALLBACK B del reporte, por las filas de packing del bloque.
+        po_sources = ["""
+            SELECT pol.order_id FROM purchase_order_line pol
+             WHERE pol.id IN (SELECT purchase_line_id FROM mls)"""]
+        row_stamp = "NULL::bigint, NULL::timestamp"
+        if 'supplier.shipment.packing.row' in self.env:
+            Row = self.env['supplier.shipment.packing.row']
+            row_where = "lower(btrim(r.bloque)) = %(key)s"
+            row_stamp = (
+                "(SELECT count(*) FROM %s r WHERE %s), "
+                "(SELECT max(r.write_date) FROM %s r WHERE %s)"
+                % (Row._table, row_where, Row._table, row_where))
+            packing_field = Row._fields.get('packing_id')
+            if packing_field:
+                Packing = self.env[packing_field.comodel_name]
+                purchase_field = Packing._fields.get('purchase_id')
+                if purchase_field and purchase_field.store:
+                    po_sources.append("""
+            SELECT p.purchase_id FROM %s r JOIN %s p ON p.id = r.packing_id
+             WHERE %s""" % (Row._table, Packing._table, row_where))
+        self.env.cr.execute("""
+            WITH lots AS (
+                SELECT id, product_id, write_date
+                  FROM stock_lot WHERE x_iv_block_key = %%(key)s
+            ), mls AS (
+                SELECT sml.id, sml.write_date, sm.write_date AS move_date,
+                       sm.purchase_line_id
+                  FROM stock_move_line sml
+             LEFT JOIN stock_move sm ON sm.id = sml.move_id
+                 WHERE sml.lot_id IN (SELECT id FROM lots)
+            ), pos AS (%s
+            ), pols AS (
+                SELECT id, write_date FROM purchase_order_line
+                 WHERE order_id IN (SELECT order_id FROM pos)
+            ), bills AS (
+                SELECT DISTINCT am.id, am.write_date, am.state, am.payment_state,
+                       am.amount_total
+                  FROM account_move_line aml
+                  JOIN account_move am ON am.id = aml.move_id
+                 WHERE aml.purchase_line_id IN (SELECT id FROM pols)
+            )
+            SELECT (SELECT count(*) FROM lots),
+                   (SELECT max(write_date) FROM lots),
+                   (SELECT max(write_date) FROM product_product
+                     WHERE id IN (SELECT product_id FROM lots)),
+                   (SELECT count(*) FROM mls),
+                   (SELECT max(write_date) FROM mls),
+                   (SELECT max(move_date) FROM mls),
+                   (SELECT max(write_date) FROM purchase_order
+                     WHERE id IN (SELECT order_id FROM pos)),
+                   (SELECT count(*) FROM pols),
+                   (SELECT max(write_date) FROM pols),
+                   -- Estado / pago de las facturas por VALOR: el estado de
+                   -- pago se recalcula al conciliar.
+                   (SELECT md5(string_agg(concat_ws(':', id, write_date, state,
+                                                    payment_state, amount_total),
+                                          ',' ORDER BY id))
+                      FROM bills),
+                   %s
+        """ % (" UNION ".join(po_sources), row_stamp), {'key': block_key})
+        return tuple(self.env.cr.fetchone())
+
+    # ------------------------------------------------------------------
+    # Resolución en lote
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_block_lot_purchase_lines(self, lots):
+        """{lot_id: (cantidad recibida, purchase_line_id)} en UNA consulta.
+
+        - Cantidad: suma de move lines de pickings de ENTRADA.
+        - Línea de compra: la de una move line de entrada; FALLBACK A, la
+          de cualquier move line del lote cuyo move venga de una compra
+          (lotes ya en STOCK: la recepción física de Torre de Control los
+          recrea/renumera en un picking INTERNO, sin move lines de entrada).
+        """
+        if not lots:
+            return {}
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT sml.lot_id,
+                   COALESCE(SUM(sml.quantity) FILTER (WHERE spt.code = 'incoming'), 0),
+                   (ARRAY_AGG(sm.purchase_line_id
+                              ORDER BY (spt.code = 'incoming') DESC NULLS LAST, sml.id)
+                    FILTER (WHERE sm.purchase_line_id IS NOT NULL))[1]
+              FROM stock_move_line sml
+              JOIN stock_move sm ON sm.id = sml.move_id
+         LEFT JOIN stock_picking sp ON sp.id = sml.picking_id
+         LEFT JOIN stock_picking_type spt ON spt.id = sp.picking_type_id
+             WHERE sml.lot_id IN %s
+          GROUP BY sml.lot_id
+        """, (tuple(lots.ids),))
+        return {lot_id: (qty, po_line_id) for lot_id, qty, po_line_id in self.env.cr.fetchall()}
+
+    # ------------------------------------------------------------------
+    # Reporte
+    # ------------------------------------------------------------------
+
+    @api.model
+    def get_block_purchase_report(self, block_name):
+        """Reporte de compra de un BLOQUE: costo por lote, info general de la
+        compra, todo lo comprado en la(s) misma(s) orden(es) y facturas. Camino:
+        stock.lot(x_bloque) → stock.move.line(incoming) → purchase.order.line → PO."""
+        block_name = (block_name or '').strip()
+        if not block_name:
+            return {'block_name': block_name, 'has_data': False}
+        block_key = som_block_key(block_name)
+        report = copy.deepcopy(self._iv_block_purchase_report_cached(
+            block_key, self._iv_block_report_stamp(block_key)))
+        # La llave va normalizada; el título, como se pidió.
+        report['block_name'] = block_name
+        return report
+
+    @api.model
+    @tools.ormcache('block_key', 'stamp', 'self.env.company.id', 'self.env.lang')
+    def _iv_block_purchase_report_cached(self, block_key, stamp):
+        """Reporte del bloque. 'stamp' solo forma parte de la llave.
+        NO modificar el resultado: get_block_purchase_report lo copia."""
+        empty = {'block_name': block_key, 'has_data': False}
+
+        Lot = self.env['stock.lot'].sudo()
+        lots = Lot.search([('x_iv_block_key', '=', block_key)])
+        if not lots:
+            return empty
+
+        PurchaseLine = self.env['purchase.order.line'].sudo()
+        resolved = self._iv_block_lot_purchase_lines(lots)
+        lot_info = []          # por lote del bloque: qty + po_line
+        for lot in lots:
+            qty, po_line_id = resolved.get(lot.id, (0.0, None))
+            if not qty:
+                # Sin recepción de entrada: usa la existencia actual del lote.
+                qty = lot.product_qty or 0.0
+            lot_info.append({
+                'lot': lot,
+                'qty': qty,
+                'po_line': PurchaseLine.browse(po_line_id) if po_line_id else PurchaseLine,
+            })
+
+        pos = PurchaseLine.browse(
+            list({info['po_line'].id for info in lot_info if info['po_line']})
+        ).mapped('order_id')
+
+        # FALLBACK B — Bloques del portal del proveedor: la fila de packing
+        # capturada por el proveedor conserva el nombre del bloque y su packing
+        # está ligado a la PO (related almacenado). Cubre lotes históricos sin
+        # ningún vínculo por move lines. Retroactivo: todo se resuelve al vuelo.
+        if not pos and 'supplier.shipment.packing.row' in self.env:
+            rows = self.env['supplier.shipment.packing.row'].sudo().browse(
+                self._iv_block_record_ids(
+                    'supplier.shipment.packing.row', [block_key])[block_key])
+            if rows:
+                pos = rows.mapped('packing_id.purchase_id')
+
+        valid_pos = pos.filtered(lambda p: p.state in ('purchase', 'done')) or pos
+
+        # Costo por lote sin vínculo directo: empatar por producto dentro de
+        # las órdenes encontradas (mejor aproximación que el costo estándar).
+        # Un dict por producto en lugar de filtrar las líneas por cada lote.
+        if valid_pos:
+            line_by_product = {}
+            for line in valid_pos.mapped('order_line'):
+                line_by_product.setdefault(line.product_id.id, line)
+            for info in lot_info:
+                if not info['po_line']:
+                    info['po_line'] = line_by_product.get(
+                        info['lot'].product_id.id, PurchaseLine)
+        main_po = valid_pos[:1]
+        currency = (main_po.currency_id if main_po else self.env.company.currency_id)
+        cur_symbol = currency.symbol or '$'
+
+        def _g(rec, field):
+            return getattr(rec, field) if hasattr(rec, field) else ''
+
+        # --- Costo por lote (de ESTE bloque) ---
+        block_lots = []
+        block_total_cost = 0.0
+        block_total_qty = 0.0
+        for info in lot_info:
+            lot = info['lot']
+            unit = info['po_line'].price_unit if info['po_line'] else (lot.product_id.standard_price or 0.0)
+            total = unit * (info['qty'] or 0.0)
+            block_total_cost += total
+            block_total_qty += info['qty'] or 0.0
+            block_lots.append({
+                'lot_name': lot.name,
+                'numero_placa': _g(lot, 'x_numero_placa') or '',
+                'product': lot.product_id.display_name,
+                'qty': info['qty'] or 0.0,
+                'unit_cost': unit,
+                'total_cost': total,
+            })
+        block_lots.sort(key=lambda x: x['lot_name'])
+        block_po_line_set = {info['po_line'].id for info in lot_info if info['po_line']}
+
+        # --- Todo lo comprado en la(s) misma(s) orden(es) ---
+        purchase_lines = []
+        po_total = 0.0
+        for po in valid_pos:
+            for pl in po.order_line:
+                uom = getattr(pl, 'product_uom_id', False) or getattr(pl, 'product_uom', False)
+                purchase_lines.append({
+                    'po_name': po.name,
+                    'product': pl.product_id.display_name,
+                    'qty': pl.product_qty,
+                    'uom': uom.name if uom else '',
+                    'unit_price': pl.price_unit,
+                    'subtotal': pl.price_subtotal,
+                    'is_block': pl.id in block_po_line_set,
+                })
+            po_total += po.amount_total
+
+        # --- Facturas ---
+        invoices = valid_pos.mapped('invoice_ids')
+        invoice_list = [{
+            'id': inv.id,
+            'name': inv.name or inv.ref or '(borrador)',
+            'date': som_format_date(inv.invoice_date, empty=''),
+            'amount': inv.amount_total,
+            'currency': inv.currency_id.symbol or '$',
+            'state': dict(inv._fields['state'].selection).get(inv.state, inv.state or ''),
+            'payment_state': dict(inv._fields['payment_state'].selection).get(inv.payment_state, '') if inv.payment_state else '',
+        } for inv in invoices]
+
+        # --- Info general (de los lotes del bloque) ---
+        def first_lot_attr(field):
+            for lot in lots:
+                v = _g(lot, field)
+                if v:
+                    return v
+            return ''
+
+        return {
+            'block_name': block_key,
+            'has_data': bool(valid_pos),
+            'supplier': main_po.partner_id.name if main_po else '',
+            'po_names': valid_pos.mapped('name'),
+            'po_ids': valid_pos.ids,
+            'date': som_format_date(main_po.date_order, empty='') if main_po else '',
+            'currency': cur_symbol,
+            'partner_ref': main_po.partner_ref if main_po else '',
+            'incoterm': (main_po.incoterm_id.code if main_po and main_po.incoterm_id else ''),
+            'pedimento': first_lot_attr('x_pedimento'),
+            'contenedor': first_lot_attr('x_contenedor'),
+            'ref_proveedor': first_lot_attr('x_referencia_proveedor'),
+            'lots_count': len(lots),
+            'block_lots': block_lots,
+            'block_total_cost': block_total_cost,
+            'block_total_qty': block_total_qty,
+            'purchase_lines': purchase_lines,
+            'po_total': po_total,
+            'invoices': invoice_list,
+        }
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Exportación (CSV / XLSX) de lo que muestran el Inventario Visual y el
+Walkthrough con los filtros actuales.
+
+Una fila por placa con las columnas del producto repetidas. Los detalles se
+resuelven con los MISMOS métodos por lote que usa la vista
+(get_quant_details / get_walkthrough_details), en tandas de
+_EXPORT_BATCH, y se entregan como generador: el controlador
+(controllers/main.py) escribe cada tanda al archivo y la suelta. Entre
+tandas se libera la caché del ORM, así que la memoria del worker no crece
+con el tamaño de la exportación.
+"""
+from odoo import api, models
+
+_EXPORT_BATCH = 500
+
+# (llave, encabezado). Las llaves 'product_*' vienen del grupo; el resto,
+# del detalle de la placa.
+IV_EXPORT_COLUMNS = {
+    'inventory': [
+        ('product_name', 'Producto'),
+        ('product_code', 'SKU'),
+        ('categ_name', 'Categoría'),
+        ('lot_name', 'Lote'),
+        ('numero_placa', 'Placa'),
+        ('bloque', 'Bloque'),
+        ('atado', 'Atado'),
+        ('location_name', 'Ubicación'),
+        ('quantity', 'Cantidad'),
+        ('reserved_quantity', 'Reservado'),
+        ('grosor', 'Grosor'),
+        ('alto', 'Alto'),
+        ('ancho', 'Ancho'),
+        ('color', 'Color'),
+        ('tipo', 'Tipo'),
+        ('pedimento', 'Pedimento'),
+        ('contenedor', 'Contenedor'),
+        ('referencia_proveedor', 'Ref. proveedor'),
+        ('status', 'Estado'),
+        ('eta', 'ETA'),
+    ],
+    'walkthrough': [
+        ('product_name', 'Producto'),
+        ('product_code', 'SKU'),
+        ('categ_name', 'Categoría'),
+        ('lot_name', 'Lote'),
+        ('numero_placa', 'Placa'),
+        ('bloque', 'Bloque'),
+        ('atado', 'Atado'),
+        ('location_name', 'Ubicación de salida'),
+        ('quantity', 'Cantidad'),
+        ('grosor', 'Grosor'),
+        ('alto', 'Alto'),
+        ('ancho', 'Ancho'),
+        ('color', 'Color'),
+        ('tipo', 'Tipo'),
+        ('status', 'Salida'),
+        ('exit_date', 'Fecha'),
+        ('exit_doc', 'Documento'),
+        ('exit_partner', 'Cliente / motivo'),
+    ],
+}
+
+
+class StockQuantExport(models.Model):
+    _inherit = 'stock.quant'
+
+    @api.model
+    def _iv_export_status(self, detail):
+        """Texto del estado de la placa, igual que los badges de la vista."""
+        exit_type = detail.get('exit_type')
+        if exit_type:
+            return 'Entregado' if exit_type == 'delivery' else 'Baja'
+        if detail.get('en_taller'):
+            return 'Taller'
+        if detail.get('en_orden_venta'):
+            return 'Comprometido'
+        if detail.get('tiene_hold'):
+            return 'Apartado'
+        if detail.get('is_transit'):
+            return 'Tránsito'
+        return 'Disponible'
+
+    @api.model
+    def _iv_export_visible(self, product, stock_mode):
+        """Mismo resguardo que isVisibleInMode (inventory_controller.js): en
+        cada modo solo productos CON existencia; en 'all' basta stock o
+        tránsito. Lo que la vista no muestra tampoco se exporta."""
+        stock_qty = product.get('stock_qty') or 0
+        transit_qty = product.get('transit_qty') or 0
+        if stock_mode == 'transit':
+            return transit_qty > 0
+        if stock_mode == 'stock':
+            return stock_qty > 0
+        return stock_qty > 0 or transit_qty > 0
+
+    @api.model
+    def _iv_export_rows(self, mode, filters=None):
+        """Generador de filas (listas, en el orden de IV_EXPORT_COLUMNS[mode])
+        para los filtros dados. Sin filtros no exporta nada: la vista
+        tampoco muestra nada sin filtros."""
+        filters = filters or {}
+        columns = [key for key, _label in IV_EXPORT_COLUMNS[mode]]
+        if mode == 'walkthrough':
+            result = self.get_walkthrough_grouped_by_product(filters)
+            ids_key = 'exit_keys'
+        else:
+            result = self.get_inventory_grouped_by_product(filters)
+            ids_key = 'quant_ids'
+
+        stock_mode = filters.get('stock_mode') or 'all'
+        for product in result.get('products') or []:
+            if mode == 'inventory' and not self._iv_export_visible(product, stock_mode):
+                continue
+            ids = product.get(ids_key) or []
+            for start in range(0, len(ids), _EXPORT_BATCH):
+                chunk = ids[start:start + _EXPORT_BATCH]
+                if mode == 'walkthrough':
+                    details = self.get_walkthrough_details(chunk, filters)
+                else:
+                    details = self.get_quant_details(chunk)
+                for detail in details:
+                    values = dict(detail)
+                    values.update({
+                        'product_name': product.get('product_name') or '',
+                        'product_code': product.get('product_code') or '',
+                        'categ_name': product.get('categ_name') or '',
+                        'status': self._iv_export_status(detail),
+                    })
+                    yield [self._iv_export_cell(values.get(key)) for key in columns]
+                # La tanda ya se escribió: fuera de la caché.
+                self.env.invalidate_all()
+
+    @staticmethod
+    def _iv_export_cell(value):
+        if value is None or value is False:
+            return ''
+        if isinstance(value, (int, float, str)):
+            return value
+        return str(value)
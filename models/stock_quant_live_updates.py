@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Avisos EN VIVO del Inventario Visual por el bus.
+
+Cuando otro usuario aparta un lote, confirma una venta o mueve una placa,
+las vistas abiertas se quedaban viejas hasta la siguiente búsqueda. Aquí se
+publica un aviso compacto por producto:
+
+    {'product_id': 12, 'quant_ids': [301, 302], 'buckets': ['stock', 'hold']}
+
+en el canal 'inventory_visual_enhanced/product/<id>'. El cliente se suscribe
+solo a los productos que tiene en pantalla y re-pide ÚNICAMENTE ese producto
+(contadores) y esos quants (filas).
+
+Los cambios se ACUMULAN durante la transacción y se envían una sola vez en
+el precommit: un picking de 200 placas manda un aviso por producto, no 200.
+Si la transacción hace rollback no se envía nada.
+
+Cada envío además avanza la VERSIÓN del inventario (una secuencia de
+PostgreSQL: no bloquea ni compite entre transacciones). La copia sin
+conexión del cliente (utils/offline_snapshot.js) se guarda con esa versión y
+solo se vuelve a pedir completa cuando cambió. La versión sube en el
+POSTCOMMIT, con los datos ya confirmados: la secuencia no es
+transaccional y, subida en el precommit, un cliente podía leer la versión
+nueva junto con los datos viejos (lee la versión ANTES que los datos) y
+guardar ese par para siempre.
+
+Buckets:
+- stock:     cantidad / ubicación / lote del quant.
+- committed: reservas y compromisos de venta.
+- hold:      apartados.
+
+LIMITACIÓN (apartados): el bucket 'hold' solo sale de los apartados que
+crea este módulo (create_lot_holds_bulk) o de un write explícito de
+x_tiene_hold / x_hold_activo_id. Esos campos son COMPUTADOS del módulo de
+apartados: cuando un apartado se crea, libera o vence por fuera (su
+formulario, su cron de vencimiento) el ORM los recalcula sin pasar por
+stock.quant.write y NO sale aviso; la vista lo ve en la siguiente
+búsqueda.
+"""
+from odoo import api, models
+
+IV_LIVE_CHANNEL = 'inventory_visual_enhanced/product/%s'
+IV_LIVE_MESSAGE = 'inventory_visual_enhanced/quant_changed'
+
+_PRECOMMIT_KEY = 'inventory_visual_enhanced.live_changes'
+_VERSION_SEQUENCE = 'inventory_visual_enhanced_version_seq'
+
+# Campos del quant que mueven cada bucket. Los x_* vienen de otros módulos
+# y solo cuentan si existen (y si alguien los escribe: ver LIMITACIÓN en el
+# docstring).
+_QUANT_BUCKET_FIELDS = {
+    'stock': ('quantity', 'location_id', 'lot_id', 'product_id'),
+    'committed': ('reserved_quantity',),
+    'hold': ('x_tiene_hold', 'x_hold_activo_id'),
+}
+
+# Campos de venta que cambian el compromiso de un lote.
+_SALE_LINE_FIELDS = ('lot_ids', 'product_uom_qty', 'x_lot_breakdown_json')
+
+
+class StockQuant(models.Model):
+    _inherit = 'stock.quant'
+
+    def init(self):
+        super().init()
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {_VERSION_SEQUENCE}")
+
+    @api.model
+    def get_inventory_version(self):
+        """Versión actual del inventario (sube con cada aviso en vivo)."""
+        # Recién creada la secuencia, last_value ya es 1 sin que nadie haya
+        # llamado nextval (is_called = false): el primer aviso también
+        # regresaría 1 y la copia sin conexión no notaría el cambio.
+        self.env.cr.execute(
+            f"SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {_VERSION_SEQUENCE}")
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _iv_queue_live_changes(self, quants, buckets):
+        """Encola un aviso para estos quants; se envía en el precommit."""
+        if not quants or not buckets:
+            return
+        data = self.env.cr.precommit.data
+        pending = data.get(_PRECOMMIT_KEY)
+        if pending is None:
+            pending = data[_PRECOMMIT_KEY] = {}
+            self.env.cr.precommit.add(self._iv_flush_live_changes)
+        for quant in quants:
+            product_id = quant.product_id.id
+            if not product_id:
+                continue
+            entry = pending.setdefault(product_id, {'quant_ids': set(), 'buckets': set()})
+            entry['quant_ids'].add(quant.id)
+            entry['buckets'].update(buckets)
+
+    def _iv_flush_live_changes(self):
+        pending = self.env.cr.precommit.data.pop(_PRECOMMIT_KEY, None)
+        if not pending:
+            return
+        registry = self.env.registry
+
+        def bump_version():
+            with registry.cursor() as cr:
+                cr.execute("SELECT nextval(%s)", (_VERSION_SEQUENCE,))
+
+        self.env.cr.postcommit.add(bump_version)
+        self.env['bus.bus'].sudo()._sendmany([
+            (
+                IV_LIVE_CHANNEL % product_id,
+                IV_LIVE_MESSAGE,
+                {
+                    'product_id': product_id,
+                    'quant_ids': sorted(entry['quant_ids']),
+                    'buckets': sorted(entry['buckets']),
+                },
+            )
+            for product_id, entry in pending.items()
+        ])
+
+    def _iv_live_buckets_for_vals(self, vals):
+        return {
+            bucket
+            for bucket, names in _QUANT_BUCKET_FIELDS.items()
+            if any(name in vals for name in names)
+        }
+
+    @api.model
+    def _iv_queue_live_changes_for_lots(self, lots, buckets):
+        """Avisos por lote (ventas, apartados): los quants con existencia
+        de esos lotes son los que la vista puede tener en pantalla."""
+        if not lots:
+            return
+        quants = self.sudo().search([
+            ('lot_id', 'in', lots.ids),
+            ('quantity', '>', 0),
+            ('location_id.usage', 'in', ('internal', 'production', 'transit')),
+        ])
+        self._iv_queue_live_changes(quants, buckets)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        quants = super().create(vals_list)
+        self._iv_queue_live_changes(quants, {'stock'})
+        return quants
+
+    def write(self, vals):
+        buckets = self._iv_live_buckets_for_vals(vals)
+        # Un cambio de producto/ubicación también debe avisar al producto
+        # VIEJO: se encola antes y después del write.
+        if 'stock' in buckets:
+            self._iv_queue_live_changes(self, buckets)
+        res = super().write(vals)
+        if buckets:
+            self._iv_queue_live_changes(self, buckets)
+        return res
+
+    def unlink(self):
+        self._iv_queue_live_changes(self, {'stock'})
+        return super().unlink()
+
+
+class SaleOrder(models.Model):
+    _inherit = 'sale.order'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'state' in vals and 'lot_ids' in self.env['sale.order.line']._fields:
+            self.env['stock.quant']._iv_queue_live_changes_for_lots(
+                self.order_line.lot_ids, {'committed'})
+        return res
+
+
+class SaleOrderLine(models.Model):
+    _inherit = 'sale.order.line'
+
+    def write(self, vals):
+        tracked = (
+            'lot_ids' in self._fields
+            and any(name in vals for name in _SALE_LINE_FIELDS)
+        )
+        # Antes Y después: quitar un lote de la línea también lo libera.
+        lots = self.lot_ids if tracked else None
+        res = super().write(vals)
+        if tracked:
+            self.env['stock.quant']._iv_queue_live_changes_for_lots(
+                lots | self.lot_ids, {'committed'})
+        return res
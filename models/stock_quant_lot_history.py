@@ -0,0 +1,625 @@
+# -*- coding: utf-8 -*-
+"""Historial detallado de un lote (HistoryDialog).
+
+Antes el historial hacía una búsqueda de stock.move.line POR cada línea de
+venta del producto, una de stock.lot.hold.order.line POR apartado y cargaba
+hasta 300 movimientos de golpe. Aquí cada sección sale de un número FIJO de
+consultas, sin importar cuánto se haya movido el lote:
+
+- movements / deliveries: paginadas en la base (search_count + una página).
+- sales_orders, reservations, assignments, purchase_info: por lote son
+  pocas; una búsqueda cada una y se paginan en memoria.
+- general_logs: línea de tiempo combinada. Para la página [offset,
+  offset + limit) basta con los primeros offset + limit movimientos más
+  recientes junto con los registros de las secciones chicas.
+
+get_lot_history regresa la PRIMERA página de cada sección más 'pages'
+({section: {total, loaded}}); el diálogo pide las siguientes con
+get_lot_history_page al pulsar "Cargar más".
+
+CACHÉ: casi todo el historial es inmutable (movimientos hechos, compras,
+entregas, apartados cerrados). Esas primeras páginas se guardan en la
+ormcache por lote bajo una HUELLA (_iv_history_stamp: conteos y
+write_date máximos de todo lo que las alimenta, en una sola consulta). Un
+movimiento, apartado o venta nuevos sobre el lote cambian la huella y la
+entrada vieja simplemente deja de usarse; no hay que invalidar a mano. Los
+segmentos se arman con sudo, acotados a las empresas activas, así que la
+llave es la misma para todos los vendedores (lote, huella, empresas e
+idioma): abrir el mismo lote cuesta una lectura de caché para cualquiera.
+Lo que depende de la hora (apartados activos, días en inventario) y la
+existencia actual del quant se calculan siempre: es la "cola viva".
+"""
+import copy
+from datetime import datetime
+
+from odoo import api, fields, models, tools
+from odoo.exceptions import UserError
+from odoo.addons.inventory_visual_enhanced.models.som_date_format import som_format_date
+
+_HISTORY_PAGE = 50
+_HISTORY_SECTIONS = (
+    'movements', 'sales_orders', 'reservations', 'assignments',
+    'deliveries', 'general_logs',
+)
+
+
+class StockQuantLotHistory(models.Model):
+    _inherit = 'stock.quant'
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_history_profile(self):
+        # Historial disponible para ventas E inventario (el rol de almacén lo
+        # necesita para etiquetas/traslados aunque no pueda vender ni apartar).
+        profile = self._iv_permission_profile()
+        if not (profile['is_sales_user'] or profile['is_inventory_user']):
+            raise UserError("No tiene permisos para ver el historial detallado. Contacte al administrador.")
+        return profile
+
+    @api.model
+    def _iv_history_company_domain(self, model_name):
+        """Empresas activas como condición EXPLÍCITA: los segmentos en caché
+        se arman con sudo (sin reglas de registro) y la llave lleva las
+        empresas; fuera de la caché es redundante con las reglas."""
+        if 'company_id' not in self.env[model_name]._fields:
+            return []
+        return [('company_id', 'in', self.env.companies.ids + [False])]
+
+    @api.model
+    def _iv_history_move_domain(self, lot):
+        return [('lot_id', '=', lot.id)] + self._iv_history_company_domain('stock.move.line')
+
+    @staticmethod
+    def _iv_history_selection(record, field_name):
+        return dict(record._fields[field_name]._description_selection(record.env)).get(
+            record[field_name], record[field_name] or '')
+
+    @staticmethod
+    def _iv_history_page_size(limit):
+        try:
+            limit = int(limit or _HISTORY_PAGE)
+        except (TypeError, ValueError):
+            limit = _HISTORY_PAGE
+        return max(1, min(limit, 500))
+
+    @staticmethod
+    def _iv_history_sort_logs(logs):
+        logs.sort(key=lambda x: x.get('fecha_obj') or datetime.min, reverse=True)
+        return logs
+
+    @staticmethod
+    def _iv_history_strip_logs(logs):
+        for log in logs:
+            log.pop('fecha_obj', None)
+        return logs
+
+    # ------------------------------------------------------------------
+    # Secciones paginadas en la base
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_history_movements(self, lot, offset=0, limit=_HISTORY_PAGE):
+        """(filas, logs) de una página de movimientos, más recientes primero.
+        Ubicaciones y usuarios se leen en lote por el prefetch del ORM."""
+        move_lines = self.env['stock.move.line'].search(
+            self._iv_history_move_domain(lot),
+            order='date desc, id desc', offset=offset, limit=limit,
+        )
+        movements = []
+        logs = []
+        for ml in move_lines:
+            icon = 'fa-arrow-right'
+            tipo = 'Transferencia'
+
+            if ml.location_id.usage != 'internal' and ml.location_dest_id.usage == 'internal':
+                icon = 'fa-arrow-down'
+                tipo = 'Entrada'
+            elif ml.location_id.usage == 'internal' and ml.location_dest_id.usage != 'internal':
+                icon = 'fa-arrow-up'
+                tipo = 'Salida'
+
+            ref = (ml.reference or ml.picking_id.name) if ml.picking_id else ''
+            movements.append({
+                'fecha': som_format_date(ml.date, empty='', with_time=True),
+                'tipo': tipo,
+                'icon': icon,
+                'origen': ml.location_id.complete_name,
+                'destino': ml.location_dest_id.complete_name,
+                'cantidad': ml.quantity,
+                'referencia': ref,
+                'usuario': ml.write_uid.name if ml.write_uid else '',
+            })
+
+            fecha_obj = ml.date or ml.create_date
+            logs.append({
+                'fecha_obj': fecha_obj,
+                'fecha': som_format_date(fecha_obj, empty='', with_time=True),
+                'usuario': ml.write_uid.name if ml.write_uid else 'Sistema',
+                'origen': f"Movimiento ({tipo})",
+                'descripcion': f"De: {ml.location_id.name} -> A: {ml.location_dest_id.name}. Documento: {ref}. Cantidad: {ml.quantity}"
+            })
+        return movements, logs
+
+    @api.model
+    def _iv_history_delivery_domain(self, lot):
+        return self._iv_history_move_domain(lot) + [
+            ('picking_id.picking_type_code', '=', 'outgoing'),
+        ]
+
+    @api.model
+    def _iv_history_deliveries(self, lot, offset=0, limit=_HISTORY_PAGE):
+        delivery_moves = self.env['stock.move.line'].search(
+            self._iv_history_delivery_domain(lot),
+            order='date desc, id desc', offset=offset, limit=limit,
+        )
+        return [{
+            'referencia': dm.picking_id.name,
+            'cliente': dm.picking_id.partner_id.name if dm.picking_id.partner_id else '',
+            'fecha_programada': som_format_date(dm.picking_id.scheduled_date, empty=''),
+            'fecha_efectiva': som_format_date(dm.date, empty=''),
+            'cantidad': dm.quantity,
+            'origen': dm.location_id.complete_name,
+            'estado': self._iv_history_selection(dm.picking_id, 'state'),
+        } for dm in delivery_moves]
+
+    # ------------------------------------------------------------------
+    # Secciones chicas (una búsqueda, paginadas en memoria)
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_history_purchases(self, lot):
+        purchase_info = []
+        logs = []
+        purchase_lines = self.env['purchase.order.line'].search([
+            ('product_id', '=', lot.product_id.id)
+        ] + self._iv_history_company_domain('purchase.order.line'),
+            limit=5, order='create_date desc')
+
+        for pol in purchase_lines:
+            purchase_info.append({
+                'orden_compra': pol.order_id.name,
+                'proveedor': pol.order_id.partner_id.name,
+                'fecha_orden': som_format_date(pol.order_id.date_order, empty=''),
+                'cantidad': pol.product_qty,
+                'precio_unitario': pol.price_unit,
+                'total': pol.price_subtotal,
+                'moneda': pol.order_id.currency_id.symbol,
+                'estado': self._iv_history_selection(pol.order_id, 'state'),
+            })
+
+            fecha_obj = pol.order_id.date_order or pol.create_date
+            logs.append({
+                'fecha_obj': fecha_obj,
+                'fecha': som_format_date(fecha_obj, empty='', with_time=True),
+                'usuario': pol.create_uid.name if pol.create_uid else 'Sistema',
+                'origen': 'Compra',
+                'descripcion': f"Orden de compra {pol.order_id.name} al proveedor {pol.order_id.partner_id.name} (Cant: {pol.product_qty})"
+            })
+        return purchase_info, logs
+
+    @api.model
+    def _iv_history_sales(self, lot):
+        """Líneas de venta confirmadas que usaron el lote, en UNA búsqueda
+        de movimientos (antes: una por cada línea de venta del producto)."""
+        sale_lines = self.env['stock.move'].search([
+            ('move_line_ids.lot_id', '=', lot.id),
+            ('sale_line_id', '!=', False),
+        ] + self._iv_history_company_domain('stock.move')).mapped('sale_line_id').filtered(
+            lambda sol: sol.order_id.state in ('sale', 'done')
+        ).sorted(
+            lambda sol: sol.order_id.date_order or sol.create_date or datetime.min,
+            reverse=True,
+        )
+
+        sales_orders = []
+        logs = []
+        for sol in sale_lines:
+            sales_orders.append({
+                'orden_venta': sol.order_id.name,
+                'cliente': sol.order_id.partner_id.name,
+                'vendedor': sol.order_id.user_id.name if sol.order_id.user_id else '',
+                'fecha_orden': som_format_date(sol.order_id.date_order, empty=''),
+                'cantidad': sol.product_uom_qty,
+                'precio_unitario': sol.price_unit,
+                'total': sol.price_subtotal,
+                'moneda': sol.order_id.currency_id.symbol,
+                'estado': self._iv_history_selection(sol.order_id, 'state'),
+            })
+
+            fecha_obj = sol.order_id.date_order or sol.create_date
+            logs.append({
+                'fecha_obj': fecha_obj,
+                'fecha': som_format_date(fecha_obj, empty='', with_time=True),
+                'usuario': sol.order_id.user_id.name if sol.order_id.user_id else 'Sistema',
+                'origen': 'Venta',
+                'descripcion': f"Orden de venta {sol.order_id.name} confirmada al cliente {sol.order_id.partner_id.name}"
+            })
+        return sales_orders, logs
+
+    @api.model
+    def _iv_history_hold_orders(self, holds):
+        """{hold_id: orden de reserva} en una sola búsqueda."""
+        if not holds or 'stock.lot.hold.order.line' not in self.env:
+            return {}
+        OrderLine = self.env['stock.lot.hold.order.line'].sudo()
+        hold_field = 'hold_id' if 'hold_id' in OrderLine._fields else 'hold_ids'
+        result = {}
+        for line in OrderLine.search([(hold_field, 'in', holds.ids)]):
+            for hold in line[hold_field]:
+                if line.order_id:
+                    result.setdefault(hold.id, line.order_id)
+        return result
+
+    @api.model
+    def _iv_history_hold_model(self):
+        if 'x_hold_ids' not in self._fields:
+            return None
+        return self.env[self._fields['x_hold_ids'].comodel_name]
+
+    @api.model
+    def _iv_history_holds(self, lot, active=None):
+        """Apartados del LOTE (también para filas del Walkthrough, que no
+        traen quant), activos primero y luego por fecha de creación.
+        active=True/False limita a activos / cerrados."""
+        Hold = self._iv_history_hold_model()
+        if Hold is None:
+            return [], []
+        domain = [('lot_id', '=', lot.id)] + self._iv_history_company_domain(Hold._name)
+        if active is not None:
+            domain.append(('estado', '=' if active else '!=', 'activo'))
+        holds = Hold.search(domain, order='create_date desc, id desc')
+        hold_orders = self._iv_history_hold_orders(holds)
+
+        reservations = []
+        logs = []
+        for hold in holds:
+            estado_raw = hold.estado or ''
+            try:
+                estado_display = self._iv_history_selection(hold, 'estado')
+            except Exception:
+                estado_display = estado_raw
+
+            cancel_info = {}
+            if estado_raw in ('cancelado', 'expirado'):
+                cancel_info = {
+                    'tipo_cancelacion': 'Expiración automática' if estado_raw == 'expirado' else 'Cancelación manual',
+                    'cancelado_por': 'Sistema (Cron)' if estado_raw == 'expirado' else (hold.write_uid.name if hold.write_uid else 'Desconocido'),
+                    'fecha_cancelacion': som_format_date(hold.write_date, empty='', with_time=True),
+                }
+
+            duracion_dias = 0
+            if hold.fecha_inicio:
+                if estado_raw in ('cancelado', 'expirado') and hold.write_date:
+                    duracion_dias = (hold.write_date - hold.fecha_inicio).days
+                else:
+                    duracion_dias = (fields.Datetime.now() - hold.fecha_inicio).days
+
+            logs.append({
+                'fecha_obj': hold.create_date,
+                'fecha': som_format_date(hold.create_date, empty='', with_time=True),
+                'usuario': hold.create_uid.name if hold.create_uid else 'Sistema',
+                'origen': 'Apartado (Creación)',
+                'descripcion': f"Apartado creado para cliente: {hold.partner_id.name if hold.partner_id else '-'}"
+            })
+
+            if estado_raw in ('cancelado', 'expirado') and hold.write_date:
+                logs.append({
+                    'fecha_obj': hold.write_date,
+                    'fecha': som_format_date(hold.write_date, empty='', with_time=True),
+                    'usuario': hold.write_uid.name if hold.write_uid and estado_raw != 'expirado' else 'Sistema',
+                    'origen': f"Apartado ({estado_raw.capitalize()})",
+                    'descripcion': f"El apartado cambió a estado: {estado_raw.upper()}"
+                })
+
+            order = hold_orders.get(hold.id)
+            reservations.append({
+                'id': hold.id,
+                'name': hold.name or '',
+                'tipo': 'Apartado Manual',
+                'estado': estado_display,
+                'estado_raw': estado_raw,
+                'partner': hold.partner_id.name if hold.partner_id else '',
+                'partner_ref': hold.partner_id.ref or '' if hold.partner_id else '',
+                'partner_email': hold.partner_id.email or '' if hold.partner_id else '',
+                'vendedor': hold.user_id.name if hold.user_id else '',
+                'vendedor_email': hold.user_id.email if hold.user_id else '',
+                'proyecto': hold.project_id.name if hold.project_id else '',
+                'arquitecto': hold.arquitecto_id.name if hold.arquitecto_id else '',
+                'fecha_inicio': som_format_date(hold.fecha_inicio, empty='', with_time=True),
+                'fecha_expiracion': som_format_date(hold.fecha_expiracion, empty='', with_time=True),
+                'fecha_creacion': som_format_date(hold.create_date, empty='', with_time=True),
+                'ultima_modificacion': som_format_date(hold.write_date, empty='', with_time=True),
+                'creado_por': hold.create_uid.name if hold.create_uid else '',
+                'modificado_por': hold.write_uid.name if hold.write_uid else '',
+                'lote_nombre': hold.lot_id.name if hold.lot_id else '',
+                'ubicacion': hold.ubicacion_id.complete_name if hold.ubicacion_id else '',
+                'duracion_dias': duracion_dias,
+                'dias_restantes': hold.dias_restantes if estado_raw == 'activo' else 0,
+                'notas': hold.notas or '',
+                'cancel_info': cancel_info,
+                'hold_order_name': order.name or '' if order else '',
+                'hold_order_state': self._iv_history_selection(order, 'state') if order else '',
+                'hold_order_sale': order.sale_order_id.name if order and order.sale_order_id else '',
+            })
+
+        # Ya vienen por creación descendente: sort estable = activos primero.
+        reservations.sort(key=lambda r: 0 if r['estado_raw'] == 'activo' else 1)
+        return reservations, logs
+
+    @api.model
+    def _iv_history_assignments(self, lot):
+        # BITÁCORA DE ASIGNACIÓN (stock.lot.assignment.log)
+        # Responde "¿a qué pedido se asignó esta placa y quién se la quitó?".
+        # Es la ÚNICA fuente: sale.order.line.lot_ids es un many2many sin
+        # tracking, así que antes de esta bitácora una desasignación no
+        # dejaba rastro en la base.
+        assignments = []
+        logs = []
+        if 'stock.lot.assignment.log' not in self.env:
+            return assignments, logs
+        for entry in self.env['stock.lot.assignment.log'].som_get_lot_trail(lot.id):
+            fecha_obj = entry.pop('date_obj', None)
+            entry['fecha'] = som_format_date(fecha_obj, empty='', with_time=True)
+            assignments.append(entry)
+
+            descripcion = '%s %s' % (
+                'Asignada a' if entry['action'] == 'assign' else 'Desasignada de',
+                entry['documento'] or 'documento sin nombre')
+            if entry['cliente']:
+                descripcion += ' (cliente %s)' % entry['cliente']
+            if entry['motivo']:
+                descripcion += ' — %s' % entry['motivo']
+
+            logs.append({
+                'fecha_obj': fecha_obj,
+                'fecha': entry['fecha'],
+                'usuario': entry['usuario'],
+                'origen': 'Asignación' if entry['action'] == 'assign' else 'Desasignación',
+                'descripcion': descripcion,
+            })
+        return assignments, logs
+
+    @api.model
+    def _iv_history_small_sections(self, lot, profile):
+        """Secciones chicas completas: {section: (filas, logs)}."""
+        sections = {
+            'sales_orders': self._iv_history_sales(lot),
+            'reservations': self._iv_history_holds(lot),
+            'assignments': self._iv_history_assignments(lot),
+        }
+        if profile['is_purchase_user']:
+            sections['purchase_info'] = self._iv_history_purchases(lot)
+        else:
+            sections['purchase_info'] = ([], [])
+        return sections
+
+    @api.model
+    def _iv_history_timeline(self, lot, small_sections, offset, limit, move_logs=None):
+        """(página, total) de la línea de tiempo combinada."""
+        if move_logs is None:
+            move_logs = self._iv_history_movements(lot, 0, offset + limit)[1]
+        logs = list(move_logs)
+        for _rows, section_logs in small_sections.values():
+            logs.extend(dict(log) for log in section_logs)
+        self._iv_history_sort_logs(logs)
+        total = self.env['stock.move.line'].search_count(self._iv_history_move_domain(lot)) \
+            + sum(len(section_logs) for _rows, section_logs in small_sections.values())
+        return self._iv_history_strip_logs(logs[offset:offset + limit]), total
+
+    # ------------------------------------------------------------------
+    # Segmentos inmutables en caché
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_history_stamp(self, lot):
+        """Huella de todo lo que alimenta los segmentos en caché, en UNA
+        consulta: movimientos del lote (y sus moves, pickings y pedidos de
+        venta), apartados, bitácora de asignación y compras del producto."""
+        self.env.flush_all()
+        selects = [
+            """SELECT count(sml.id), max(sml.id), max(sml.write_date),
+                      max(sm.write_date), max(sp.write_date), max(so.write_date)
+                 FROM stock_move_line sml
+            LEFT JOIN stock_move sm ON sm.id = sml.move_id
+            LEFT JOIN stock_picking sp ON sp.id = sml.picking_id
+            LEFT JOIN sale_order_line sol ON sol.id = sm.sale_line_id
+            LEFT JOIN sale_order so ON so.id = sol.order_id
+                WHERE sml.lot_id = %(lot)s""",
+            """SELECT count(id), max(id), max(write_date), NULL, NULL, NULL
+                 FROM purchase_order_line WHERE product_id = %(product)s""",
+        ]
+        Hold = self._iv_history_hold_model()
+        if Hold is not None:
+            selects.append(
+                "SELECT count(id), max(id), max(write_date), NULL, NULL, NULL "
+                "FROM %s WHERE lot_id = %%(lot)s" % Hold._table)
+        if 'stock.lot.assignment.log' in self.env:
+            Log = self.env['stock.lot.assignment.log']
+            if 'lot_id' in Log._fields:
+                selects.append(
+                    "SELECT count(id), max(id), max(write_date), NULL, NULL, NULL "
+                    "FROM %s WHERE lot_id = %%(lot)s" % Log._table)
+        self.env.cr.execute(
+            " UNION ALL ".join("(%s)" % sql for sql in selects),
+            {'lot': lot.id, 'product': lot.product_id.id},
+        )
+        return tuple(tuple(row) for row in self.env.cr.fetchall())
+
+    @api.model
+    @tools.ormcache('lot_id', 'stamp', 'page_size', 'with_purchases',
+                    'tuple(self.env.companies.ids)', 'self.env.lang')
+    def _iv_history_segments(self, lot_id, stamp, page_size, with_purchases):
+        """Primeras páginas de las secciones inmutables. 'stamp' solo forma
+        parte de la llave: si el lote cambió, es otra entrada. Se arman con
+        sudo (el mismo resultado para cualquier vendedor) y acotadas a las
+        empresas activas, que van en la llave junto con el idioma de las
+        etiquetas. Las compras solo con with_purchases (perfil de compras).
+        NO modificar el resultado (es el objeto de la caché):
+        get_lot_history lo copia."""
+        Quant = self.sudo()
+        lot = Quant.env['stock.lot'].with_context(active_test=False).browse(lot_id)
+        MoveLine = Quant.env['stock.move.line']
+        lot_domain = Quant._iv_history_move_domain(lot)
+        movements, move_logs = Quant._iv_history_movements(lot, 0, page_size)
+        return {
+            'movements': (movements, move_logs),
+            'deliveries': Quant._iv_history_deliveries(lot, 0, page_size),
+            'sales_orders': Quant._iv_history_sales(lot),
+            'closed_reservations': Quant._iv_history_holds(lot, active=False),
+            'assignments': Quant._iv_history_assignments(lot),
+            'purchase_info': Quant._iv_history_purchases(lot) if with_purchases else ([], []),
+            'counts': {
+                'movements': MoveLine.search_count(lot_domain),
+                'deliveries': MoveLine.search_count(Quant._iv_history_delivery_domain(lot)),
+                'entradas': MoveLine.search_count(
+                    lot_domain + [('location_dest_id.usage', '=', 'internal')]),
+                'salidas': MoveLine.search_count(
+                    lot_domain + [('location_id.usage', '=', 'internal')]),
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # API del diálogo
+    # ------------------------------------------------------------------
+
+    @api.model
+    def get_lot_history(self, quant_id=None, lot_id=None, page_size=_HISTORY_PAGE):
+        profile = self._iv_history_profile()
+
+        quant, lot = self._iv_resolve_lot_ref(quant_id, lot_id)
+        if not lot:
+            return {'error': 'Lote no encontrado'}
+
+        page_size = self._iv_history_page_size(page_size)
+
+        general_info = {
+            'lot_id': lot.id,
+            'product_name': lot.product_id.display_name,
+            'product_code': lot.product_id.default_code or '',
+            'lot_name': lot.name,
+            'fecha_creacion': som_format_date(lot.create_date, empty=''),
+            'estado_actual': 'Disponible',
+            'ubicacion_actual': quant.location_id.complete_name,
+            'cantidad_actual': quant.quantity,
+            'cantidad_reservada': quant.reserved_quantity,
+            'cantidad_disponible': quant.quantity - quant.reserved_quantity,
+        }
+
+        segments = copy.deepcopy(self._iv_history_segments(
+            lot.id, self._iv_history_stamp(lot), page_size,
+            profile['is_purchase_user']))
+        counts = segments['counts']
+        total_moves = counts['movements']
+        total_deliveries = counts['deliveries']
+        movements, move_logs = segments['movements']
+        deliveries = segments['deliveries']
+
+        # Cola viva: apartados activos (días restantes / duración cambian
+        # con la hora). Van antes que los cerrados, como siempre.
+        active_rows, active_logs = self._iv_history_holds(lot, active=True)
+        closed_rows, closed_logs = segments['closed_reservations']
+        small = {
+            'sales_orders': segments['sales_orders'],
+            'reservations': (active_rows + closed_rows, active_logs + closed_logs),
+            'assignments': segments['assignments'],
+            'purchase_info': segments['purchase_info'],
+        }
+
+        # Primera página de la línea de tiempo: los page_size movimientos
+        # más recientes ya están en move_logs.
+        general_logs = list(move_logs)
+        for _rows, section_logs in small.values():
+            general_logs.extend(section_logs)
+        self._iv_history_sort_logs(general_logs)
+        total_logs = len(general_logs) - len(move_logs) + total_moves
+        general_logs = self._iv_history_strip_logs(general_logs[:page_size])
+
+        sales_orders = small['sales_orders'][0]
+        reservations = small['reservations'][0]
+        assignments = small['assignments'][0]
+
+        dias_inventario = 0
+        if lot.create_date:
+            dias_inventario = (datetime.now() - lot.create_date).days
+
+        statistics = {
+            'total_movimientos': total_moves,
+            'total_entradas': counts['entradas'],
+            'total_salidas': counts['salidas'],
+            'total_ventas': len(sales_orders),
+            'total_apartados': len(reservations),
+            'total_entregas': total_deliveries,
+            'dias_en_inventario': dias_inventario,
+            'total_asignaciones': sum(1 for a in assignments if a['action'] == 'assign'),
+            'total_desasignaciones': sum(1 for a in assignments if a['action'] == 'unassign'),
+        }
+
+        totals = {
+            'movements': total_moves,
+            'sales_orders': len(sales_orders),
+            'reservations': len(reservations),
+            'assignments': len(assignments),
+            'deliveries': total_deliveries,
+            'general_logs': total_logs,
+        }
+        sections = {
+            'movements': movements,
+            'sales_orders': sales_orders[:page_size],
+            'reservations': reservations[:page_size],
+            'assignments': assignments[:page_size],
+            'deliveries': deliveries,
+            'general_logs': general_logs,
+        }
+
+        return {
+            'general_info': general_info,
+            'statistics': statistics,
+            'purchase_info': small['purchase_info'][0],
+            'has_purchase_permissions': profile['is_purchase_user'],
+            **sections,
+            'page_size': page_size,
+            'pages': {
+                section: {'total': totals[section], 'loaded': len(sections[section])}
+                for section in _HISTORY_SECTIONS
+            },
+        }
+
+    @api.model
+    def get_lot_history_page(self, section, quant_id=None, lot_id=None,
+                             offset=0, limit=_HISTORY_PAGE):
+        """Siguiente página de UNA sección del historial: {rows, total}."""
+        profile = self._iv_history_profile()
+        if section not in _HISTORY_SECTIONS:
+            return {'error': 'Sección de historial desconocida'}
+
+        _quant, lot = self._iv_resolve_lot_ref(quant_id, lot_id)
+        if not lot:
+            return {'error': 'Lote no encontrado'}
+
+        limit = self._iv_history_page_size(limit)
+        offset = max(int(offset or 0), 0)
+        MoveLine = self.env['stock.move.line']
+
+        if section == 'movements':
+            rows = self._iv_history_movements(lot, offset, limit)[0]
+            total = MoveLine.search_count(self._iv_history_move_domain(lot))
+        elif section == 'deliveries':
+            rows = self._iv_history_deliveries(lot, offset, limit)
+            total = MoveLine.search_count(self._iv_history_delivery_domain(lot))
+        elif section == 'general_logs':
+            small = self._iv_history_small_sections(lot, profile)
+            rows, total = self._iv_history_timeline(lot, small, offset, limit)
+        else:
+            builder = {
+                'sales_orders': self._iv_history_sales,
+                'reservations': self._iv_history_holds,
+                'assignments': self._iv_history_assignments,
+            }[section]
+            all_rows = builder(lot)[0]
+            rows = all_rows[offset:offset + limit]
+            total = len(all_rows)
+
+        return {'rows': rows, 'total': total}
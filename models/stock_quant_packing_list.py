@@ -4,6 +4,26 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+# Cascada renglón de PL <-> quant, de la coincidencia más precisa a la más
+# flexible: (campo del renglón, operador, llave de
+# _iv_get_quant_matching_values). Un criterio aplica solo si sus campos
+# existen en el renglón y el quant trae todos sus valores.
+_IV_PACKING_ROW_CRITERIA = (
+    # 1. Número de placa exacto
+    (("numero_placa", "=", "numero_placa"),),
+    # 2. Referencia proveedor exacta
+    (("ref_proveedor", "=", "ref_proveedor"),),
+    # 3. Bloque + atado
+    (("bloque", "=", "bloque"), ("atado", "=", "atado")),
+    # 4. Pedimento + bloque
+    (("pedimento", "=", "pedimento"), ("bloque", "=", "bloque")),
+    # 5. Contenedor + bloque
+    (("container_id.container_number", "=", "contenedor"), ("bloque", "=", "bloque")),
+    # 6. Búsquedas flexibles
+    (("numero_placa", "ilike", "numero_placa"),),
+    (("ref_proveedor", "ilike", "ref_proveedor"),),
+)
+
 
 class StockQuantPackingList(models.Model):
     _inherit = "stock.quant"
@@ -38,7 +58,7 @@ class StockQuantPackingList(models.Model):
         Por eso no conviene depender únicamente del lote para resolver el PL.
         """
         for record, field_names in records_and_fields:
-            if not record or not record.exists():
+            if not record:
                 continue
 
             for field_name in field_names:
@@ -66,7 +86,7 @@ class StockQuantPackingList(models.Model):
         """
         Resuelve el embarque supplier.shipment desde un renglón de Packing List.
         """
-        if not row or not row.exists():
+        if not row:
             return False
 
         # 1. Campo related/directo shipment_id en el row
@@ -75,7 +95,7 @@ class StockQuantPackingList(models.Model):
 
         # 2. A través del packing
         packing = row.packing_id if "packing_id" in row._fields else False
-        if packing and packing.exists():
+        if packing:
             if "shipment_id" in packing._fields and packing.shipment_id:
                 return packing.shipment_id.sudo()
 
@@ -92,7 +112,7 @@ class StockQuantPackingList(models.Model):
         """
         Devuelve información navegable desde supplier.shipment.packing.row.
         """
-        if not row or not row.exists():
+        if not row:
             return {}
 
         packing = row.packing_id if "packing_id" in row._fields else False
@@ -145,7 +165,7 @@ class StockQuantPackingList(models.Model):
         Fallback cuando se encuentra supplier.shipment, aunque no se encuentre
         el renglón exacto del Packing List.
         """
-        if not shipment or not shipment.exists():
+        if not shipment:
             return {}
 
         if not packing and "packing_ids" in shipment._fields and shipment.packing_ids:
@@ -180,7 +200,7 @@ class StockQuantPackingList(models.Model):
         no existe supplier.shipment vinculado al viaje, pero sí existe
         stock.transit.voyage. Entonces el PL abre el embarque de Torre de Control.
         """
-        if not voyage or not voyage.exists():
+        if not voyage:
             return {}
 
         return {
@@ -354,6 +374,41 @@ class StockQuantPackingList(models.Model):
 
         return False
 
+    @api.model
+    def _iv_batch_find_shipments_from_picking(self, quants):
+        """
+        Versión batch de _iv_find_shipment_from_picking_for_quant para el
+        detalle: {(lot_id, product_id): supplier.shipment} con UNA búsqueda
+        (la más reciente gana, como el order="id desc" por quant).
+        """
+        if "supplier_shipment_id" not in self.env["stock.picking"]._fields:
+            return {}
+
+        quants = quants.filtered(lambda q: q.lot_id and q.product_id)
+        if not quants:
+            return {}
+
+        try:
+            move_lines = self.env["stock.move.line"].sudo().search([
+                ("lot_id", "in", quants.lot_id.ids),
+                ("product_id", "in", quants.product_id.ids),
+                ("picking_id.supplier_shipment_id", "!=", False),
+            ], order="id desc")
+        except Exception as exc:
+            _logger.warning(
+                "[Inventario Visual][PL] Error buscando move lines con embarque: %s",
+                exc,
+            )
+            return {}
+
+        result = {}
+        for ml in move_lines:
+            result.setdefault(
+                (ml.lot_id.id, ml.product_id.id),
+                ml.picking_id.supplier_shipment_id.sudo(),
+            )
+        return result
+
     # -------------------------------------------------------------------------
     # RESOLUCIÓN POR RENGÓN DE PACKING LIST
     # -------------------------------------------------------------------------
@@ -367,7 +422,7 @@ class StockQuantPackingList(models.Model):
         en tu Inventario Visual los datos de bloque, atado, pedimento,
         contenedor y referencia pueden venir del quant.
         """
-        lot = quant.lot_id if quant and quant.exists() else False
+        lot = quant.lot_id if quant else False
 
         numero_placa = self._iv_first_value([
             (quant, ["x_numero_placa", "numero_placa"]),
@@ -464,69 +519,16 @@ class StockQuantPackingList(models.Model):
         candidate_domains = []
 
         for base_domain in base_domains:
-            # 1. Número de placa exacto
-            self._iv_add_domain_if_fields_exist(
-                candidate_domains,
-                Row,
-                base_domain,
-                [("numero_placa", "=", values["numero_placa"])],
-            )
-
-            # 2. Referencia proveedor exacta
-            self._iv_add_domain_if_fields_exist(
-                candidate_domains,
-                Row,
-                base_domain,
-                [("ref_proveedor", "=", values["ref_proveedor"])],
-            )
-
-            # 3. Bloque + atado
-            self._iv_add_domain_if_fields_exist(
-                candidate_domains,
-                Row,
-                base_domain,
-                [
-                    ("bloque", "=", values["bloque"]),
-                    ("atado", "=", values["atado"]),
-                ],
-            )
-
-            # 4. Pedimento + bloque
-            self._iv_add_domain_if_fields_exist(
-                candidate_domains,
-                Row,
-                base_domain,
-                [
-                    ("pedimento", "=", values["pedimento"]),
-                    ("bloque", "=", values["bloque"]),
-                ],
-            )
-
-            # 5. Contenedor + bloque
-            self._iv_add_domain_if_fields_exist(
-                candidate_domains,
-                Row,
-                base_domain,
-                [
-                    ("container_id.container_number", "=", values["contenedor"]),
-                    ("bloque", "=", values["bloque"]),
-                ],
-            )
-
-            # 6. Búsquedas flexibles
-            self._iv_add_domain_if_fields_exist(
-                candidate_domains,
-                Row,
-                base_domain,
-                [("numero_placa", "ilike", values["numero_placa"])],
-            )
-
-            self._iv_add_domain_if_fields_exist(
-                candidate_domains,
-                Row,
-                base_domain,
-                [("ref_proveedor", "ilike", values["ref_proveedor"])],
-            )
+            for criteria in _IV_PACKING_ROW_CRITERIA:
+                self._iv_add_domain_if_fields_exist(
+                    candidate_domains,
+                    Row,
+                    base_domain,
+                    [
+                        (field_name, operator, values[key])
+                        for field_name, operator, key in criteria
+                    ],
+                )
 
         seen_domains = set()
 
@@ -555,12 +557,275 @@ class StockQuantPackingList(models.Model):
 
         return False
 
+    @api.model
+    def _iv_packing_row_matches(self, row, criteria):
+        """
+        Evalúa en Python un criterio de _IV_PACKING_ROW_CRITERIA ya resuelto
+        a [(campo, operador, valor)]: '=' exacto, 'ilike' contiene sin
+        distinguir mayúsculas (como el dominio de la búsqueda por quant).
+        """
+        for field_name, operator, value in criteria:
+            row_value = row
+            for name in field_name.split("."):
+                row_value = row_value[name] if row_value else False
+            row_value = str(row_value or "")
+
+            if operator == "=" and row_value != value:
+                return False
+            if operator == "ilike" and value.lower() not in row_value.lower():
+                return False
+
+        return True
+
+    @api.model
+    def _iv_packing_row_cascade(self, Row, values, shipment=False):
+        """
+        Lista de pasadas [(shipment_id o False, [(campo, op, valor)])] en el
+        orden de _iv_find_packing_row_for_quant: primero dentro del
+        embarque ya resuelto, luego en todo el producto.
+        """
+        shipment_ids = [False]
+        if shipment and "shipment_id" in Row._fields:
+            shipment_ids.insert(0, shipment.id)
+
+        cascade = []
+        for shipment_id in shipment_ids:
+            for criteria in _IV_PACKING_ROW_CRITERIA:
+                resolved = [
+                    (field_name, operator, values[key])
+                    for field_name, operator, key in criteria
+                ]
+                if all(
+                    field_name.split(".")[0] in Row._fields and value
+                    for field_name, _operator, value in resolved
+                ):
+                    cascade.append((shipment_id, resolved))
+        return cascade
+
+    @api.model
+    def _iv_batch_find_packing_rows(self, quants, shipments_by_quant, values_by_quant):
+        """
+        Versión batch de _iv_find_packing_row_for_quant para el detalle:
+        {quant_id: row} con a lo más DOS búsquedas, sin importar cuántos
+        quants.
+
+        1. Renglones del producto con la misma placa, referencia o bloque
+           (todo criterio exacto trae al menos uno de esos).
+        2. Solo para los quants sin renglón exacto en su embarque: los
+           renglones cuya placa / referencia CONTIENEN la del quant.
+
+        La cascada se evalúa en Python sobre esos candidatos, en el mismo
+        orden y con el mismo desempate (id más alto) que la búsqueda por
+        quant.
+        """
+        if not quants or not self._iv_model_available("supplier.shipment.packing.row"):
+            return {}
+
+        Row = self.env["supplier.shipment.packing.row"].sudo()
+        quants = quants.filtered(lambda q: q.product_id)
+        if not quants or "product_id" not in Row._fields:
+            return {}
+
+        cascades = {
+            quant.id: self._iv_packing_row_cascade(
+                Row, values_by_quant[quant.id], shipments_by_quant.get(quant.id))
+            for quant in quants
+        }
+
+        def fetch(terms):
+            terms = [term for term in terms if term[2]]
+            if not terms:
+                return Row.browse()
+            domain = [("product_id", "in", quants.product_id.ids)]
+            domain += ["|"] * (len(terms) - 1) + terms
+            try:
+                return Row.search(domain, order="id desc")
+            except Exception as exc:
+                _logger.warning(
+                    "[Inventario Visual][PL] Error buscando rows en lote: %s", exc)
+                return Row.browse()
+
+        # 1. Exactos: un "in" por campo ancla.
+        anchors = {}
+        for cascade in cascades.values():
+            for _shipment_id, criteria in cascade:
+                for field_name, operator, value in criteria:
+                    if operator == "=" and "." not in field_name:
+                        anchors.setdefault(field_name, set()).add(value)
+                        break
+        rows = fetch([
+            (field_name, "in", sorted(anchor_values))
+            for field_name, anchor_values in anchors.items()
+        ])
+
+        def exact_hit(quant):
+            shipment = shipments_by_quant.get(quant.id)
+            return shipment and "shipment_id" in Row._fields and any(
+                row.product_id == quant.product_id
+                and row.shipment_id.id == shipment.id
+                and self._iv_packing_row_matches(row, criteria)
+                for shipment_id, criteria in cascades[quant.id]
+                if shipment_id and all(op == "=" for _f, op, _v in criteria)
+                for row in rows
+            )
+
+        # 2. Flexibles: solo quien todavía puede llegar a un ilike.
+        flexible = []
+        for quant in quants:
+            if exact_hit(quant):
+                continue
+            for _shipment_id, criteria in cascades[quant.id]:
+                if len(criteria) == 1 and criteria[0][1] == "ilike":
+                    flexible.append(criteria[0])
+        if flexible:
+            rows |= fetch(sorted(set(flexible)))
+
+        rows_by_product = {}
+        for row in rows.sorted("id", reverse=True):
+            rows_by_product.setdefault(row.product_id.id, []).append(row)
+
+        result = {}
+        for quant in quants:
+            candidates = rows_by_product.get(quant.product_id.id, [])
+            for shipment_id, criteria in cascades[quant.id]:
+                row = next((
+                    row for row in candidates
+                    if (not shipment_id or row.shipment_id.id == shipment_id)
+                    and self._iv_packing_row_matches(row, criteria)
+                ), False)
+                if row:
+                    result[quant.id] = row
+                    break
+        return result
+
+    @api.model
+    def _iv_batch_get_voyages(self, quants):
+        """
+        Versión batch de _iv_get_voyage_for_quant: {quant_id: voyage} con a
+        lo más dos búsquedas de stock.transit.line (por quant y, para el
+        resto, por lote + producto; gana la línea más reciente).
+        """
+        voyages = {}
+        pending = quants
+        if "transit_voyage_id" in quants._fields:
+            for quant in quants:
+                if quant.transit_voyage_id:
+                    voyages[quant.id] = quant.transit_voyage_id.sudo()
+            pending = quants.filtered(lambda q: q.id not in voyages)
+
+        transit_lines = {}
+        if "transit_line_id" in quants._fields:
+            for quant in pending:
+                if quant.transit_line_id:
+                    transit_lines[quant.id] = quant.transit_line_id.sudo()
+            pending = pending.filtered(lambda q: q.id not in transit_lines)
+
+        if pending and self._iv_model_available("stock.transit.line"):
+            TransitLine = self.env["stock.transit.line"].sudo()
+            try:
+                if "quant_id" in TransitLine._fields:
+                    for line in TransitLine.search([
+                        ("quant_id", "in", pending.ids),
+                    ], order="id desc"):
+                        transit_lines.setdefault(line.quant_id.id, line)
+                    pending = pending.filtered(lambda q: q.id not in transit_lines)
+
+                pending = pending.filtered(lambda q: q.lot_id and q.product_id)
+                if pending:
+                    by_lot = {}
+                    for line in TransitLine.search([
+                        ("lot_id", "in", pending.lot_id.ids),
+                        ("product_id", "in", pending.product_id.ids),
+                    ], order="id desc"):
+                        by_lot.setdefault((line.lot_id.id, line.product_id.id), line)
+                    for quant in pending:
+                        line = by_lot.get((quant.lot_id.id, quant.product_id.id))
+                        if line:
+                            transit_lines[quant.id] = line
+            except Exception as exc:
+                _logger.warning(
+                    "[Inventario Visual][PL] Error buscando transit lines en lote: %s", exc)
+
+        for quant_id, line in transit_lines.items():
+            if "voyage_id" in line._fields and line.voyage_id:
+                voyages[quant_id] = line.voyage_id.sudo()
+        return voyages
+
+    @api.model
+    def _iv_batch_find_shipments_from_voyages(self, voyages):
+        """{voyage_id: supplier.shipment} en UNA búsqueda (el más reciente)."""
+        if not voyages or not self._iv_model_available("supplier.shipment"):
+            return {}
+
+        Shipment = self.env["supplier.shipment"].sudo()
+        if "voyage_id" not in Shipment._fields:
+            return {}
+
+        result = {}
+        try:
+            for shipment in Shipment.search([
+                ("voyage_id", "in", sorted({voyage.id for voyage in voyages})),
+            ], order="id desc"):
+                result.setdefault(shipment.voyage_id.id, shipment)
+        except Exception as exc:
+            _logger.warning(
+                "[Inventario Visual][PL] Error buscando supplier.shipment en lote: %s", exc)
+        return result
+
+    @api.model
+    def _iv_batch_packing_context(self, quants):
+        """
+        Todo lo que _iv_get_packing_list_info_for_quant resuelve por quant,
+        resuelto para el detalle completo con un número FIJO de búsquedas:
+        {voyages, shipments, rows, values}, cada uno por quant_id.
+        """
+        voyages = self._iv_batch_get_voyages(quants)
+        voyage_shipments = self._iv_batch_find_shipments_from_voyages(voyages.values())
+        picking_shipments = self._iv_batch_find_shipments_from_picking(quants)
+
+        shipments = {}
+        for quant in quants:
+            voyage = voyages.get(quant.id)
+            shipment = voyage_shipments.get(voyage.id) if voyage else False
+            shipments[quant.id] = shipment or picking_shipments.get(
+                (quant.lot_id.id, quant.product_id.id), False)
+
+        values = {quant.id: self._iv_get_quant_matching_values(quant) for quant in quants}
+        return {
+            "voyages": voyages,
+            "shipments": shipments,
+            "rows": self._iv_batch_find_packing_rows(quants, shipments, values),
+            "values": values,
+        }
+
     # -------------------------------------------------------------------------
     # PUNTO ÚNICO PARA FRONTEND
     # -------------------------------------------------------------------------
 
     @api.model
-    def _iv_get_packing_list_info_for_quant(self, quant):
+    def _iv_packing_sources_available(self):
+        """
+        ¿Hay de dónde resolver un PL en esta base? Sin tránsito, embarques
+        ni packing list (ni supplier_shipment_id en el picking) todos los
+        quants terminaban en {} después de varias consultas cada uno.
+        """
+        if "transit_voyage_id" in self._fields or "transit_line_id" in self._fields:
+            return True
+
+        if any(
+            self._iv_model_available(model_name)
+            for model_name in (
+                "stock.transit.line",
+                "supplier.shipment",
+                "supplier.shipment.packing.row",
+            )
+        ):
+            return True
+
+        return "supplier_shipment_id" in self.env["stock.picking"]._fields
+
+    @api.model
+    def _iv_get_packing_list_info_for_quant(self, quant, batch=None):
         """
         Punto único de resolución para frontend.
 
@@ -571,18 +836,27 @@ class StockQuantPackingList(models.Model):
         4. Si hay row, devolver row + packing + shipment.
         5. Si hay shipment, devolver shipment + primer PL.
         6. Si no hay shipment, devolver viaje stock.transit.voyage.
+
+        batch: resultado de _iv_batch_packing_context cuando se resuelven
+        muchos quants (detalle, quants ya existentes); sin él, se busca por
+        quant.
         """
-        if not quant or not quant.exists():
-            return {}
+        if batch is not None:
+            voyage = batch["voyages"].get(quant.id, False)
+            shipment = batch["shipments"].get(quant.id, False)
+            row = batch["rows"].get(quant.id, False)
+        else:
+            if not quant or not quant.exists():
+                return {}
 
-        voyage = self._iv_get_voyage_for_quant(quant)
+            voyage = self._iv_get_voyage_for_quant(quant)
 
-        shipment = (
-            self._iv_find_shipment_from_transit_for_quant(quant)
-            or self._iv_find_shipment_from_picking_for_quant(quant)
-        )
+            shipment = self._iv_find_shipment_from_transit_for_quant(quant)
+            if not shipment:
+                shipment = self._iv_find_shipment_from_picking_for_quant(quant)
+
+            row = self._iv_find_packing_row_for_quant(quant, shipment=shipment)
 
-        row = self._iv_find_packing_row_for_quant(quant, shipment=shipment)
         if row:
             info = self._iv_make_packing_info_from_row(row)
 
@@ -598,7 +872,10 @@ class StockQuantPackingList(models.Model):
 
             return info
 
-        values = self._iv_get_quant_matching_values(quant)
+        if batch is not None:
+            values = batch["values"][quant.id]
+        else:
+            values = self._iv_get_quant_matching_values(quant)
 
         if shipment:
             return self._iv_make_packing_info_from_shipment(
@@ -639,15 +916,22 @@ class StockQuantPackingList(models.Model):
             if isinstance(item.get("id"), int)
         ]
 
-        quants_by_id = {
-            quant.id: quant
-            for quant in self.sudo().browse(quant_ids_from_result).exists()
-        }
+        # Sin fuentes de PL en la base no hay nada que resolver: antes cada
+        # quant costaba varias consultas para terminar igual en {}.
+        quants_by_id = {}
+        batch = None
+        if self._iv_packing_sources_available():
+            quants = self.sudo().browse(quant_ids_from_result).exists()
+            quants_by_id = {quant.id: quant for quant in quants}
+            batch = self._iv_batch_packing_context(quants)
 
         for item in result:
             quant = quants_by_id.get(item.get("id"))
 
-            packing_info = self._iv_get_packing_list_info_for_quant(quant) if quant else {}
+            packing_info = (
+                self._iv_get_packing_list_info_for_quant(quant, batch=batch)
+                if quant else {}
+            )
 
             item["packing_list_id"] = packing_info.get("packing_id") or False
             item["packing_list_name"] = packing_info.get("packing_name") or ""
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""Medición por endpoint de las llamadas RPC del Inventario Visual.
+
+Envuelve (override al final de la cadena de herencia, ver
+models/__init__.py) los puntos de entrada de la vista y registra por
+llamada:
+
+- sql_count / sql_time: consultas y su tiempo (contadores del cursor y del
+  hilo, los mismos del log de werkzeug).
+- python_time: tiempo total menos tiempo SQL.
+- rows_scanned: tuplas leídas por PostgreSQL en la transacción
+  (pg_stat_xact_user_tables, antes vs. después). Cuesta dos consultas, así
+  que solo con el parámetro _ROWS_SCANNED_PARAM o al pedir el sobre.
+- rows_returned: tamaño del resultado (productos, detalles, pedidos...).
+- shape: FORMA de los filtros (qué llaves traen valor, no los valores) o
+  el tamaño de la lista de ids, para agrupar llamadas comparables.
+
+Solo se mide la llamada EXTERIOR: un endpoint medido que llama a otro
+medido cuenta una vez. La exportación (_iv_export_rows) NO es un endpoint
+medido (es un generador que escribe el archivo por tandas): cada
+get_inventory_grouped_by_product / get_quant_details /
+get_walkthrough_* que hace se registra como una llamada propia.
+
+Salidas:
+- Sobre de depuración: con modo desarrollador activo y context
+  {'iv_perf': True}, el endpoint regresa {'result': ..., 'perf': {...}}
+  en lugar del resultado. Solo en la frontera RPC (la petición call_kw es
+  ESE método): quien lo llama desde Python recibe siempre el resultado.
+- get_iv_perf_stats(): agregados por (endpoint, forma) desde que arrancó
+  el worker, ordenados por tiempo total. Son POR PROCESO: con varios
+  workers cada uno lleva los suyos.
+- Consultas lentas con su plan: ver som_iv_slow_query.py (opt-in por
+  parámetro; el hook se cuelga aquí, solo durante la llamada exterior).
+- Perfiles por muestreo (collapsed stacks): ver som_iv_rpc_profile.py
+  (opt-in por parámetro; el hilo muestreador se arranca aquí).
+"""
+import logging
+import threading
+import time
+
+from odoo import api, models
+from odoo.exceptions import UserError
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+_ROWS_SCANNED_PARAM = 'inventory_visual_enhanced.perf_rows_scanned'
+
+# Agregados del proceso: {(endpoint, forma): {...}}
+_IV_PERF_STATS = {}
+_IV_PERF_LOCK = threading.Lock()
+# Profundidad de endpoints medidos en el hilo actual.
+_IV_PERF_LOCAL = threading.local()
+
+# Llaves del resultado que son "lo que regresó" el endpoint.
+_RESULT_LIST_KEYS = ('products', 'orders', 'details', 'rows', 'lots', 'movements')
+
+
+def _iv_shape(args, kwargs):
+    """Forma de la llamada: llaves con valor del dict de filtros, o el
+    tamaño (por rangos) de la lista de ids."""
+    values = list(args) + [v for _k, v in sorted(kwargs.items())]
+    for value in values:
+        if isinstance(value, dict):
+            keys = sorted(k for k, v in value.items() if v not in (None, False, '', [], {}))
+            return '+'.join(keys) or 'sin filtros'
+        if isinstance(value, (list, tuple)):
+            size = len(value)
+            bucket = ('1' if size <= 1 else '≤10' if size <= 10
+                      else '≤100' if size <= 100 else '>100')
+            return 'ids:%s' % bucket
+    named = sorted(k for k, v in kwargs.items() if v not in (None, False, ''))
+    return '+'.join(named) or ('args:%s' % len(args))
+
+
+def _iv_rows_returned(result):
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    if isinstance(result, dict):
+        for key in _RESULT_LIST_KEYS:
+            if isinstance(result.get(key), (list, dict)):
+                return len(result[key])
+        return sum(len(v) for v in result.values() if isinstance(v, (list, tuple)))
+    return 0
+
+
+class StockQuantPerf(models.Model):
+    _inherit = 'stock.quant'
+
+    # ------------------------------------------------------------------
+    # Medición
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _iv_perf_envelope_requested(self, endpoint):
+        if not (self.env.context.get('iv_perf') and request and request.session.debug):
+            return False
+        params = getattr(request, 'params', None) or {}
+        return params.get('model') == self._name and params.get('method') == endpoint
+
+    @api.model
+    def _iv_perf_rows_scanned(self):
+        self.env.cr.execute("""
+            SELECT COALESCE(SUM(seq_tup_read + COALESCE(idx_tup_fetch, 0)), 0)
+              FROM pg_stat_xact_user_tables
+        """)
+        return int(self.env.cr.fetchone()[0])
+
+    @api.model
+    def _iv_perf_call(self, endpoint, method, args, kwargs):
+        depth = getattr(_IV_PERF_LOCAL, 'depth', 0)
+        if depth:
+            return method(*args, **kwargs)
+
+        envelope = self._iv_perf_envelope_requested(endpoint)
+        scan = envelope or bool(
+            self.env['ir.config_parameter'].sudo().get_param(_ROWS_SCANNED_PARAM))
+        cr = self.env.cr
+        thread = threading.current_thread()
+
+        slow_threshold = self.env['som.iv.slow.query']._iv_threshold()
+        slow_queries = []
+
+        def slow_query_hook(hook_cr, query, params, _start, delay):
+            if hook_cr is cr and delay >= slow_threshold:
+                slow_queries.append((delay, query, params))
+
+        scanned_before = self._iv_perf_rows_scanned() if scan else 0
+        count_before = cr.sql_log_count
+        time_before = getattr(thread, 'query_time', None)
+        if slow_threshold:
+            if not hasattr(thread, 'query_hooks'):
+                thread.query_hooks = []
+            thread.query_hooks.append(slow_query_hook)
+        sampler, by_rate = self.env['som.iv.rpc.profile']._iv_start_sampler()
+        start = time.perf_counter()
+        _IV_PERF_LOCAL.depth = 1
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            _IV_PERF_LOCAL.depth = 0
+            if slow_threshold:
+                thread.query_hooks.remove(slow_query_hook)
+            if sampler:
+                sampler.stop()
+        total = time.perf_counter() - start
+        sql_count = cr.sql_log_count - count_before
+        time_after = getattr(thread, 'query_time', None)
+        sql_time = (time_after - time_before) if time_before is not None and time_after is not None else 0.0
+        rows_scanned = self._iv_perf_rows_scanned() - scanned_before if scan else None
+
+        perf = {
+            'endpoint': endpoint,
+            'shape': _iv_shape(args, kwargs),
+            'sql_count': sql_count,
+            'sql_time': round(sql_time, 4),
+            'python_time': round(max(total - sql_time, 0.0), 4),
+            'total_time': round(total, 4),
+            'rows_scanned': rows_scanned,
+            'rows_returned': _iv_rows_returned(result),
+        }
+        self._iv_perf_record(perf)
+        _logger.debug("[IV PERF] %s", perf)
+        if slow_queries:
+            self.env['som.iv.slow.query']._iv_record(perf, args, kwargs, slow_queries)
+        if sampler:
+            self.env['som.iv.rpc.profile']._iv_record(perf, args, kwargs, sampler, by_rate)
+
+        if envelope:
+            return {'result': result, 'perf': perf}
+        return result
+
+    @api.model
+    def _iv_perf_record(self, perf):
+        key = (perf['endpoint'], perf['shape'])
+        with _IV_PERF_LOCK:
+            stats = _IV_PERF_STATS.setdefault(key, {
+                'calls': 0, 'sql_count': 0, 'sql_time': 0.0, 'python_time': 0.0,
+                'total_time': 0.0, 'max_time': 0.0, 'rows_returned': 0,
+                'rows_scanned': 0, 'scanned_calls': 0,
+            })
+            stats['calls'] += 1
+            stats['sql_count'] += perf['sql_count']
+            stats['sql_time'] += perf['sql_time']
+            stats['python_time'] += perf['python_time']
+            stats['total_time'] += perf['total_time']
+            stats['max_time'] = max(stats['max_time'], perf['total_time'])
+            stats['rows_returned'] += perf['rows_returned']
+            if perf['rows_scanned'] is not None:
+                stats['rows_scanned'] += perf['rows_scanned']
+                stats['scanned_calls'] += 1
+
+    @api.model
+    def get_iv_perf_stats(self, reset=False):
+        """Agregados por (endpoint, forma) de ESTE worker, del más caro al
+        más barato. Solo administradores."""
+        if not self.env.user.has_group('base.group_system'):
+            raise UserError("Solo un administrador puede consultar la medición del Inventario Visual.")
+        with _IV_PERF_LOCK:
+            items = list(_IV_PERF_STATS.items())
+            if reset:
+                _IV_PERF_STATS.clear()
+        result = []
+        for (endpoint, shape), stats in items:
+            calls = stats['calls']
+            scanned = stats['scanned_calls']
+            result.append({
+                'endpoint': endpoint,
+                'shape': shape,
+                'calls': calls,
+                'total_time': round(stats['total_time'], 4),
+                'max_time': round(stats['max_time'], 4),
+                'avg_time': round(stats['total_time'] / calls, 4),
+                'avg_sql_count': round(stats['sql_count'] / calls, 1),
+                'avg_sql_time': round(stats['sql_time'] / calls, 4),
+                'avg_python_time': round(stats['python_time'] / calls, 4),
+                'avg_rows_returned': round(stats['rows_returned'] / calls, 1),
+                'avg_rows_scanned': round(stats['rows_scanned'] / scanned, 1) if scanned else None,
+            })
+        result.sort(key=lambda row: row['total_time'], reverse=True)
+        return result
+
+    # ------------------------------------------------------------------
+    # Endpoints medidos
+    # ------------------------------------------------------------------
+
+    @api.model
+    def get_inventory_grouped_by_product(self, *args, **kwargs):
+        return self._iv_perf_call(
+            'get_inventory_grouped_by_product',
+            super().get_inventory_grouped_by_product, args, kwargs)
+
+    @api.model
+    def get_quant_details(self, *args, **kwargs):
+        return self._iv_perf_call(
+            'get_quant_details', super().get_quant_details, args, kwargs)
+
+    @api.model
+    def get_walkthrough_grouped_by_product(self, *args, **kwargs):
+        return self._iv_perf_call(
+            'get_walkthrough_grouped_by_product',
+            super().get_walkthrough_grouped_by_product, args, kwargs)
+
+    @api.model
+    def get_lot_history(self, *args, **kwargs):
+        return self._iv_perf_call(
+            'get_lot_history', super().get_lot_history, args, kwargs)
+
+    @api.model
+    def get_block_purchase_report(self, *args, **kwargs):
+        return self._iv_perf_call(
+            'get_block_purchase_report', super().get_block_purchase_report, args, kwargs)
+
+    @api.model
+    def get_sale_order_info(self, *args, **kwargs):
+        return self._iv_perf_call(
+            'get_sale_order_info', super().get_sale_order_info, args, kwargs)
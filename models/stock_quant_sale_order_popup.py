@@ -187,72 +187,77 @@ class StockQuantSaleOrderPopup(models.Model):
         }
 
     @api.model
-    def _iv_convert_invoice_amount_to_order_currency(self, invoice, amount, order):
-        if not amount:
-            return 0.0
-
-        if invoice.currency_id == order.currency_id:
-            return amount
-
-        date = invoice.invoice_date or invoice.date or fields.Date.context_today(self)
-
-        return invoice.currency_id._convert(
-            amount,
-            order.currency_id,
-            order.company_id,
-            date,
-        )
+    def _iv_sale_orders_invoice_totals(self, orders):
+        """{order_id: {'invoiced': x, 'residual': y, 'count': n}} en moneda
+        de la orden, con UNA consulta agregada sobre account.move.
+
+        Facturas publicadas de cliente (las notas de crédito restan),
+        agrupadas por orden, moneda y fecha; cada tipo de cambio
+        (moneda, fecha) se pide una sola vez y se aplica a la suma."""
+        totals = {order.id: {"invoiced": 0.0, "residual": 0.0, "count": 0} for order in orders}
+        if not orders:
+            return totals
+
+        invoice_lines = self.env["sale.order.line"]._fields.get("invoice_lines")
+        if not invoice_lines:
+            return totals
+
+        self.env.flush_all()
+        self.env.cr.execute(f"""
+            SELECT inv.order_id, inv.currency_id, inv.inv_date,
+                   SUM(inv.sign * inv.amount_total),
+                   SUM(inv.sign * inv.amount_residual),
+                   COUNT(*)
+              FROM (
+                    SELECT DISTINCT sol.order_id, am.id,
+                           CASE WHEN am.move_type = 'out_refund' THEN -1 ELSE 1 END AS sign,
+                           am.currency_id,
+                           COALESCE(am.invoice_date, am.date) AS inv_date,
+                           COALESCE(am.amount_total, 0) AS amount_total,
+                           COALESCE(am.amount_residual, 0) AS amount_residual
+                      FROM sale_order_line sol
+                      JOIN {invoice_lines.relation} rel ON rel.{invoice_lines.column1} = sol.id
+                      JOIN account_move_line aml ON aml.id = rel.{invoice_lines.column2}
+                      JOIN account_move am ON am.id = aml.move_id
+                     WHERE sol.order_id IN %s
+                       AND am.state = 'posted'
+                       AND am.move_type IN ('out_invoice', 'out_refund')
+                   ) inv
+          GROUP BY inv.order_id, inv.currency_id, inv.inv_date
+        """, (tuple(orders.ids),))
+        rows = self.env.cr.fetchall()
+
+        Currency = self.env["res.currency"].sudo()
+        orders_by_id = {order.id: order for order in orders}
+        rates = {}
+        for order_id, currency_id, inv_date, invoiced, residual, count in rows:
+            order = orders_by_id[order_id]
+            rate = 1.0
+            if currency_id != order.currency_id.id:
+                key = (currency_id, order.currency_id.id, order.company_id.id, inv_date)
+                if key not in rates:
+                    rates[key] = Currency._get_conversion_rate(
+                        Currency.browse(currency_id),
+                        order.currency_id,
+                        order.company_id,
+                        inv_date or fields.Date.context_today(self),
+                    )
+                rate = rates[key]
+            entry = totals[order_id]
+            entry["invoiced"] += (invoiced or 0.0) * rate
+            entry["residual"] += (residual or 0.0) * rate
+            entry["count"] += count
+        return totals
 
     @api.model
-    def _iv_get_sale_order_payment_info(self, order):
+    def _iv_payment_info_from_totals(self, order, totals):
         amount_total = order.amount_total or 0.0
-        amount_paid = 0.0
-        invoiced_total = 0.0
-        residual_total = 0.0
-        invoice_count = 0
-
-        try:
-            invoices = self.env["account.move"]
-
-            if "invoice_ids" in order._fields:
-                invoices = order.invoice_ids.sudo().filtered(
-                    lambda inv: (
-                        inv.state == "posted"
-                        and inv.move_type in ("out_invoice", "out_refund")
-                    )
-                )
-
-            invoice_count = len(invoices)
-
-            for invoice in invoices:
-                sign = -1.0 if invoice.move_type == "out_refund" else 1.0
-
-                invoice_total = self._iv_convert_invoice_amount_to_order_currency(
-                    invoice,
-                    invoice.amount_total or 0.0,
-                    order,
-                )
-                invoice_residual = self._iv_convert_invoice_amount_to_order_currency(
-                    invoice,
-                    invoice.amount_residual or 0.0,
-                    order,
-                )
-
-                invoiced_total += sign * invoice_total
-                residual_total += sign * invoice_residual
-
-            amount_paid = max(invoiced_total - residual_total, 0.0)
+        invoiced_total = order.currency_id.round(totals["invoiced"])
+        residual_total = order.currency_id.round(totals["residual"])
 
-            if amount_total > 0:
-                amount_paid = min(amount_paid, amount_total)
-
-        except Exception as exc:
-            _logger.warning(
-                "[Inventario Visual] No se pudo calcular pago de la orden %s: %s",
-                order.name,
-                exc,
-            )
-            amount_paid = 0.0
+        amount_paid = max(invoiced_total - residual_total, 0.0)
+        if amount_total > 0:
+            amount_paid = min(amount_paid, amount_total)
 
         amount_pending = max(amount_total - amount_paid, 0.0)
         payment_percentage = (amount_paid / amount_total * 100.0) if amount_total else 0.0
@@ -277,9 +282,31 @@ class StockQuantSaleOrderPopup(models.Model):
             "payment_percentage": payment_percentage,
             "amount_paid": amount_paid,
             "amount_pending": amount_pending,
-            "invoice_count": invoice_count,
+            "invoice_count": totals["count"],
         }
 
+    @api.model
+    def _iv_get_sale_orders_payment_info(self, orders):
+        """{order_id: payment_info} para varias órdenes a la vez."""
+        try:
+            with self.env.cr.savepoint():
+                totals = self._iv_sale_orders_invoice_totals(orders)
+        except Exception as exc:
+            _logger.warning(
+                "[Inventario Visual] No se pudo calcular pago de las órdenes %s: %s",
+                ", ".join(orders.mapped("name")),
+                exc,
+            )
+            totals = {order.id: {"invoiced": 0.0, "residual": 0.0, "count": 0} for order in orders}
+        return {
+            order.id: self._iv_payment_info_from_totals(order, totals[order.id])
+            for order in orders
+        }
+
+    @api.model
+    def _iv_get_sale_order_payment_info(self, order):
+        return self._iv_get_sale_orders_payment_info(order)[order.id]
+
     @api.model
     def get_sale_order_info(self, sale_order_ids, quant_id=False):
         lot_info = self._iv_get_quant_sale_popup_context(quant_id)
@@ -292,10 +319,11 @@ class StockQuantSaleOrderPopup(models.Model):
             }
 
         orders = self.env["sale.order"].sudo().browse(sale_order_ids).exists()
+        payment_infos = self._iv_get_sale_orders_payment_info(orders)
         result = []
 
         for order in orders:
-            payment_info = self._iv_get_sale_order_payment_info(order)
+            payment_info = payment_infos[order.id]
 
             result.append({
                 "id": order.id,
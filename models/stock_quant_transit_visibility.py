@@ -5,6 +5,24 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+_IV_ETA_FIELDS = [
+    "eta",
+    "eta_date",
+    "date_eta",
+    "fecha_eta",
+    "eta_produccion",
+    "eta_production",
+    "production_eta",
+    "production_eta_date",
+    "fecha_eta_produccion",
+    "expected_arrival_date",
+    "estimated_arrival_date",
+    "arrival_date",
+    "scheduled_date",
+    "date_expected",
+    "expected_date",
+]
+
 
 class StockQuantTransitVisibility(models.Model):
     _inherit = "stock.quant"
@@ -99,6 +117,32 @@ class StockQuantTransitVisibility(models.Model):
             ("quant_id", "=", quant.id),
         ], limit=1)
 
+    @api.model
+    def _iv_batch_get_transit_lines(self, quants):
+        """
+        Versión batch de _iv_get_transit_line: {quant_id: línea}, con UNA
+        búsqueda para los quants sin transit_line_id.
+        """
+        result = {}
+        if not quants:
+            return result
+
+        if "transit_line_id" in quants._fields:
+            for quant in quants:
+                if quant.transit_line_id:
+                    result[quant.id] = quant.transit_line_id.sudo()
+
+        pending_ids = [qid for qid in quants.ids if qid not in result]
+        if pending_ids and "stock.transit.line" in self.env.registry.models:
+            lines = self.env["stock.transit.line"].sudo().search([
+                ("quant_id", "in", pending_ids),
+            ])
+            # Mismo orden que el search(limit=1) por quant: gana la primera.
+            for line in lines:
+                result.setdefault(line.quant_id.id, line)
+
+        return result
+
     @api.model
     def _iv_get_eta_for_transit_quant(self, quant):
         """
@@ -108,39 +152,26 @@ class StockQuantTransitVisibility(models.Model):
         1. Línea de tránsito vinculada al quant.
         2. Quant directamente.
 
-        Si tu campo real de ETA tiene otro nombre, agrégalo a eta_fields.
+        Si tu campo real de ETA tiene otro nombre, agrégalo a _IV_ETA_FIELDS.
         """
         if not quant or not quant.exists() or quant.location_id.usage != "transit":
             return "", ""
 
-        eta_fields = [
-            "eta",
-            "eta_date",
-            "date_eta",
-            "fecha_eta",
-            "eta_produccion",
-            "eta_production",
-            "production_eta",
-            "production_eta_date",
-            "fecha_eta_produccion",
-            "expected_arrival_date",
-            "estimated_arrival_date",
-            "arrival_date",
-            "scheduled_date",
-            "date_expected",
-            "expected_date",
-        ]
-
-        transit_line = self._iv_get_transit_line(quant)
-        eta_value = self._iv_get_first_existing_field_value(transit_line, eta_fields)
-
-        if eta_value:
-            return self._iv_format_date_value(eta_value), "Tránsito"
-
-        eta_value = self._iv_get_first_existing_field_value(quant, eta_fields)
+        return self._iv_get_eta_from_records(self._iv_get_transit_line(quant), quant)
 
-        if eta_value:
-            return self._iv_format_date_value(eta_value), "Inventario"
+    @api.model
+    def _iv_get_eta_from_records(self, transit_line, quant):
+        """
+        ETA ya con la línea de tránsito resuelta. Sin exists(): el detalle
+        la llama con quants ya validados y líneas recién buscadas en lote
+        (un exists() por quant era una consulta por renglón).
+        """
+        for record, source in ((transit_line, "Tránsito"), (quant, "Inventario")):
+            if not record:
+                continue
+            for field_name in _IV_ETA_FIELDS:
+                if field_name in record._fields and record[field_name]:
+                    return self._iv_format_date_value(record[field_name]), source
 
         return "", ""
 
@@ -235,42 +266,134 @@ class StockQuantTransitVisibility(models.Model):
         1. Lote en picking/entrega asignada o pendiente con sale_line_id.
         2. Lote seleccionado en sale.order.line.lot_ids antes de remisión.
         """
-        sale_order_ids = set()
-
-        if (
-            not quant
-            or not quant.exists()
-            or not quant.lot_id
-            or not quant.product_id
-            or quant.location_id.usage != "internal"
-        ):
+        if not quant or not quant.exists():
             return []
 
+        return self._iv_batch_get_normal_sale_order_ids(quant).get(quant.id, [])
+
+    @api.model
+    def _iv_batch_get_normal_sale_order_ids(self, quants):
+        """
+        Versión batch de _iv_get_normal_sale_order_ids_for_quant:
+        {quant_id: [sale_order_ids]} para los quants internos.
+
+        A diferencia de _iv_batch_get_committed_quant_keys (que solo necesita
+        saber SI hay compromiso y corta en la primera vía que lo confirma),
+        aquí se juntan TODAS las órdenes de cada quant, igual que antes
+        quant por quant. El detalle hacía ~4 consultas POR QUANT (exists,
+        move_lines, grupo/origin, sale lines); ahora son las mismas
+        búsquedas una sola vez para todos.
+        """
+        internal_quants = quants.filtered(
+            lambda q: q.lot_id and q.product_id and q.location_id.usage == "internal"
+        )
+        if not internal_quants:
+            return {}
+
+        # (lot_id, product_id, location_id) -> ids de quants con esa llave
+        quant_ids_by_key = {}
+        # (lot_id, product_id) -> llaves presentes (para la vía comercial)
+        keys_by_lot_product = {}
+        for q in internal_quants:
+            key = (q.lot_id.id, q.product_id.id, q.location_id.id)
+            quant_ids_by_key.setdefault(key, []).append(q.id)
+            keys_by_lot_product.setdefault(key[:2], set()).add(key)
+
+        lot_ids = list({key[0] for key in quant_ids_by_key})
+        product_ids = list({key[1] for key in quant_ids_by_key})
+        location_ids = list({key[2] for key in quant_ids_by_key})
+
+        order_ids_by_key = {}
+
         # ---------------------------------------------------------------------
-        # 1) Detección logística:
-        #    Picking / operación pendiente con lote asignado.
-        #
-        #    En rutas multi-step puede ser internal, no necesariamente outgoing.
-        #    Por eso NO filtramos picking_type_code.
+        # 1) Detección logística: move_lines pendientes del lote
+        #    (mismas vías que _iv_resolve_sale_orders_from_move_line).
         # ---------------------------------------------------------------------
-        move_lines_with_lot = self.env["stock.move.line"].sudo().search([
-            ("lot_id", "=", quant.lot_id.id),
-            ("product_id", "=", quant.product_id.id),
-            ("location_id", "=", quant.location_id.id),
+        move_lines = self.env["stock.move.line"].sudo().search([
+            ("lot_id", "in", lot_ids),
+            ("product_id", "in", product_ids),
+            ("location_id", "in", location_ids),
             ("state", "not in", ["done", "cancel"]),
             ("move_id.state", "not in", ["done", "cancel"]),
-        ], order="id desc")
+        ])
+
+        group_lookup = {}   # group_id -> llaves
+        origin_lookup = {}  # referencia -> llaves
+
+        for ml in move_lines:
+            key = (ml.lot_id.id, ml.product_id.id, ml.location_id.id)
+            if key not in quant_ids_by_key:
+                continue
+
+            move = ml.move_id
+            picking = ml.picking_id
+            found = order_ids_by_key.setdefault(key, set())
+
+            if move and "sale_line_id" in move._fields and move.sale_line_id:
+                found.add(move.sale_line_id.order_id.id)
+
+            if picking and "sale_id" in picking._fields and picking.sale_id:
+                found.add(picking.sale_id.id)
 
-        for move_line in move_lines_with_lot:
-            orders = self._iv_resolve_sale_orders_from_move_line(move_line)
-            sale_order_ids.update(orders.ids)
+            group = False
+            if move and "group_id" in move._fields and move.group_id:
+                group = move.group_id
+            elif picking and "group_id" in picking._fields and picking.group_id:
+                group = picking.group_id
+            if group:
+                group_lookup.setdefault(group.id, set()).add(key)
+
+            origin = ""
+            if picking and picking.origin:
+                origin = picking.origin
+            elif move and "origin" in move._fields and move.origin:
+                origin = move.origin
+            if origin:
+                for ref in origin.replace(";", ",").split(","):
+                    ref = ref.strip()
+                    if ref:
+                        origin_lookup.setdefault(ref, set()).add(key)
+
+        SaleOrder = self.env["sale.order"].sudo()
+
+        if group_lookup:
+            if "procurement_group_id" in SaleOrder._fields:
+                group_field = "procurement_group_id"
+            elif "group_id" in SaleOrder._fields:
+                group_field = "group_id"
+            else:
+                group_field = None
+
+            if group_field:
+                for order in SaleOrder.search([
+                    (group_field, "in", list(group_lookup)),
+                    ("state", "in", ["sale", "done"]),
+                ]):
+                    for key in group_lookup.get(order[group_field].id, ()):
+                        order_ids_by_key[key].add(order.id)
+
+        if origin_lookup:
+            for order in SaleOrder.search([
+                ("name", "in", list(origin_lookup)),
+                ("state", "in", ["sale", "done"]),
+            ]):
+                for key in origin_lookup.get(order.name, ()):
+                    order_ids_by_key[key].add(order.id)
+
+        # sale_line_id / sale_id directos pueden apuntar a órdenes canceladas
+        # o en borrador: se filtran todas juntas (una lectura de state).
+        candidate_ids = set().union(*order_ids_by_key.values()) if order_ids_by_key else set()
+        if candidate_ids:
+            valid_ids = set(
+                SaleOrder.browse(list(candidate_ids))
+                .filtered(lambda order: order.state in ("sale", "done")).ids
+            )
+            for found in order_ids_by_key.values():
+                found &= valid_ids
 
         # ---------------------------------------------------------------------
-        # 2) Detección comercial:
-        #    El lote ya está seleccionado en la línea de venta, pero todavía
-        #    puede no existir move_line asignada.
-        #
-        #    Esto cubre la etapa previa a remisión.
+        # 2) Detección comercial: lote ya seleccionado en la línea de venta,
+        #    todavía sin move_line asignada (etapa previa a remisión).
         # ---------------------------------------------------------------------
         SaleLine = self.env["sale.order.line"].sudo()
 
@@ -278,8 +401,8 @@ class StockQuantTransitVisibility(models.Model):
             sale_lines = SaleLine.search([
                 ("order_id.state", "in", ["sale", "done"]),
                 ("display_type", "=", False),
-                ("product_id", "=", quant.product_id.id),
-                ("lot_ids", "in", [quant.lot_id.id]),
+                ("product_id", "in", product_ids),
+                ("lot_ids", "in", lot_ids),
             ])
 
             for sale_line in sale_lines:
@@ -291,9 +414,18 @@ class StockQuantTransitVisibility(models.Model):
                     if (sale_line.product_uom_qty or 0.0) <= (sale_line.qty_delivered or 0.0):
                         continue
 
-                sale_order_ids.add(sale_line.order_id.id)
+                for lot in sale_line.lot_ids:
+                    for key in keys_by_lot_product.get((lot.id, sale_line.product_id.id), ()):
+                        order_ids_by_key.setdefault(key, set()).add(sale_line.order_id.id)
+
+        result = {}
+        for key, order_ids in order_ids_by_key.items():
+            if not order_ids:
+                continue
+            for quant_id in quant_ids_by_key[key]:
+                result[quant_id] = sorted(order_ids)
 
-        return sorted(sale_order_ids)
+        return result
 
     @api.model
     def _iv_batch_get_committed_quant_keys(self, quants):
@@ -629,6 +761,11 @@ class StockQuantTransitVisibility(models.Model):
         if filters.get("product_name"):
             domain.append(("product_id", "ilike", filters["product_name"]))
 
+        # Refresco en vivo (aviso del bus): mismos filtros de la búsqueda,
+        # acotados a los productos que cambiaron.
+        if filters.get("product_ids"):
+            domain.append(("product_id", "in", [int(pid) for pid in filters["product_ids"]]))
+
         if filters.get("almacen_id"):
             almacen = self.env["stock.warehouse"].browse(int(filters["almacen_id"]))
             if almacen.view_location_id:
@@ -956,14 +1093,12 @@ class StockQuantTransitVisibility(models.Model):
         if not quant_ids:
             return []
 
-        quants = self.browse(quant_ids)
+        # exists() UNA vez aquí: los helpers de abajo ya no lo repiten por
+        # quant (era una consulta por renglón).
+        quants = self.browse(quant_ids).exists()
         result = []
 
-        is_sales_user = (
-            self.env.user.has_group("sales_team.group_sale_salesman")
-            or self.env.user.has_group("sales_team.group_sale_salesman_all_leads")
-            or self.env.user.has_group("sales_team.group_sale_manager")
-        )
+        is_sales_user = self._iv_permission_profile()["is_sales_user"]
 
         workshop_lot_ids = self._iv_get_workshop_lot_ids(
             [q.lot_id.id for q in quants if q.lot_id]
@@ -977,6 +1112,23 @@ class StockQuantTransitVisibility(models.Model):
             [q for q in quants if q.location_id.usage != "transit"]
         )
 
+        # Prefetch EN LOTE de lo que antes se consultaba quant por quant
+        # dentro del bucle: líneas de tránsito (ETA / orden), órdenes de
+        # venta del inventario interno y orden de reserva de cada hold. Las
+        # pruebas de tests/test_query_counts.py cuidan que el número de
+        # consultas no crezca con el número de quants.
+        transit_lines = self._iv_batch_get_transit_lines(
+            quants.filtered(lambda q: q.location_id.usage == "transit")
+        )
+        sale_order_ids_by_quant = self._iv_batch_get_normal_sale_order_ids(quants)
+        hold_orders = {}
+        if is_sales_user and "x_hold_activo_id" in self._fields:
+            hold_orders = self._iv_history_hold_orders(
+                quants.filtered(
+                    lambda q: hasattr(q, "x_tiene_hold") and q.x_tiene_hold
+                ).mapped("x_hold_activo_id")
+            )
+
         for quant in quants:
             usage = quant.location_id.usage
             is_transit = usage == "transit"
@@ -1001,13 +1153,13 @@ class StockQuantTransitVisibility(models.Model):
                 except Exception:
                     tipo_display = ""
 
-            transit_line = self._iv_get_transit_line(quant) if is_transit else False
+            transit_line = transit_lines.get(quant.id, False) if is_transit else False
 
             eta_value = ""
             eta_source = ""
 
             if is_transit:
-                eta_value, eta_source = self._iv_get_eta_for_transit_quant(quant)
+                eta_value, eta_source = self._iv_get_eta_from_records(transit_line, quant)
 
             detail = {
                 "id": quant.id,
@@ -1100,13 +1252,11 @@ class StockQuantTransitVisibility(models.Model):
                 hold = quant.x_hold_activo_id
                 # Folio de la ORDEN de reserva dueña del hold (hipervínculo
                 # en el diálogo del apartado).
-                order_line = self.env['stock.lot.hold.order.line'].sudo().search(
-                    [('hold_ids', 'in', hold.id)], limit=1)
-                hold_order = order_line.order_id
+                hold_order = hold_orders.get(hold.id)
                 detail["hold_info"] = {
                     "id": hold.id,
-                    "order_id": hold_order.id or False,
-                    "order_name": hold_order.name or "",
+                    "order_id": hold_order.id if hold_order else False,
+                    "order_name": (hold_order.name or "") if hold_order else "",
                     "partner_name": hold.partner_id.name if hold.partner_id else "",
                     "proyecto_nombre": hold.project_id.name if hasattr(hold, "project_id") and hold.project_id else "",
                     "arquitecto_nombre": hold.arquitecto_id.name if hasattr(hold, "arquitecto_id") and hold.arquitecto_id else "",
@@ -1116,7 +1266,7 @@ class StockQuantTransitVisibility(models.Model):
                     "notas": hold.notas if hasattr(hold, "notas") else "",
                 }
 
-            sale_order_ids = self._iv_get_normal_sale_order_ids_for_quant(quant)
+            sale_order_ids = sale_order_ids_by_quant.get(quant.id, [])
 
             if sale_order_ids:
                 detail["en_orden_venta"] = True
@@ -1131,4 +1281,4 @@ class StockQuantTransitVisibility(models.Model):
                 )
             )
 
-        return result
\ No newline at end of file
+        return self._iv_mark_block_photos(result)
\ No newline at end of file
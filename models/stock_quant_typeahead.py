@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""Typeahead del diálogo de apartado: clientes, proyectos y embajadores.
+
+Antes cada tecla (con debounce) hacía un ilike SIN ancla sobre
+res.partner / project.project ordenado por nombre: escaneo secuencial en
+bases grandes, y el cliente de siempre perdido entre homónimos.
+
+Ahora los resultados van por NIVEL de coincidencia:
+
+    0  el nombre empieza con el texto
+    1  alguna palabra del nombre empieza con el texto, o RFC / referencia
+       empiezan con el texto
+    2  el texto aparece en nombre, RFC, referencia o email
+    3  parecido (similarity de pg_trgm, 3+ letras): "marmoles" → "Mármoles"
+
+y dentro de cada nivel primero lo que ESTE vendedor usa más y más
+recientemente (sus apartados y pedidos de los últimos _PICKS_DAYS días).
+
+- Clientes / embajadores: SQL sobre índices trigram de lower(columna),
+  creados en init(). Los ids pasan después por search() para respetar
+  reglas de registro (multiempresa); como ese filtro va DESPUÉS del LIMIT,
+  el SQL trae _SCOPE_OVERFETCH veces el límite.
+- Proyectos: name es traducible (jsonb) y el núcleo ya lo indexa con
+  trigram; se busca con el ORM (prefijo y contiene) y se ordena igual.
+
+Las últimas selecciones se guardan además en el navegador
+(utils/typeahead_recent.js) y se muestran AL INSTANTE mientras responde el
+servidor.
+"""
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import sql
+
+_TYPEAHEAD_LIMIT = 20
+_PICKS_DAYS = 365
+# Candidatos de más que trae el SQL de clientes: las reglas de registro se
+# aplican después y podrían dejar menos de `limit`.
+_SCOPE_OVERFETCH = 3
+# Columnas de res_partner con índice trigram sobre lower(columna): las que
+# filtra la búsqueda (el email solo en el nivel 2, igual que
+# utils/typeahead_recent.js), ni una más.
+_PARTNER_SEARCH_COLUMNS = ('name', 'vat', 'ref', 'email')
+# campo del apartado por tipo de búsqueda
+_HOLD_FIELD = {
+    'partner': 'partner_id',
+    'project': 'project_id',
+    'architect': 'arquitecto_id',
+}
+_PERMISSION_ERRORS = {
+    'partner': "No tiene permisos para buscar clientes. Contacte al administrador.",
+    'project': "No tiene permisos para consultar proyectos. Contacte al administrador.",
+    'architect': "No tiene permisos para consultar embajadores. Contacte al administrador.",
+}
+
+
+class StockQuantTypeahead(models.Model):
+    _inherit = 'stock.quant'
+
+    def init(self):
+        super().init()
+        if not self._iv_has_trigram():
+            return
+        for column in _PARTNER_SEARCH_COLUMNS:
+            sql.create_index(
+                self.env.cr, 'res_partner_iv_%s_trgm_idx' % column, 'res_partner',
+                ['lower(%s) gin_trgm_ops' % column], method='gin')
+
+    @api.model
+    def _iv_has_trigram(self):
+        return bool(getattr(self.env.registry, 'has_trigram', False))
+
+    @staticmethod
+    def _iv_like_escape(term):
+        return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    @api.model
+    def _iv_typeahead_picks(self, kind):
+        """{id: puntaje} de lo que ESTE vendedor ha elegido: una elección
+        vale 1 hoy y pierde la mitad de su peso a los ~30 días."""
+        now = fields.Datetime.now()
+        since = now - timedelta(days=_PICKS_DAYS)
+        sources = []
+        if 'stock.lot.hold' in self.env:
+            Hold = self.env['stock.lot.hold']
+            if _HOLD_FIELD[kind] in Hold._fields and 'user_id' in Hold._fields:
+                sources.append((Hold, _HOLD_FIELD[kind]))
+        SaleOrder = self.env['sale.order']
+        if kind == 'partner':
+            sources.append((SaleOrder, 'partner_id'))
+        elif kind == 'project' and 'project_id' in SaleOrder._fields:
+            sources.append((SaleOrder, 'project_id'))
+
+        scores = {}
+        for Model, field_name in sources:
+            # sudo: solo se leen ids de los documentos PROPIOS para ordenar;
+            # lo que se muestra pasa por search() con los permisos del usuario.
+            groups = Model.sudo()._read_group(
+                [('user_id', '=', self.env.uid),
+                 (field_name, '!=', False),
+                 ('create_date', '>=', since)],
+                [field_name], ['__count', 'create_date:max'],
+            )
+            for record, count, last in groups:
+                age_days = max((now - last).days, 0) if last else _PICKS_DAYS
+                scores[record.id] = scores.get(record.id, 0.0) + count * 30.0 / (30.0 + age_days)
+        return scores
+
+    @api.model
+    def _iv_typeahead_partner_rows(self, term, kind, picked, limit):
+        """[(id, nivel, parecido)] de res_partner por nivel de coincidencia.
+        Las condiciones usan lower(columna) tal cual para pegar en los
+        índices trigram de init()."""
+        Partner = self.env['res.partner']
+        Partner.flush_model()
+        text = term.lower()
+        like = self._iv_like_escape(text)
+        fuzzy = self._iv_has_trigram() and len(text) >= 3
+        params = {
+            'prefix': like + '%',
+            'word': '% ' + like + '%',
+            'contains': '%' + like + '%',
+            'term': text,
+            'picked': list(picked),
+            'limit': limit * _SCOPE_OVERFETCH,
+        }
+        contains = ' OR '.join(
+            'lower(p.%s) LIKE %%(contains)s' % column for column in _PARTNER_SEARCH_COLUMNS)
+        match = contains + (' OR lower(p.name) %% %(term)s' if fuzzy else '')
+        similarity = 'similarity(lower(p.name), %(term)s)' if fuzzy else '0'
+
+        if kind == 'architect':
+            scope = 'p.x_es_arquitecto' if 'x_es_arquitecto' in Partner._fields else 'TRUE'
+        else:
+            scope = 'p.customer_rank > 0'
+
+        self.env.cr.execute("""
+            SELECT p.id,
+                   CASE WHEN lower(p.name) LIKE %(prefix)s THEN 0
+                        WHEN lower(p.name) LIKE %(word)s
+                          OR lower(p.vat) LIKE %(prefix)s
+                          OR lower(p.ref) LIKE %(prefix)s THEN 1
+                        WHEN """ + contains + """ THEN 2
+                        ELSE 3
+                   END AS tier,
+                   """ + similarity + """ AS sim
+              FROM res_partner p
+             WHERE p.active
+               AND """ + scope + """
+               AND (""" + match + """)
+          ORDER BY tier, (p.id = ANY(%(picked)s)) DESC, sim DESC, p.name, p.id
+             LIMIT %(limit)s
+        """, params)
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _iv_typeahead_project_rows(self, term, partner_id, picked, limit):
+        """[(id, nivel, 0)] de project.project: prefijo y contiene con el
+        ORM (índice trigram del núcleo sobre name)."""
+        Project = self.env['project.project']
+        domain = []
+        if 'x_es_proyecto_marmol' in Project._fields:
+            domain.append(('x_es_proyecto_marmol', '=', True))
+        # Regla cliente→proyectos: con un cliente seleccionado solo se ofrecen
+        # SUS proyectos (o proyectos aún sin cliente); nunca los de otro cliente.
+        if partner_id:
+            domain += ['|', ('partner_id', '=', False),
+                       ('partner_id', 'child_of', int(partner_id))]
+
+        text = term.lower()
+        like = self._iv_like_escape(term)
+        found = Project.search(
+            domain + [('name', '=ilike', like + '%')], limit=limit, order='name')
+        if len(found) < limit:
+            found |= Project.search(
+                domain + [('name', 'ilike', term), ('id', 'not in', found.ids)],
+                limit=limit - len(found), order='name')
+        if picked:
+            found |= Project.search(
+                domain + [('name', 'ilike', term), ('id', 'in', list(picked)),
+                          ('id', 'not in', found.ids)])
+
+        rows = []
+        for project in found:
+            name = (project.name or '').lower()
+            if name.startswith(text):
+                tier = 0
+            elif (' ' + text) in name:
+                tier = 1
+            else:
+                tier = 2
+            rows.append((project.id, tier, 0))
+        return rows
+
+    @api.model
+    def _iv_typeahead_values(self, kind, record):
+        if kind == 'project':
+            return {'id': record.id, 'name': record.name}
+        values = {
+            'id': record.id,
+            'name': record.name,
+            'display_name': record.display_name,
+            'vat': record.vat or '',
+            'ref': record.ref or '',
+        }
+        if kind == 'partner':
+            values['email'] = record.email or ''
+        return values
+
+    @api.model
+    def typeahead(self, kind, term='', partner_id=None, limit=_TYPEAHEAD_LIMIT):
+        """Sugerencias ordenadas para el diálogo de apartado.
+        kind: 'partner' | 'project' | 'architect'. Sin texto: primero lo que
+        el vendedor usa, luego por nombre."""
+        if kind not in _HOLD_FIELD:
+            return []
+        if not self.check_sales_permissions():
+            raise UserError(_PERMISSION_ERRORS[kind])
+
+        Model = self.env['project.project' if kind == 'project' else 'res.partner']
+        term = (term or '').strip()
+        limit = min(int(limit or _TYPEAHEAD_LIMIT), 50)
+        picks = self._iv_typeahead_picks(kind)
+
+        if term:
+            if kind == 'project':
+                rows = self._iv_typeahead_project_rows(term, partner_id, picks, limit)
+            else:
+                rows = self._iv_typeahead_partner_rows(term, kind, picks, limit)
+        else:
+            rows = [(record_id, 0, 0) for record_id in picks]
+
+        # Permisos: solo lo que el usuario puede ver, y con el filtro del
+        # tipo (cliente / embajador / proyecto del cliente) aplicado.
+        scope_domain = []
+        if kind == 'partner':
+            scope_domain.append(('customer_rank', '>', 0))
+        elif kind == 'architect' and 'x_es_arquitecto' in Model._fields:
+            scope_domain.append(('x_es_arquitecto', '=', True))
+        elif kind == 'project':
+            if 'x_es_proyecto_marmol' in Model._fields:
+                scope_domain.append(('x_es_proyecto_marmol', '=', True))
+            if partner_id:
+                scope_domain += ['|', ('partner_id', '=', False),
+                                 ('partner_id', 'child_of', int(partner_id))]
+        records = {}
+        if rows:
+            records = {
+                record.id: record
+                for record in Model.search(scope_domain + [('id', 'in', [row[0] for row in rows])])
+            }
+
+        rows = [row for row in rows if row[0] in records]
+        rows.sort(key=lambda row: (
+            row[1], -picks.get(row[0], 0.0), -row[2], (records[row[0]].name or '').lower()))
+        ordered = [records[row[0]] for row in rows[:limit]]
+
+        if not term and len(ordered) < limit:
+            # Sin texto se completa con el listado por nombre de siempre.
+            ordered += list(Model.search(
+                scope_domain + [('id', 'not in', [record.id for record in ordered])],
+                limit=limit - len(ordered), order='name'))
+
+        result = []
+        for record in ordered:
+            values = self._iv_typeahead_values(kind, record)
+            values['frequent'] = record.id in picks
+            result.append(values)
+        return result
+
+    @api.model
+    def search_partners(self, name=''):
+        return self.typeahead('partner', name)
+
+    @api.model
+    def get_projects(self, search_term='', partner_id=None):
+        return self.typeahead('project', search_term, partner_id=partner_id)
+
+    @api.model
+    def get_architects(self, search_term=''):
+        return self.typeahead('architect', search_term)
@@ -1,21 +1,24 @@
 # -*- coding: utf-8 -*-
 """Walkthrough: inventario que YA SALIÓ del stock.
 
-Espejo del Inventario Visual pero sobre las salidas correctas:
-
-- ENTREGAS: quants con cantidad positiva en ubicaciones usage='customer'
-  (partida doble de Odoo: lo entregado se acumula en el cliente).
-- BAJAS: movimientos done de stock.scrap (move.scrap_id). NO se puede usar
-  el quant de la ubicación de desecho: en Odoo 19 el desecho comparte
-  ubicación/usage ('inventory') con la contrapartida de los ajustes, así
-  que un material que ENTRÓ por ajuste (−qty) y salió por baja (+qty)
-  deja el quant NETO EN CERO. La cantidad real dada de baja se toma de
-  los movimientos.
-
-Cada fila de detalle sigue siendo un stock.quant real (el de cliente, o
-el de la ubicación de desecho — se garantiza su existencia aunque esté en
-cero), para que la cadena existente (get_quant_details, get_lot_history,
-get_lot_photos, get_lot_notes) funcione sin cambios con detail.id.
+Espejo del Inventario Visual pero sobre las salidas correctas. Las salidas
+se leen de la bitácora som.lot.exit (ver som_lot_exit.py), no de un barrido
+en vivo de quants de cliente y movimientos: el costo depende del filtro, no
+de los años de historia.
+
+- ENTREGAS: salida neta hacia ubicaciones usage='customer' (devoluciones
+  restan).
+- BAJAS: movimientos done de stock.scrap (move.scrap_id) y ajustes de
+  inventario. NO se puede usar el quant de la ubicación de desecho: en
+  Odoo 19 el desecho comparte ubicación/usage ('inventory') con la
+  contrapartida de los ajustes, así que un material que ENTRÓ por ajuste
+  (−qty) y salió por baja (+qty) deja el quant NETO EN CERO. La cantidad
+  real dada de baja se toma de la bitácora.
+
+Cada fila de detalle se identifica por su llave de salida
+"<lot_id>-<location_id>", no por un stock.quant: buscar y expandir son de
+SOLO LECTURA (antes se creaban quants en cero para las bajas). Los diálogos
+(historial, fotos, notas) reciben el lot_id de la fila.
 
 Quedan fuera a propósito:
 - Lotes que aún tienen existencias en internal/transit/production (eso es
@@ -30,8 +33,14 @@ excluiría por active_test. Por eso los filtros de lote se resuelven
 aparte con active_test=False y los dominios reciben ('lot_id','in',ids).
 """
 import logging
+from datetime import datetime, time, timedelta
 
-from odoo import api, models
+import pytz
+
+from odoo import api, fields, models
+from odoo.addons.inventory_visual_enhanced.models.som_date_format import (
+    MESES_ES, som_format_date,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -40,8 +49,8 @@ class StockQuantWalkthrough(models.Model):
     _inherit = 'stock.quant'
 
     # ------------------------------------------------------------------
-    # Filtros comunes (aplican a stock.quant Y a stock.move.line: ambos
-    # tienen product_id y lot_id)
+    # Filtros comunes (aplican a stock.quant, stock.move.line y a la
+    # bitácora som.lot.exit: todos tienen product_id y lot_id)
     # ------------------------------------------------------------------
 
     @api.model
@@ -143,32 +152,15 @@ class StockQuantWalkthrough(models.Model):
         esos pertenecen al Inventario Visual, no al Walkthrough."""
         if not lot_ids:
             return set()
-        groups = self.sudo().read_group(
+        groups = self.sudo()._read_group(
             [
                 ('lot_id', 'in', list(lot_ids)),
                 ('quantity', '!=', 0),
                 ('location_id.usage', 'in', ['internal', 'transit', 'production']),
             ],
             ['lot_id'],
-            ['lot_id'],
         )
-        return {g['lot_id'][0] for g in groups if g.get('lot_id')}
-
-    @api.model
-    def _walkthrough_scrap_aggregates(self, common_domain):
-        """Bajas reales, agregadas desde los movimientos de stock.scrap:
-        {(lot, location_dest): qty_total}."""
-        move_lines = self.env['stock.move.line'].sudo().search([
-            ('state', '=', 'done'),
-            ('move_id.scrap_id', '!=', False),
-            ('lot_id', '!=', False),
-            ('location_dest_id.usage', '=', 'inventory'),
-        ] + list(common_domain))
-        aggregates = {}
-        for line in move_lines:
-            key = (line.lot_id, line.location_dest_id)
-            aggregates[key] = aggregates.get(key, 0.0) + (line.quantity or 0.0)
-        return aggregates
+        return {lot.id for (lot,) in groups if lot}
 
     @api.model
     def _walkthrough_reclassified_lot_ids(self, lot_ids):
@@ -182,74 +174,95 @@ class StockQuantWalkthrough(models.Model):
         return set(lines.mapped('lot_from_id').ids)
 
     @api.model
-    def _walkthrough_adjustment_aggregates(self, common_domain):
-        """Bajas por AJUSTE DE INVENTARIO (sin stock.scrap): neto por lote de
-        lo que salió del stock hacia la contrapartida de ajustes menos lo que
-        regresó por ajustes positivos. {(lot, location_dest): qty_neta}.
-
-        Se excluyen los lotes vaciados por reclasificación (lote espejo
-        vivo). Antes los ajustes quedaban fuera por completo y un material
-        dado de baja con ajuste directo jamás aparecía en el Walkthrough."""
-        MoveLine = self.env['stock.move.line'].sudo()
-        base = [
-            ('state', '=', 'done'),
-            ('lot_id', '!=', False),
-            ('move_id.scrap_id', '=', False),
-        ]
-        if 'is_inventory' in self.env['stock.move']._fields:
-            base.append(('move_id.is_inventory', '=', True))
-
-        out_lines = MoveLine.search(base + [
-            ('location_id.usage', 'in', ('internal', 'transit')),
-            ('location_dest_id.usage', '=', 'inventory'),
-        ] + list(common_domain))
-        in_lines = MoveLine.search(base + [
-            ('location_id.usage', '=', 'inventory'),
-            ('location_dest_id.usage', 'in', ('internal', 'transit')),
-        ] + list(common_domain))
-
-        net = {}
-        loss_location = {}
-        for line in out_lines:
-            lot = line.lot_id
-            net[lot] = net.get(lot, 0.0) + (line.quantity or 0.0)
-            loss_location.setdefault(lot, line.location_dest_id)
-        for line in in_lines:
-            lot = line.lot_id
-            net[lot] = net.get(lot, 0.0) - (line.quantity or 0.0)
+    def _walkthrough_date_domain(self, filters):
+        """Rango de fechas de salida (date_from / date_to, ISO, inclusivos)
+        como condiciones sobre som.lot.exit.date. Los días se cortan en la
+        zona horaria del usuario: una entrega de las 8 p. m. en México es de
+        ESE día, no del siguiente en UTC."""
+        filters = filters or {}
+        tz = pytz.timezone(self.env.user.tz or 'UTC')
+
+        def to_utc(day):
+            return tz.localize(datetime.combine(day, time.min)).astimezone(
+                pytz.utc).replace(tzinfo=None)
 
+        domain = []
+        try:
+            date_from = fields.Date.to_date(filters.get('date_from') or None)
+            date_to = fields.Date.to_date(filters.get('date_to') or None)
+        except (ValueError, TypeError):
+            return domain
+        if date_from:
+            domain.append(('date', '>=', to_utc(date_from)))
+        if date_to:
+            domain.append(('date', '<', to_utc(date_to + timedelta(days=1))))
+        return domain
+
+    @api.model
+    def _walkthrough_ledger_aggregates(self, common_domain, date_domain=()):
+        """Salida NETA desde la bitácora som.lot.exit, agregada en SQL:
+        {(lot, exit_location, exit_type): qty}.
+
+        common_domain sirve tal cual: la bitácora también tiene product_id y
+        lot_id. Los ajustes de lotes vaciados por reclasificación no cuentan
+        (el material sigue vivo en el lote espejo)."""
+        groups = self.env['som.lot.exit'].sudo()._read_group(
+            list(common_domain) + list(date_domain),
+            ['lot_id', 'exit_location_id', 'exit_type'],
+            ['quantity:sum'],
+        )
+        rows = [
+            (lot.id, location.id, exit_type, qty or 0.0)
+            for lot, location, exit_type, qty in groups
+            if lot and location
+        ]
         reclassified = self._walkthrough_reclassified_lot_ids(
-            [lot.id for lot in net])
+            {lot_id for lot_id, _loc, kind, _q in rows if kind == 'adjustment'})
 
+        # Un solo browse por modelo: los registros comparten el prefetch.
+        lots = {
+            lot.id: lot
+            for lot in self.env['stock.lot'].sudo().with_context(active_test=False)
+            .browse({r[0] for r in rows})
+        }
+        locations = {
+            loc.id: loc
+            for loc in self.env['stock.location'].sudo().with_context(active_test=False)
+            .browse({r[1] for r in rows})
+        }
         aggregates = {}
-        for lot, qty in net.items():
-            if qty <= 0.0001 or lot.id in reclassified:
+        for lot_id, location_id, kind, qty in sorted(rows):
+            if qty <= 0.0001:
                 continue
-            location = loss_location.get(lot)
-            if not location:
+            if kind == 'adjustment' and lot_id in reclassified:
                 continue
-            aggregates[(lot, location)] = qty
+            aggregates[(lots[lot_id], locations[location_id], kind)] = qty
         return aggregates
 
+    # ------------------------------------------------------------------
+    # Llaves de salida
+    # ------------------------------------------------------------------
+    # Cada fila del Walkthrough se identifica por "<lot_id>-<location_id>"
+    # (la ubicación de cliente o de desecho/ajuste donde quedó el
+    # material), NO por un stock.quant: antes se CREABAN quants en cero para
+    # las bajas durante una búsqueda de solo lectura (bloqueos de escritura
+    # y tabla de quants inflada).
+
     @api.model
-    def _walkthrough_ensure_quant(self, lot, location):
-        """Garantiza un stock.quant (aunque esté en cero) para usarlo como
-        detail.id: el cron de vacuum borra los quants en cero, y el quant de
-        la ubicación de desecho puede quedar neto en cero (ver docstring del
-        módulo). Un quant en cero no afecta existencias."""
-        Quant = self.sudo().with_context(active_test=False)
-        quant = Quant.search([
-            ('lot_id', '=', lot.id),
-            ('location_id', '=', location.id),
-        ], limit=1)
-        if not quant:
-            quant = Quant.create({
-                'product_id': lot.product_id.id,
-                'lot_id': lot.id,
-                'location_id': location.id,
-                'quantity': 0.0,
-            })
-        return quant
+    def _walkthrough_exit_key(self, lot, location):
+        return '%s-%s' % (lot.id, location.id)
+
+    @api.model
+    def _walkthrough_parse_exit_keys(self, exit_keys):
+        """[(lot_id, location_id)] válidos, en el orden recibido."""
+        pairs = []
+        for key in exit_keys or []:
+            try:
+                lot_id, location_id = (int(part) for part in str(key).split('-', 1))
+            except (TypeError, ValueError):
+                continue
+            pairs.append((lot_id, location_id))
+        return pairs
 
     # ------------------------------------------------------------------
     # Agrupación por producto
@@ -260,48 +273,39 @@ class StockQuantWalkthrough(models.Model):
         filters = filters or {}
         common_domain, missing_lots = self._walkthrough_common_filters(filters)
 
-        # Entregas: quants positivos en ubicación de cliente.
-        delivered_quants = self.sudo().search([
-            ('quantity', '>', 0),
-            ('lot_id', '!=', False),
-            ('location_id.usage', '=', 'customer'),
-        ] + list(common_domain), order='product_id, lot_id, id')
-
-        # Bajas: movimientos de stock.scrap.
-        scrap_aggregates = self._walkthrough_scrap_aggregates(common_domain)
-
-        # Bajas por AJUSTE de inventario (sin scrap): también son salidas
-        # y deben quedar registradas en el Walkthrough.
-        for key, qty in self._walkthrough_adjustment_aggregates(
-                common_domain).items():
-            scrap_aggregates[key] = scrap_aggregates.get(key, 0.0) + qty
+        # Salidas netas de la bitácora: entregas, bajas y ajustes (dentro
+        # del rango de fechas, si lo hay).
+        aggregates = self._walkthrough_ledger_aggregates(
+            common_domain, self._walkthrough_date_domain(filters))
 
         # Excluir lotes que siguen teniendo stock (devoluciones/entregas
         # parciales: mientras quede material, viven en el Inventario Visual).
-        all_lot_ids = set(delivered_quants.mapped('lot_id').ids)
-        all_lot_ids.update(lot.id for (lot, _loc) in scrap_aggregates)
+        all_lot_ids = {lot.id for (lot, _loc, _kind) in aggregates}
         lots_alive = self._walkthrough_lots_with_current_stock(all_lot_ids)
 
-        # Entradas normalizadas: (quant, lot, qty, kind).
+        # Entradas normalizadas: (exit_key, lot, qty, kind). Bajas y
+        # ajustes contra la misma ubicación se suman en una sola fila de
+        # baja. Nada aquí escribe: la búsqueda es de solo lectura.
         entries = []
-        for quant in delivered_quants:
-            if quant.lot_id.id in lots_alive:
+        scrap_sums = {}
+        for (lot, location, kind), qty in aggregates.items():
+            if lot.id in lots_alive:
                 continue
-            entries.append((quant, quant.lot_id, quant.quantity or 0.0, 'delivery'))
-        for (lot, location), qty in scrap_aggregates.items():
-            if lot.id in lots_alive or qty <= 0:
-                continue
-            quant = self._walkthrough_ensure_quant(lot, location)
-            entries.append((quant, lot, qty, 'scrap'))
+            if kind == 'delivery':
+                entries.append((self._walkthrough_exit_key(lot, location), lot, qty, 'delivery'))
+            else:
+                scrap_sums[(lot, location)] = scrap_sums.get((lot, location), 0.0) + qty
+        for (lot, location), qty in scrap_sums.items():
+            entries.append((self._walkthrough_exit_key(lot, location), lot, qty, 'scrap'))
 
         product_groups = {}
-        for quant, lot, qty, kind in entries:
+        for exit_key, lot, qty, kind in entries:
             product = lot.product_id
             group = product_groups.setdefault(product.id, {
                 'product': product,
                 'entries': [],
             })
-            group['entries'].append((quant, lot, qty, kind))
+            group['entries'].append((exit_key, lot, qty, kind))
 
         # Cant. mínima por bloque (sobre lo que salió, espejo del filtro
         # del Inventario Visual).
@@ -346,7 +350,7 @@ class StockQuantWalkthrough(models.Model):
                 'categ_name': product.categ_id.complete_name or '',
                 'tipo': (getattr(first_lot, 'x_tipo', '') or '') if first_lot else '',
                 'color': (getattr(first_lot, 'x_color', '') or '') if first_lot else '',
-                'quant_ids': [e[0].id for e in group_entries],
+                'exit_keys': [e[0] for e in group_entries],
                 'out_qty': sum(e[2] for e in group_entries),
                 'out_plates': len(group_entries),
                 'delivered_qty': sum(e[2] for e in delivered),
@@ -360,100 +364,272 @@ class StockQuantWalkthrough(models.Model):
         return {'products': products, 'missing_lots': missing_lots}
 
     # ------------------------------------------------------------------
-    # Detalles por quant (reutiliza get_quant_details + datos de salida)
+    # Detalles por llave de salida
     # ------------------------------------------------------------------
 
     @api.model
-    def get_walkthrough_details(self, quant_ids):
-        details = self.get_quant_details(quant_ids=quant_ids)
-        if not isinstance(details, list):
-            return details
-
-        quants = {
-            q.id: q
-            for q in self.sudo().with_context(active_test=False)
-            .browse(quant_ids).exists()
+    def _walkthrough_selection_label(self, record, field_name):
+        field = record._fields.get(field_name)
+        value = record[field_name] if field else False
+        if not field or not value:
+            return ''
+        if field.type != 'selection':
+            return value
+        selection = field.selection
+        if callable(selection):
+            selection = selection(record)
+        return dict(selection).get(value, '')
+
+    @api.model
+    def _walkthrough_exit_detail(self, lot, location, qty, kind):
+        """Fila de detalle de una salida, armada desde el LOTE (ya no hay
+        quant que leer). Mismas llaves que get_quant_details para que
+        ProductDetails agrupe y formatee igual."""
+        def lot_value(field_name, empty=''):
+            return lot[field_name] if field_name in lot._fields else empty
+
+        return {
+            'id': self._walkthrough_exit_key(lot, location),
+            'lot_id': lot.id,
+            'lot_name': lot.name,
+            'location_id': location.id,
+            'location_name': location.name,
+            'location_usage': location.usage,
+            'quantity': qty,
+            'reserved_quantity': 0.0,
+            'grosor': lot_value('x_grosor', False),
+            'alto': lot_value('x_alto', False),
+            'ancho': lot_value('x_ancho', False),
+            'color': lot_value('x_color'),
+            'tipo': self._walkthrough_selection_label(lot, 'x_tipo'),
+            'bloque': lot_value('x_bloque'),
+            'atado': lot_value('x_atado'),
+            'pedimento': lot_value('x_pedimento'),
+            'contenedor': lot_value('x_contenedor'),
+            'referencia_proveedor': lot_value('x_referencia_proveedor'),
+            'numero_placa': lot_value('x_numero_placa'),
+            'cantidad_fotos': len(lot.x_fotografia_ids) if 'x_fotografia_ids' in lot._fields else 0,
+            'detalles_placa': lot_value('x_detalles_placa'),
+            'tiene_hold': False,
+            'hold_info': None,
+            'en_orden_venta': False,
+            'sale_order_ids': [],
+            'en_taller': False,
+            'is_transit': False,
+            'exit_type': kind,
         }
-        MoveLine = self.env['stock.move.line'].sudo()
-        has_writeoff = 'stock.lot.writeoff.line' in self.env
 
-        for detail in details:
-            quant = quants.get(detail.get('id'))
-            if not quant:
+    @api.model
+    def _walkthrough_batch_exit_meta(self, pairs, date_domain=()):
+        """Fecha, documento y cliente de la ÚLTIMA salida de cada par
+        (lot_id, location_id), en una sola búsqueda sobre la bitácora."""
+        if not pairs:
+            return {}
+        wanted = set(pairs)
+        entries = self.env['som.lot.exit'].sudo().search([
+            ('lot_id', 'in', list({p[0] for p in wanted})),
+            ('exit_location_id', 'in', list({p[1] for p in wanted})),
+            ('quantity', '>', 0),
+        ] + list(date_domain), order='date desc, id desc')
+        meta = {}
+        for entry in entries:
+            pair = (entry.lot_id.id, entry.exit_location_id.id)
+            if pair not in wanted or pair in meta:
                 continue
+            meta[pair] = {
+                'exit_date': entry.date.strftime('%Y-%m-%d') if entry.date else '',
+                'exit_doc': entry.document or '',
+                'exit_partner': entry.partner_id.display_name if entry.partner_id else '',
+            }
+        return meta
 
-            is_scrap = quant.location_id.usage == 'inventory'
-            detail['exit_type'] = 'scrap' if is_scrap else 'delivery'
+    @api.model
+    def _walkthrough_batch_writeoffs(self, lot_ids):
+        """Folio y motivo de la Baja de Material más reciente por lote:
+        {lot_id: (folio, motivo)}. Una búsqueda y una sola lectura de la
+        selección de motivos."""
+        if not lot_ids or 'stock.lot.writeoff.line' not in self.env:
+            return {}
+        WriteoffLine = self.env['stock.lot.writeoff.line'].sudo()
+        lines = WriteoffLine.search([
+            ('lot_from_id', 'in', list(lot_ids)),
+            ('writeoff_id.state', '=', 'done'),
+        ], order='id desc')
+        if not lines:
+            return {}
+        Writeoff = self.env[WriteoffLine._fields['writeoff_id'].comodel_name]
+        reasons = dict(Writeoff._fields['reason_type']._description_selection(self.env))
+        result = {}
+        for line in lines:
+            if line.lot_from_id.id in result:
+                continue
+            rec = line.writeoff_id
+            result[line.lot_from_id.id] = (
+                rec.name, reasons.get(rec.reason_type, rec.reason_type or ''))
+        return result
 
-            out_domain = [
-                ('lot_id', '=', quant.lot_id.id),
-                ('location_dest_id', '=', quant.location_id.id),
-                ('state', '=', 'done'),
-            ]
-            if is_scrap:
-                # El documento y la CANTIDAD de la baja salen del movimiento
-                # de stock.scrap: el quant de la ubicación de desecho puede
-                # estar neto en cero (comparte ubicación con los ajustes).
-                out_domain.append(('move_id.scrap_id', '!=', False))
-                scrap_lines = MoveLine.search(
-                    out_domain, order='date desc, id desc')
-                if scrap_lines:
-                    detail['quantity'] = sum(
-                        line.quantity or 0.0 for line in scrap_lines)
-                else:
-                    # Baja por AJUSTE de inventario (sin stock.scrap): la
-                    # cantidad es el NETO de los ajustes contra esta
-                    # ubicación (salidas menos regresos).
-                    adj_base = [
-                        ('lot_id', '=', quant.lot_id.id),
-                        ('state', '=', 'done'),
-                        ('move_id.scrap_id', '=', False),
-                    ]
-                    adj_out = MoveLine.search(adj_base + [
-                        ('location_dest_id', '=', quant.location_id.id),
-                    ], order='date desc, id desc')
-                    adj_in = MoveLine.search(adj_base + [
-                        ('location_id', '=', quant.location_id.id),
-                    ])
-                    detail['quantity'] = (
-                        sum(line.quantity or 0.0 for line in adj_out)
-                        - sum(line.quantity or 0.0 for line in adj_in))
-                    scrap_lines = adj_out
-                detail['reserved_quantity'] = 0.0
-                last_out = scrap_lines[:1]
+    @api.model
+    def get_walkthrough_details(self, exit_keys, filters=None):
+        """Detalle de las salidas pedidas ("<lot_id>-<location_id>"). Solo
+        lectura: cantidades de la bitácora, atributos del lote. Con
+        date_from / date_to en filters, solo cuenta lo salido en el rango."""
+        pairs = self._walkthrough_parse_exit_keys(exit_keys)
+        if not pairs:
+            return []
+        date_domain = self._walkthrough_date_domain(filters)
+
+        lot_ids = {p[0] for p in pairs}
+        location_ids = {p[1] for p in pairs}
+        Ledger = self.env['som.lot.exit'].sudo()
+        groups = Ledger._read_group(
+            [('lot_id', 'in', list(lot_ids)), ('exit_location_id', 'in', list(location_ids))]
+            + date_domain,
+            ['lot_id', 'exit_location_id', 'exit_type'],
+            ['quantity:sum'],
+        )
+        qty_by_pair = {}
+        kind_by_pair = {}
+        for lot, location, exit_type, qty in groups:
+            if not lot or not location:
+                continue
+            pair = (lot.id, location.id)
+            qty_by_pair[pair] = qty_by_pair.get(pair, 0.0) + (qty or 0.0)
+            if exit_type == 'delivery':
+                kind_by_pair[pair] = 'delivery'
             else:
-                last_out = MoveLine.search(
-                    out_domain, order='date desc, id desc', limit=1)
-
-            detail['exit_date'] = (
-                last_out.date.strftime('%Y-%m-%d') if last_out and last_out.date else ''
-            )
-            exit_doc = ''
-            exit_partner = ''
-            if last_out:
-                picking = last_out.picking_id
-                exit_doc = (picking and picking.name) or last_out.reference or ''
-                if picking and picking.partner_id:
-                    exit_partner = picking.partner_id.display_name
-                elif last_out.move_id.origin:
-                    exit_doc = '%s (%s)' % (exit_doc, last_out.move_id.origin) \
-                        if exit_doc else last_out.move_id.origin
+                kind_by_pair.setdefault(pair, 'scrap')
 
+        lots = {
+            lot.id: lot
+            for lot in self.env['stock.lot'].sudo().with_context(active_test=False)
+            .browse(lot_ids).exists()
+        }
+        locations = {
+            loc.id: loc
+            for loc in self.env['stock.location'].sudo().with_context(active_test=False)
+            .browse(location_ids).exists()
+        }
+        exit_meta = self._walkthrough_batch_exit_meta(
+            [pair for pair in pairs if pair in kind_by_pair], date_domain)
+        writeoffs = self._walkthrough_batch_writeoffs(
+            {pair[0] for pair, kind in kind_by_pair.items() if kind == 'scrap'})
+
+        details = []
+        for pair in pairs:
+            lot = lots.get(pair[0])
+            location = locations.get(pair[1])
+            if not lot or not location or pair not in kind_by_pair:
+                continue
+            kind = kind_by_pair[pair]
+            detail = self._walkthrough_exit_detail(lot, location, qty_by_pair[pair], kind)
+            detail.update(exit_meta.get(pair) or {
+                'exit_date': '', 'exit_doc': '', 'exit_partner': '',
+            })
             # Si la salida fue una Baja de Material, mostrar folio y motivo.
-            if is_scrap and has_writeoff:
-                wo_line = self.env['stock.lot.writeoff.line'].sudo().search([
-                    ('lot_from_id', '=', quant.lot_id.id),
-                    ('writeoff_id.state', '=', 'done'),
-                ], order='id desc', limit=1)
-                if wo_line:
-                    rec = wo_line.writeoff_id
-                    reason_label = dict(
-                        rec._fields['reason_type'].selection
-                    ).get(rec.reason_type, rec.reason_type or '')
-                    exit_doc = rec.name
-                    exit_partner = reason_label
-
-            detail['exit_doc'] = exit_doc
-            detail['exit_partner'] = exit_partner
-
-        return details
+            if kind == 'scrap' and lot.id in writeoffs:
+                detail['exit_doc'], detail['exit_partner'] = writeoffs[lot.id]
+            details.append(detail)
+
+        # Mismo ícono de foto de bloque que el detalle del inventario.
+        return self._iv_mark_block_photos(details)
+
+    # ------------------------------------------------------------------
+    # Resumen por periodo (mes / semana)
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _walkthrough_period_bucket(self, start, period):
+        """(llave ISO, etiqueta) del periodo que empieza en 'start'."""
+        if not start:
+            return '', '—'
+        if period == 'week':
+            year, week, _wd = start.isocalendar()
+            return '%d-W%02d' % (year, week), 'Sem. %s' % som_format_date(start)
+        return '%d-%02d' % (start.year, start.month), '%s %d' % (
+            MESES_ES[start.month - 1], start.year)
+
+    @api.model
+    def get_walkthrough_period_rollup(self, filters=None, period='month'):
+        """Salidas por producto y por MES o SEMANA, agregadas en SQL sobre la
+        bitácora (nunca se cargan las salidas una por una).
+
+        A diferencia de la lista del Walkthrough aquí NO se excluyen los
+        lotes que aún tienen existencia: para analizar el desplazamiento en
+        el tiempo, una entrega parcial es una venta de ese periodo. Las
+        devoluciones restan CANTIDAD en el periodo en que regresaron, pero
+        no cuentan como placa: las placas son los lotes con algún asiento
+        positivo del tipo, con la misma clasificación que el detalle
+        (entrega; baja o ajuste = baja)."""
+        filters = filters or {}
+        period = 'week' if period == 'week' else 'month'
+        common_domain, missing_lots = self._walkthrough_common_filters(filters)
+        domain = list(common_domain) + self._walkthrough_date_domain(filters)
+
+        if 'stock.lot.reclassification.line' in self.env:
+            # Subconsulta, no lista de ids: el costo no crece con el
+            # histórico de reclasificaciones.
+            reclassified = self.env['stock.lot.reclassification.line'].sudo()._search(
+                [('lot_from_id', '!=', False)]).select('lot_from_id')
+            domain = domain + [
+                '|', ('exit_type', '!=', 'adjustment'),
+                ('lot_id', 'not in', reclassified),
+            ]
+
+        Ledger = self.env['som.lot.exit'].sudo().with_context(tz=self.env.user.tz or 'UTC')
+        groups = Ledger._read_group(
+            domain,
+            ['product_id', 'date:%s' % period, 'exit_type'],
+            ['quantity:sum'],
+        )
+        # Placas por tipo con un count_distinct por clase: juntar baja y
+        # ajuste en una sola cuenta no cuenta dos veces el mismo lote.
+        plates = {}
+        for kind, kind_domain in (
+                ('delivery', [('exit_type', '=', 'delivery')]),
+                ('scrap', [('exit_type', '!=', 'delivery')])):
+            for product, start, lot_count in Ledger._read_group(
+                    domain + kind_domain + [('quantity', '>', 0)],
+                    ['product_id', 'date:%s' % period],
+                    ['lot_id:count_distinct']):
+                plates[(product.id, start, kind)] = lot_count
+
+        periods = {}
+        products = {}
+        for product, start, exit_type, qty in groups:
+            key, label = self._walkthrough_period_bucket(start, period)
+            periods[key] = label
+            row = products.setdefault(product.id, {
+                'product_id': product.id,
+                'product_name': product.display_name,
+                'product_code': product.default_code or '',
+                'periods': {},
+                'out_qty': 0.0,
+                'delivered_qty': 0.0,
+                'scrapped_qty': 0.0,
+            })
+            cell = row['periods'].setdefault(key, {
+                'out_qty': 0.0,
+                'delivered_qty': 0.0,
+                'delivered_plates': plates.get((product.id, start, 'delivery'), 0),
+                'scrapped_qty': 0.0,
+                'scrapped_plates': plates.get((product.id, start, 'scrap'), 0),
+            })
+            qty = qty or 0.0
+            if exit_type == 'delivery':
+                cell['delivered_qty'] += qty
+                row['delivered_qty'] += qty
+            else:
+                cell['scrapped_qty'] += qty
+                row['scrapped_qty'] += qty
+            cell['out_qty'] += qty
+            row['out_qty'] += qty
+
+        return {
+            'period': period,
+            'periods': [
+                {'key': key, 'label': periods[key]} for key in sorted(periods)
+            ],
+            'products': sorted(
+                products.values(), key=lambda p: p['product_name'] or ''),
+            'missing_lots': missing_lots,
+        }
@@ -5,14 +5,60 @@ import { Dialog } from "@web/core/dialog/dialog";
 
 export class HistoryDialog extends Component {
     setup() {
-        this.history = this.props.history;
+        // Reactivo: "Cargar más" agrega filas a las secciones paginadas.
+        this.history = useState(this.props.history);
         this.orm = useService("orm");
         this.notification = useService("notification");
         this.state = useState({
             currentTab: 'general',
+            loadingSection: null,
         });
     }
 
+    /** Total de la sección (todas las páginas), o lo cargado si no hay paginación. */
+    sectionTotal(section) {
+        const page = this.history.pages && this.history.pages[section];
+        return page ? page.total : (this.history[section] || []).length;
+    }
+
+    hasMore(section) {
+        const page = this.history.pages && this.history.pages[section];
+        return !!page && page.loaded < page.total;
+    }
+
+    async loadMore(section) {
+        const page = this.history.pages && this.history.pages[section];
+        if (!page || this.state.loadingSection) {
+            return;
+        }
+        this.state.loadingSection = section;
+        try {
+            const result = await this.orm.call(
+                "stock.quant",
+                "get_lot_history_page",
+                [],
+                {
+                    section,
+                    lot_id: this.history.general_info.lot_id,
+                    offset: page.loaded,
+                    limit: this.history.page_size,
+                }
+            );
+            if (result.error) {
+                this.notification.add(result.error, { type: "warning" });
+                return;
+            }
+            this.history[section].push(...result.rows);
+            page.loaded += result.rows.length;
+            page.total = result.total;
+        } catch (error) {
+            console.error("[HISTORY] Error al cargar más registros:", error);
+            this.notification.add("Error al cargar más registros", { type: "danger" });
+        } finally {
+            this.state.loadingSection = null;
+        }
+    }
+
     switchTab(tabName) {
         this.state.currentTab = tabName;
     }
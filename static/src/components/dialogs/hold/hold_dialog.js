@@ -3,6 +3,7 @@
 import { Component, useState, onWillStart, onMounted, onWillUnmount } from "@odoo/owl";
 import { useService } from "@web/core/utils/hooks";
 import { Dialog } from "@web/core/dialog/dialog";
+import { getRecentPicks, rememberPick } from "../../../utils/typeahead_recent";
 
 export class CreateHoldDialog extends Component {
     setup() {
@@ -66,6 +67,11 @@ export class CreateHoldDialog extends Component {
         });
         
         this.searchTimeout = null;
+        // Solo la respuesta de la ÚLTIMA búsqueda se pinta (una lenta de
+        // una tecla anterior no pisa a la nueva).
+        this.searchSeq = 0;
+        this.state.partners = getRecentPicks("partner");
+        this.state.architects = getRecentPicks("architect");
         
         onWillStart(async () => {
             await this.loadCurrentUser();
@@ -167,6 +173,8 @@ export class CreateHoldDialog extends Component {
     onSearchPartner(ev) {
         const value = ev.target.value;
         this.state.searchPartnerTerm = value;
+        // Recientes al instante; el servidor reemplaza la lista al responder.
+        this.state.partners = getRecentPicks("partner", value);
         
         if (this.searchTimeout) {
             clearTimeout(this.searchTimeout);
@@ -178,6 +186,7 @@ export class CreateHoldDialog extends Component {
     }
     
     async searchPartners() {
+        const seq = ++this.searchSeq;
         try {
             const partners = await this.orm.call(
                 "stock.quant",
@@ -188,7 +197,9 @@ export class CreateHoldDialog extends Component {
                 }
             );
             
-            this.state.partners = partners;
+            if (seq === this.searchSeq) {
+                this.state.partners = partners;
+            }
         } catch (error) {
             console.error("Error buscando clientes:", error);
             this.notification.add("Error al buscar clientes", { type: "danger" });
@@ -196,6 +207,7 @@ export class CreateHoldDialog extends Component {
     }
     
     selectPartner(partner) {
+        rememberPick("partner", partner);
         const changed = this.state.selectedPartnerId !== partner.id;
         this.state.selectedPartnerId = partner.id;
         this.state.selectedPartnerName = partner.display_name;
@@ -205,7 +217,7 @@ export class CreateHoldDialog extends Component {
             // proyecto elegido y los resultados de búsqueda del anterior.
             this.state.selectedProjectId = null;
             this.state.selectedProjectName = '';
-            this.state.projects = [];
+            this.state.projects = getRecentPicks("project", "", partner.id);
         }
     }
     
@@ -255,6 +267,8 @@ export class CreateHoldDialog extends Component {
     onSearchProject(ev) {
         const value = ev.target.value;
         this.state.searchProjectTerm = value;
+        // Recientes al instante; el servidor reemplaza la lista al responder.
+        this.state.projects = getRecentPicks("project", value, this.state.selectedPartnerId);
         
         if (this.searchTimeout) {
             clearTimeout(this.searchTimeout);
@@ -266,6 +280,7 @@ export class CreateHoldDialog extends Component {
     }
     
     async searchProjects() {
+        const seq = ++this.searchSeq;
         try {
             const projects = await this.orm.call(
                 "stock.quant",
@@ -277,7 +292,9 @@ export class CreateHoldDialog extends Component {
                 }
             );
             
-            this.state.projects = projects;
+            if (seq === this.searchSeq) {
+                this.state.projects = projects;
+            }
         } catch (error) {
             console.error("Error buscando proyectos:", error);
             this.notification.add("Error al buscar proyectos", { type: "danger" });
@@ -285,6 +302,7 @@ export class CreateHoldDialog extends Component {
     }
     
     selectProject(project) {
+        rememberPick("project", project, this.state.selectedPartnerId);
         this.state.selectedProjectId = project.id;
         this.state.selectedProjectName = project.name;
         this.state.showCreateProject = false;
@@ -333,6 +351,8 @@ export class CreateHoldDialog extends Component {
     onSearchArchitect(ev) {
         const value = ev.target.value;
         this.state.searchArchitectTerm = value;
+        // Recientes al instante; el servidor reemplaza la lista al responder.
+        this.state.architects = getRecentPicks("architect", value);
         
         if (this.searchTimeout) {
             clearTimeout(this.searchTimeout);
@@ -344,6 +364,7 @@ export class CreateHoldDialog extends Component {
     }
     
     async searchArchitects() {
+        const seq = ++this.searchSeq;
         try {
             const architects = await this.orm.call(
                 "stock.quant",
@@ -354,7 +375,9 @@ export class CreateHoldDialog extends Component {
                 }
             );
             
-            this.state.architects = architects;
+            if (seq === this.searchSeq) {
+                this.state.architects = architects;
+            }
         } catch (error) {
             console.error("Error buscando embajadores:", error);
             this.notification.add("Error al buscar embajadores", { type: "danger" });
@@ -362,6 +385,7 @@ export class CreateHoldDialog extends Component {
     }
     
     selectArchitect(architect) {
+        rememberPick("architect", architect);
         this.state.selectedArchitectId = architect.id;
         this.state.selectedArchitectName = architect.display_name;
         this.state.showCreateArchitect = false;
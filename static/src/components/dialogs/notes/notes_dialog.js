@@ -8,6 +8,8 @@ export class NotesDialog extends Component {
     setup() {
         this.notesData = this.props.notesData;
         this.detailId = this.props.detailId;
+        // Walkthrough: las filas de salida no tienen quant, llegan por lote.
+        this.lotId = this.props.lotId || false;
         this.orm = useService("orm");
         this.notification = useService("notification");
         
@@ -42,10 +44,9 @@ export class NotesDialog extends Component {
                 "stock.quant",
                 "save_lot_notes",
                 [],
-                {
-                    quant_id: this.detailId,
-                    notes: this.state.notes
-                }
+                this.lotId
+                    ? { lot_id: this.lotId, notes: this.state.notes }
+                    : { quant_id: this.detailId, notes: this.state.notes }
             );
             
             if (result.success) {
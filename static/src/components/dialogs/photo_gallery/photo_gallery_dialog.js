@@ -3,6 +3,14 @@
 import { Component, useState, useRef, onWillUnmount } from "@odoo/owl";
 import { useService } from "@web/core/utils/hooks";
 import { Dialog } from "@web/core/dialog/dialog";
+import {
+    compressPhoto,
+    base64ToBlob,
+    uploadLotPhoto,
+    uploadLotPhotosBatch,
+    photoBatchId,
+    photoUploadKey,
+} from "../../../utils/photo_pipeline";
 
 export class PhotoGalleryDialog extends Component {
     setup() {
@@ -35,8 +43,16 @@ export class PhotoGalleryDialog extends Component {
             
             // Visor fullscreen
             showFullscreenViewer: false,
+
+            // Subida masiva: {phase, done, total} mientras corre
+            batchProgress: null,
+            hasPendingBatch: false,
         });
 
+        // Fotos ya comprimidas que no alcanzaron a confirmarse (conexión
+        // caída): se reintentan con las MISMAS llaves, sin duplicar.
+        this.pendingBatchItems = [];
+
         this.compressionConfig = {
             maxWidth: 1280,
             maxHeight: 1280,
@@ -188,18 +204,12 @@ export class PhotoGalleryDialog extends Component {
 
     // === DESCARGA Y COMPARTIR ===
 
-    downloadCurrentImage() {
+    async downloadCurrentImage() {
         if (!this.currentPhoto) return;
         
         try {
-            // Convertir base64 a Blob
-            const byteCharacters = atob(this.currentPhoto.image);
-            const byteNumbers = new Array(byteCharacters.length);
-            for (let i = 0; i < byteCharacters.length; i++) {
-                byteNumbers[i] = byteCharacters.charCodeAt(i);
-            }
-            const byteArray = new Uint8Array(byteNumbers);
-            const blob = new Blob([byteArray], { type: 'image/png' });
+            // base64 → Blob en el worker de fotos (no bloquea la UI)
+            const blob = await base64ToBlob(this.currentPhoto.image, 'image/png');
             const fileName = this.isBlockMode
                 ? `Referencia_bloque_${this.blockName || 'SOM'}.png`
                 : (this.currentPhoto.name || `foto_${this.photosData.lot_name}.png`);
@@ -262,14 +272,7 @@ export class PhotoGalleryDialog extends Component {
     async shareCurrentImage() {
         if (!this.currentPhoto) return;
         
-        // Convertir base64 a Blob
-        const byteCharacters = atob(this.currentPhoto.image);
-        const byteNumbers = new Array(byteCharacters.length);
-        for (let i = 0; i < byteCharacters.length; i++) {
-            byteNumbers[i] = byteCharacters.charCodeAt(i);
-        }
-        const byteArray = new Uint8Array(byteNumbers);
-        const blob = new Blob([byteArray], { type: 'image/png' });
+        const blob = await base64ToBlob(this.currentPhoto.image, 'image/png');
         const shareName = this.isBlockMode
             ? `Referencia_bloque_${this.blockName || 'SOM'}.png`
             : (this.currentPhoto.name || 'imagen.png');
@@ -298,13 +301,7 @@ export class PhotoGalleryDialog extends Component {
         if (!this.currentPhoto) return;
         
         try {
-            const byteCharacters = atob(this.currentPhoto.image);
-            const byteNumbers = new Array(byteCharacters.length);
-            for (let i = 0; i < byteCharacters.length; i++) {
-                byteNumbers[i] = byteCharacters.charCodeAt(i);
-            }
-            const byteArray = new Uint8Array(byteNumbers);
-            const blob = new Blob([byteArray], { type: 'image/png' });
+            const blob = await base64ToBlob(this.currentPhoto.image, 'image/png');
             
             await navigator.clipboard.write([
                 new ClipboardItem({ 'image/png': blob })
@@ -512,100 +509,15 @@ export class PhotoGalleryDialog extends Component {
     // === COMPRESIÓN Y SUBIDA ===
 
     async compressImage(file) {
-        return new Promise((resolve, reject) => {
-            const { maxWidth, maxHeight, quality, maxSizeKB, minQuality } = this.compressionConfig;
-            
-            const img = new Image();
-            
-            img.onload = () => {
-                URL.revokeObjectURL(img.src);
-                
-                let { width, height } = img;
-                
-                if (width > maxWidth || height > maxHeight) {
-                    const ratio = Math.min(maxWidth / width, maxHeight / height);
-                    width = Math.round(width * ratio);
-                    height = Math.round(height * ratio);
-                }
-                
-                const canvas = document.createElement('canvas');
-                canvas.width = width;
-                canvas.height = height;
-                
-                const ctx = canvas.getContext('2d');
-                
-                ctx.fillStyle = '#FFFFFF';
-                ctx.fillRect(0, 0, width, height);
-                ctx.imageSmoothingEnabled = true;
-                ctx.imageSmoothingQuality = 'high';
-                ctx.drawImage(img, 0, 0, width, height);
-                
-                if (this.drawingHistory.length > 0 && this.canvas) {
-                    const scaleX = width / this.canvas.width;
-                    const scaleY = height / this.canvas.height;
-                    
-                    for (const path of this.drawingHistory) {
-                        if (path.length === 0) continue;
-                        
-                        ctx.beginPath();
-                        ctx.strokeStyle = path[0].color;
-                        ctx.lineWidth = path[0].size * Math.min(scaleX, scaleY);
-                        ctx.lineCap = 'round';
-                        ctx.lineJoin = 'round';
-                        ctx.moveTo(path[0].x * scaleX, path[0].y * scaleY);
-                        
-                        for (let i = 1; i < path.length; i++) {
-                            ctx.lineTo(path[i].x * scaleX, path[i].y * scaleY);
-                        }
-                        ctx.stroke();
-                        ctx.closePath();
-                    }
-                }
-                
-                const supportsWebP = canvas.toDataURL('image/webp').startsWith('data:image/webp');
-                const mimeType = supportsWebP ? 'image/webp' : 'image/jpeg';
-                const extension = supportsWebP ? 'webp' : 'jpg';
-                
-                let currentQuality = quality;
-                let dataUrl = canvas.toDataURL(mimeType, currentQuality);
-                let base64 = dataUrl.split(',')[1];
-                let sizeKB = (base64.length * 0.75) / 1024;
-                
-                while (sizeKB > maxSizeKB && currentQuality > minQuality) {
-                    currentQuality -= 0.1;
-                    dataUrl = canvas.toDataURL(mimeType, currentQuality);
-                    base64 = dataUrl.split(',')[1];
-                    sizeKB = (base64.length * 0.75) / 1024;
-                }
-                
-                if (sizeKB > maxSizeKB * 1.5) {
-                    const scale = 0.7;
-                    canvas.width = Math.round(width * scale);
-                    canvas.height = Math.round(height * scale);
-                    ctx.fillStyle = '#FFFFFF';
-                    ctx.fillRect(0, 0, canvas.width, canvas.height);
-                    ctx.drawImage(img, 0, 0, canvas.width, canvas.height);
-                    dataUrl = canvas.toDataURL(mimeType, minQuality);
-                    base64 = dataUrl.split(',')[1];
-                    sizeKB = (base64.length * 0.75) / 1024;
-                }
-                
-                resolve({
-                    base64,
-                    extension,
-                    mimeType,
-                    finalSizeKB: sizeKB,
-                    finalQuality: currentQuality,
-                    dimensions: { width: canvas.width, height: canvas.height }
-                });
-            };
-            
-            img.onerror = () => {
-                URL.revokeObjectURL(img.src);
-                reject(new Error('Error al cargar la imagen'));
-            };
-            
-            img.src = URL.createObjectURL(file);
+        // Redimensionar, aplanar los trazos y re-codificar corre en el
+        // worker de fotos (utils/photo_pipeline.js): en el hilo principal
+        // una foto de 12 MP congelaba el teléfono varios segundos.
+        return compressPhoto(file, {
+            paths: this.drawingHistory,
+            sourceSize: this.canvas
+                ? { width: this.canvas.width, height: this.canvas.height }
+                : null,
+            config: this.compressionConfig,
         });
     }
     
@@ -630,17 +542,12 @@ export class PhotoGalleryDialog extends Component {
             photoName = photoName.replace(/\.(jpg|jpeg|png|gif|webp|bmp)$/i, '');
             photoName = `${photoName}.${compressed.extension}`;
             
-            const result = await this.orm.call(
-                "stock.quant",
-                "save_lot_photo",
-                [],
-                {
-                    quant_id: this.detailId,
-                    photo_name: photoName,
-                    photo_data: compressed.base64,
-                    sequence: 10,
-                    notas: ''
-                }
+            // Subida BINARIA (multipart): sin inflar a base64 dentro del JSON.
+            const result = await uploadLotPhoto(
+                this.detailId,
+                compressed.blob,
+                photoName,
+                { sequence: 10, notas: '' }
             );
             
             if (result.success) {
@@ -661,6 +568,100 @@ export class PhotoGalleryDialog extends Component {
         }
     }
     
+    // === SUBIDA MASIVA ===
+
+    openBatchPicker() {
+        const input = document.createElement('input');
+        input.type = 'file';
+        input.accept = 'image/*';
+        input.multiple = true;
+        input.onchange = (e) => {
+            const files = Array.from(e.target.files || []).filter(
+                (f) => f.type.startsWith('image/'));
+            if (files.length) {
+                this.uploadBatch(files);
+            }
+        };
+        input.click();
+    }
+
+    async uploadBatch(files) {
+        this.state.isUploading = true;
+        this.state.batchProgress = { phase: 'compress', done: 0, total: files.length };
+        try {
+            const items = [];
+            const baseName = `Foto - ${this.photosData.lot_name}`;
+            const batchId = photoBatchId();
+            for (const [idx, file] of files.entries()) {
+                const compressed = await compressPhoto(file, { config: this.compressionConfig });
+                items.push({
+                    key: photoUploadKey(this.detailId, file, { batchId, index: idx }),
+                    quantId: this.detailId,
+                    blob: compressed.blob,
+                    name: `${baseName} (${idx + 1}).${compressed.extension}`,
+                    sequence: 10,
+                });
+                this.state.batchProgress = { phase: 'compress', done: idx + 1, total: files.length };
+            }
+            await this.sendBatch(items);
+        } catch (error) {
+            console.error("Error en subida masiva:", error);
+            this.notification.add("Error al procesar las fotos: " + error.message, { type: "danger" });
+        } finally {
+            this.state.isUploading = false;
+            this.state.batchProgress = null;
+        }
+    }
+
+    async retryPendingBatch() {
+        if (!this.pendingBatchItems.length) return;
+        this.state.isUploading = true;
+        try {
+            await this.sendBatch(this.pendingBatchItems);
+        } finally {
+            this.state.isUploading = false;
+            this.state.batchProgress = null;
+        }
+    }
+
+    async sendBatch(items) {
+        this.state.batchProgress = { phase: 'upload', done: 0, total: items.length };
+        const { results, pending } = await uploadLotPhotosBatch(items, {
+            onProgress: ({ done, total }) => {
+                this.state.batchProgress = { phase: 'upload', done, total };
+            },
+        });
+
+        const outcomes = Object.values(results);
+        const saved = outcomes.filter((r) => r.success).length;
+        const failed = outcomes.filter((r) => !r.success);
+
+        this.pendingBatchItems = pending;
+        this.state.hasPendingBatch = pending.length > 0;
+
+        if (pending.length) {
+            this.notification.add(
+                `Se guardaron ${saved} de ${items.length} fotos. Sin conexión para ` +
+                `${pending.length}: usa "Reintentar pendientes".`,
+                { type: "warning", sticky: true }
+            );
+            return;
+        }
+        if (failed.length) {
+            this.notification.add(
+                `Se guardaron ${saved} fotos; ${failed.length} con error: ` +
+                (failed[0].error || "error desconocido"),
+                { type: "warning" }
+            );
+        } else {
+            this.notification.add(`${saved} fotografías guardadas`, { type: "success" });
+        }
+        this.props.close();
+        if (this.props.onReload) {
+            await this.props.onReload();
+        }
+    }
+
     openImageInNewTab(imageData) {
         // Ahora abre el visor fullscreen en lugar de nueva pestaña
         this.openFullscreenViewer();
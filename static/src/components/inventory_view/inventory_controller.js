@@ -1,8 +1,20 @@
 /** @odoo-module **/
 
-import { Component, useState, onWillStart } from "@odoo/owl";
+import { Component, useState, onWillStart, onWillUnmount, useExternalListener } from "@odoo/owl";
 import { registry } from "@web/core/registry";
 import { useService } from "@web/core/utils/hooks";
+import { loadPermissionProfile } from "../../utils/permission_profile";
+import { somFormatDate } from "../../utils/som_date";
+import { exportResults } from "../../utils/export_results";
+import {
+    isOfflineCacheEnabled,
+    setOfflineCacheEnabled,
+    loadSearch,
+    saveSearch,
+    saveDetails,
+    saveThumbnails,
+    loadThumbnails,
+} from "../../utils/offline_snapshot";
 import { SearchBar } from "../search_bar/search_bar";
 import { ProductRow } from "../product_row/product_row";
 import { PhotoGalleryDialog } from "../dialogs/photo_gallery/photo_gallery_dialog";
@@ -14,11 +26,18 @@ import { SaleOrderDialog } from "../dialogs/sale_order/sale_order_dialog";
 import { HoldInfoDialog } from "../dialogs/hold_info/hold_info_dialog";
 import { WorkshopInfoDialog } from "../dialogs/workshop_info/workshop_info_dialog";
 
+// Avisos en vivo (models/stock_quant_live_updates.py): un canal por producto.
+const LIVE_MESSAGE = "inventory_visual_enhanced/quant_changed";
+const LIVE_CHANNEL = (productId) => `inventory_visual_enhanced/product/${productId}`;
+// Ventana para juntar avisos seguidos (un picking grande manda varios).
+const LIVE_DEBOUNCE_MS = 400;
+
 class InventoryVisualController extends Component {
     setup() {
         this.orm = useService("orm");
         this.notification = useService("notification");
         this.dialog = useService("dialog");
+        this.busService = useService("bus_service");
 
         this.state = useState({
             isSearching: false,
@@ -37,6 +56,14 @@ class InventoryVisualController extends Component {
 
             // Agrupador del detalle de lotes: "prefix" (contenedor, default) | "block"
             groupMode: "prefix",
+
+            // Copia sin conexión (opcional, por dispositivo): isStale marca
+            // que lo que se ve viene de la copia local y puede estar viejo.
+            offlineEnabled: isOfflineCacheEnabled(),
+            isStale: false,
+            snapshotSavedAt: null,
+
+            isExporting: false,
         });
 
         // Lote inicial: llega cuando la Búsqueda Global del home abre el
@@ -47,18 +74,45 @@ class InventoryVisualController extends Component {
                  (this.props.action.context && this.props.action.context.lot_name))) ||
             "";
 
+        // Avisos en vivo: canales suscritos, avisos pendientes por producto
+        // y los filtros de la última búsqueda (para re-pedir solo lo que
+        // cambió con el mismo criterio).
+        this.liveChannels = new Set();
+        this.livePending = new Map();
+        this.liveTimer = null;
+        this.lastFilters = null;
+        this.searchSeq = 0;
+        this.onLiveChange = this.onLiveChange.bind(this);
+        this.busService.subscribe(LIVE_MESSAGE, this.onLiveChange);
+
         onWillStart(async () => {
             await this.loadPermissions();
         });
+
+        // Al volver la señal se revalida la búsqueda en pantalla.
+        useExternalListener(window, "online", () => {
+            if (this.state.isStale && this.lastFilters) {
+                this.onSearch(this.lastFilters);
+            }
+        });
+        useExternalListener(window, "offline", () => {
+            if (this.state.offlineEnabled && this.state.hasSearched) {
+                this.state.isStale = true;
+            }
+        });
+
+        onWillUnmount(() => {
+            this.busService.unsubscribe(LIVE_MESSAGE, this.onLiveChange);
+            this.syncLiveChannels([]);
+            clearTimeout(this.liveTimer);
+        });
     }
 
     async loadPermissions() {
         try {
-            const salesPerms = await this.orm.call("stock.quant", "check_sales_permissions", []);
-            const inventoryPerms = await this.orm.call("stock.quant", "check_inventory_permissions", []);
-
-            this.state.hasSalesPermissions = salesPerms;
-            this.state.hasInventoryPermissions = inventoryPerms;
+            const profile = await loadPermissionProfile(this.orm);
+            this.state.hasSalesPermissions = profile.is_sales_user;
+            this.state.hasInventoryPermissions = profile.is_inventory_user;
         } catch (error) {
             console.error("[PERMISOS] Error verificando permisos:", error);
             this.state.hasSalesPermissions = false;
@@ -70,20 +124,74 @@ class InventoryVisualController extends Component {
         this.state.groupMode = mode === "prefix" ? "prefix" : "block";
     }
 
+    isVisibleInMode(product) {
+        // Resguardo de display: en cada modo solo productos CON existencia.
+        // En MIXTO ('all') un producto que solo viene en tránsito también
+        // cuenta (antes se filtraba por stock_qty y desaparecía de la
+        // búsqueda por nombre aunque sí existiera en tránsito).
+        const mode = this.state.stockMode;
+        return mode === "transit"
+            ? (product.transit_qty || 0) > 0
+            : mode === "stock"
+                ? (product.stock_qty || 0) > 0
+                : ((product.stock_qty || 0) > 0 || (product.transit_qty || 0) > 0);
+    }
+
+    async onExport(fileFormat) {
+        if (!this.lastFilters || this.state.isExporting) {
+            return;
+        }
+        this.state.isExporting = true;
+        try {
+            await exportResults({
+                mode: "inventory",
+                fileFormat,
+                filters: this.lastFilters,
+            });
+        } catch (error) {
+            console.error("[INVENTORY] Error al exportar:", error);
+            this.notification.add("Error al exportar el inventario", { type: "danger" });
+        } finally {
+            this.state.isExporting = false;
+        }
+    }
+
     async onSearch(filters) {
+        this.searchSeq++;
+        this.livePending.clear();
         if (!filters || !Object.values(filters).some((v) => v !== null && v !== "")) {
             this.state.hasSearched = false;
             this.state.products = [];
             this.state.expandedProducts.clear();
             this.state.productDetails = {};
+            this.lastFilters = null;
+            this.syncLiveChannels([]);
             return;
         }
 
-        this.state.isLoading = true;
         this.state.error = null;
+        this.state.isStale = false;
         this.state.stockMode = (filters && filters.stock_mode) || "all";
 
+        // Con la copia local activa se pinta AL INSTANTE lo guardado y se
+        // revalida detrás; si la versión del servidor no cambió, ahí acaba.
+        const offline = this.state.offlineEnabled;
+        const snapshot = offline ? await loadSearch(filters) : null;
+        if (snapshot) {
+            this.applySnapshot(filters, snapshot);
+        } else {
+            this.state.isLoading = true;
+        }
+
         try {
+            const version = offline
+                ? await this.orm.call("stock.quant", "get_inventory_version", [])
+                : null;
+            if (snapshot && snapshot.version === version) {
+                this.state.snapshotSavedAt = null;
+                return;
+            }
+
             const result = await this.orm.call(
                 "stock.quant",
                 "get_inventory_grouped_by_product",
@@ -116,24 +224,20 @@ class InventoryVisualController extends Component {
                 missingLots = result.missing_lots || [];
             }
 
-            // Resguardo de display: en cada modo solo productos CON existencia.
-            // En MIXTO ('all') un producto que solo viene en tránsito también
-            // cuenta (antes se filtraba por stock_qty y desaparecía de la
-            // búsqueda por nombre aunque sí existiera en tránsito).
-            const mode = this.state.stockMode;
-            products = products.filter((p) =>
-                mode === "transit"
-                    ? (p.transit_qty || 0) > 0
-                    : mode === "stock"
-                        ? (p.stock_qty || 0) > 0
-                        : ((p.stock_qty || 0) > 0 || (p.transit_qty || 0) > 0)
-            );
+            products = products.filter((p) => this.isVisibleInMode(p));
 
             this.state.products = products;
             this.state.hasSearched = true;
             this.state.totalProducts = products.length;
             this.state.expandedProducts.clear();
             this.state.productDetails = {};
+            this.lastFilters = filters;
+            this.state.snapshotSavedAt = null;
+            this.syncLiveChannels(products.map((p) => p.product_id));
+
+            if (offline) {
+                saveSearch(filters, { version, products });
+            }
 
             if (products.length === 0) {
                 this.notification.add(
@@ -150,6 +254,10 @@ class InventoryVisualController extends Component {
                 );
             }
         } catch (error) {
+            if (snapshot) {
+                this.markStale();
+                return;
+            }
             console.error("Error al buscar productos:", error);
             this.state.error = "Error al cargar los productos. Por favor intenta nuevamente.";
             this.notification.add("Error al cargar los productos", { type: "danger" });
@@ -184,7 +292,20 @@ class InventoryVisualController extends Component {
             );
 
             this.state.productDetails[productId] = details;
+            if (this.state.offlineEnabled && this.lastFilters) {
+                saveDetails(this.lastFilters, productId, details);
+                this.cacheThumbnails(details);
+            }
         } catch (error) {
+            if (this.state.offlineEnabled && this.lastFilters) {
+                const snapshot = await loadSearch(this.lastFilters);
+                const cached = snapshot && snapshot.details && snapshot.details[productId];
+                if (cached) {
+                    this.state.productDetails[productId] = cached;
+                    this.markStale();
+                    return;
+                }
+            }
             console.error("Error al cargar detalles:", error);
             this.notification.add(
                 "Error al cargar detalles del producto: " +
@@ -199,6 +320,177 @@ class InventoryVisualController extends Component {
         }
     }
 
+    // === COPIA SIN CONEXIÓN ===
+
+    async toggleOfflineCache() {
+        const enabled = !this.state.offlineEnabled;
+        await setOfflineCacheEnabled(enabled);
+        this.state.offlineEnabled = enabled;
+        if (!enabled) {
+            this.state.isStale = false;
+            this.state.snapshotSavedAt = null;
+        }
+        this.notification.add(
+            enabled
+                ? "Copia sin conexión activada en este dispositivo: las próximas búsquedas se guardan."
+                : "Copia sin conexión desactivada y borrada de este dispositivo.",
+            { type: "info" }
+        );
+    }
+
+    applySnapshot(filters, snapshot) {
+        const products = (snapshot.products || []).filter((p) => this.isVisibleInMode(p));
+        this.state.products = products;
+        this.state.hasSearched = true;
+        this.state.totalProducts = products.length;
+        this.state.expandedProducts.clear();
+        this.state.productDetails = { ...(snapshot.details || {}) };
+        this.state.snapshotSavedAt = snapshot.savedAt;
+        this.state.isStale = typeof navigator !== "undefined" && navigator.onLine === false;
+        this.lastFilters = filters;
+        this.syncLiveChannels(products.map((p) => p.product_id));
+    }
+
+    markStale() {
+        if (!this.state.isStale) {
+            this.notification.add(
+                "Sin conexión: se muestra la copia guardada en este dispositivo.",
+                { type: "warning" }
+            );
+        }
+        this.state.isStale = true;
+    }
+
+    formatSnapshotDate() {
+        return this.state.snapshotSavedAt
+            ? somFormatDate(new Date(this.state.snapshotSavedAt), { withTime: true })
+            : "";
+    }
+
+    async cacheThumbnails(details) {
+        const quantIds = details.filter((d) => d.cantidad_fotos > 0).map((d) => d.id);
+        if (!quantIds.length) {
+            return;
+        }
+        try {
+            const thumbnails = await this.orm.call(
+                "stock.quant", "get_lot_photo_thumbnails", [], { quant_ids: quantIds });
+            await saveThumbnails(thumbnails);
+        } catch (error) {
+            console.warn("[SIN CONEXIÓN] No se guardaron las miniaturas:", error);
+        }
+    }
+
+    // === AVISOS EN VIVO ===
+
+    syncLiveChannels(productIds) {
+        const wanted = new Set(productIds.map(LIVE_CHANNEL));
+        for (const channel of this.liveChannels) {
+            if (!wanted.has(channel)) {
+                this.busService.deleteChannel(channel);
+            }
+        }
+        for (const channel of wanted) {
+            if (!this.liveChannels.has(channel)) {
+                this.busService.addChannel(channel);
+            }
+        }
+        this.liveChannels = wanted;
+    }
+
+    onLiveChange(payload) {
+        const productId = payload && payload.product_id;
+        if (!productId || !this.state.products.some((p) => p.product_id === productId)) {
+            return;
+        }
+        const entry = this.livePending.get(productId) || new Set();
+        for (const quantId of payload.quant_ids || []) {
+            entry.add(quantId);
+        }
+        this.livePending.set(productId, entry);
+        clearTimeout(this.liveTimer);
+        this.liveTimer = setTimeout(() => this.applyLiveChanges(), LIVE_DEBOUNCE_MS);
+    }
+
+    async applyLiveChanges() {
+        if (!this.livePending.size || !this.lastFilters) {
+            return;
+        }
+        const pending = new Map(this.livePending);
+        this.livePending.clear();
+        const seq = this.searchSeq;
+
+        let fresh;
+        try {
+            const result = await this.orm.call(
+                "stock.quant",
+                "get_inventory_grouped_by_product",
+                [],
+                { filters: { ...this.lastFilters, product_ids: [...pending.keys()] } }
+            );
+            fresh = new Map(
+                ((result && result.products) || []).map((p) => [p.product_id, p]));
+        } catch (error) {
+            console.warn("[EN VIVO] No se pudo refrescar:", error);
+            return;
+        }
+        // Una búsqueda nueva mientras tanto ya trajo todo de cero.
+        if (seq !== this.searchSeq) {
+            return;
+        }
+
+        for (const [productId, changedQuantIds] of pending) {
+            const index = this.state.products.findIndex((p) => p.product_id === productId);
+            if (index === -1) {
+                continue;
+            }
+            const product = fresh.get(productId);
+            if (!product || !this.isVisibleInMode(product)) {
+                // Se quedó sin existencia para este criterio: fuera de la lista.
+                this.state.products.splice(index, 1);
+                this.state.expandedProducts.delete(productId);
+                delete this.state.productDetails[productId];
+                continue;
+            }
+            this.state.products[index] = product;
+            if (this.state.productDetails[productId]) {
+                await this.patchProductRows(productId, product.quant_ids, changedQuantIds);
+            }
+        }
+        this.state.totalProducts = this.state.products.length;
+        this.state.expandedProducts = new Set(this.state.expandedProducts);
+        this.syncLiveChannels(this.state.products.map((p) => p.product_id));
+    }
+
+    async patchProductRows(productId, quantIds, changedQuantIds) {
+        const current = this.state.productDetails[productId] || [];
+        const keep = new Set(quantIds);
+        const loaded = new Set(current.map((d) => d.id));
+        // Re-pedir solo los quants que cambiaron o que son nuevos.
+        const toFetch = quantIds.filter((id) => changedQuantIds.has(id) || !loaded.has(id));
+
+        let fetched = [];
+        if (toFetch.length) {
+            try {
+                fetched = await this.orm.call(
+                    "stock.quant", "get_quant_details", [], { quant_ids: toFetch });
+            } catch (error) {
+                console.warn("[EN VIVO] No se pudieron refrescar las filas:", error);
+                return;
+            }
+        }
+        const byId = new Map(fetched.map((d) => [d.id, d]));
+        const rows = current
+            .filter((d) => keep.has(d.id))
+            .map((d) => byId.get(d.id) || d);
+        for (const detail of fetched) {
+            if (!loaded.has(detail.id)) {
+                rows.push(detail);
+            }
+        }
+        this.state.productDetails[productId] = rows;
+    }
+
     formatNumber(num) {
         if (num === null || num === undefined) {
             return "0";
@@ -240,6 +532,18 @@ class InventoryVisualController extends Component {
 
             this.openPhotoGalleryModal(photos, detailId);
         } catch (error) {
+            const thumbnails = this.state.offlineEnabled ? await loadThumbnails(detailId) : null;
+            if (thumbnails) {
+                this.markStale();
+                this.dialog.add(PhotoGalleryDialog, {
+                    photosData: thumbnails,
+                    detailId,
+                    readOnly: true,
+                    title: `Fotografías (copia sin conexión) - ${thumbnails.lot_name}`,
+                    size: "xl",
+                });
+                return;
+            }
             console.error("Error al cargar fotos:", error);
             this.notification.add("Error al cargar fotos", { type: "danger" });
         }
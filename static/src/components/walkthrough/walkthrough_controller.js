@@ -7,14 +7,21 @@
  * poder venderse material que ya no existe.
  *
  * Reutiliza tal cual: SearchBar, PhotoGalleryDialog, BlockReportDialog,
- * NotesDialog e HistoryDialog. Los detail.id son stock.quant reales (quants
- * en ubicación de cliente o desecho), así que fotos/notas/historial usan
- * los MISMOS métodos backend que el Inventario Visual.
+ * NotesDialog e HistoryDialog. Los detail.id son llaves de salida
+ * "<lot_id>-<location_id>" (no quants: la búsqueda es de solo lectura), así
+ * que fotos/notas/historial llaman a los MISMOS métodos backend que el
+ * Inventario Visual pero con lot_id.
+ *
+ * Rango de fechas (date_from / date_to) y vista por periodo: "Detalle" es la
+ * lista de siempre acotada al rango; "Por mes" / "Por semana" piden al
+ * backend el resumen ya agregado (get_walkthrough_period_rollup).
  */
 
 import { Component, useState, onWillStart } from "@odoo/owl";
 import { registry } from "@web/core/registry";
 import { useService } from "@web/core/utils/hooks";
+import { loadPermissionProfile } from "../../utils/permission_profile";
+import { exportResults } from "../../utils/export_results";
 import { SearchBar } from "../search_bar/search_bar";
 import { WalkthroughRow } from "./walkthrough_row";
 import { PhotoGalleryDialog } from "../dialogs/photo_gallery/photo_gallery_dialog";
@@ -39,8 +46,17 @@ export class WalkthroughController extends Component {
             totalProducts: 0,
             hasSalesPermissions: false,
             hasInventoryPermissions: false,
+            dateFrom: "",
+            dateTo: "",
+            viewMode: "detail",
+            rollup: null,
+            isExporting: false,
         });
 
+        // Últimos filtros de la barra: cambiar fechas o vista re-consulta
+        // sin tener que volver a buscar.
+        this.lastFilters = null;
+
         // Lote inicial: la Búsqueda Global del home puede abrir el
         // Walkthrough con un lote ya salido (params.lot_name).
         this.initialLotName =
@@ -56,10 +72,9 @@ export class WalkthroughController extends Component {
 
     async loadPermissions() {
         try {
-            const salesPerms = await this.orm.call("stock.quant", "check_sales_permissions", []);
-            const inventoryPerms = await this.orm.call("stock.quant", "check_inventory_permissions", []);
-            this.state.hasSalesPermissions = salesPerms;
-            this.state.hasInventoryPermissions = inventoryPerms;
+            const profile = await loadPermissionProfile(this.orm);
+            this.state.hasSalesPermissions = profile.is_sales_user;
+            this.state.hasInventoryPermissions = profile.is_inventory_user;
         } catch (error) {
             console.error("[WALKTHROUGH] Error verificando permisos:", error);
             this.state.hasSalesPermissions = false;
@@ -67,24 +82,81 @@ export class WalkthroughController extends Component {
         }
     }
 
+    /** Filtros de la barra + rango de fechas del Walkthrough. */
+    withDateRange(filters) {
+        return {
+            ...(filters || {}),
+            date_from: this.state.dateFrom || null,
+            date_to: this.state.dateTo || null,
+        };
+    }
+
+    onDateChange(field, ev) {
+        this.state[field] = ev.target.value || "";
+        if (this.lastFilters) {
+            this.onSearch(this.lastFilters);
+        }
+    }
+
+    setViewMode(mode) {
+        if (this.state.viewMode === mode) {
+            return;
+        }
+        this.state.viewMode = mode;
+        if (this.lastFilters) {
+            this.onSearch(this.lastFilters);
+        }
+    }
+
+    async onExport(fileFormat) {
+        if (!this.lastFilters || this.state.isExporting) {
+            return;
+        }
+        this.state.isExporting = true;
+        try {
+            // Siempre el detalle por placa (con el rango de fechas), aunque
+            // en pantalla esté el resumen por periodo.
+            await exportResults({
+                mode: "walkthrough",
+                fileFormat,
+                filters: this.withDateRange(this.lastFilters),
+            });
+        } catch (error) {
+            console.error("[WALKTHROUGH] Error al exportar:", error);
+            this.notification.add("Error al exportar el historial", { type: "danger" });
+        } finally {
+            this.state.isExporting = false;
+        }
+    }
+
     async onSearch(filters) {
-        if (!filters || !Object.values(filters).some((v) => v !== null && v !== "")) {
+        const hasFilters = filters && Object.values(filters).some((v) => v !== null && v !== "");
+        if (!hasFilters && !this.state.dateFrom && !this.state.dateTo) {
+            this.lastFilters = null;
             this.state.hasSearched = false;
             this.state.products = [];
+            this.state.rollup = null;
             this.state.expandedProducts.clear();
             this.state.productDetails = {};
             return;
         }
 
+        this.lastFilters = filters || {};
         this.state.isLoading = true;
         this.state.error = null;
 
         try {
+            if (this.state.viewMode !== "detail") {
+                await this.loadRollup();
+                return;
+            }
+            this.state.rollup = null;
+
             const result = await this.orm.call(
                 "stock.quant",
                 "get_walkthrough_grouped_by_product",
                 [],
-                { filters: filters }
+                { filters: this.withDateRange(filters) }
             );
 
             const products = (result && result.products) || [];
@@ -118,7 +190,43 @@ export class WalkthroughController extends Component {
         }
     }
 
-    async toggleProduct(productId, quantIds) {
+    async loadRollup() {
+        const rollup = await this.orm.call(
+            "stock.quant",
+            "get_walkthrough_period_rollup",
+            [],
+            {
+                filters: this.withDateRange(this.lastFilters),
+                period: this.state.viewMode === "week" ? "week" : "month",
+            }
+        );
+        this.state.rollup = rollup;
+        this.state.products = [];
+        this.state.expandedProducts.clear();
+        this.state.productDetails = {};
+        this.state.hasSearched = true;
+        this.state.totalProducts = rollup.products.length;
+
+        if (rollup.products.length === 0) {
+            this.notification.add(
+                "No se encontraron salidas en el rango seleccionado",
+                { type: "info" }
+            );
+        }
+        if (rollup.missing_lots && rollup.missing_lots.length > 0) {
+            this.notification.add(
+                `Lotes no encontrados: ${JSON.stringify(rollup.missing_lots)}`,
+                { type: "warning", sticky: false }
+            );
+        }
+    }
+
+    /** Celda del resumen (producto × periodo) o null si no hubo salidas. */
+    rollupCell(product, periodKey) {
+        return product.periods[periodKey] || null;
+    }
+
+    async toggleProduct(productId, exitKeys) {
         const isExpanded = this.state.expandedProducts.has(productId);
 
         if (isExpanded) {
@@ -126,20 +234,20 @@ export class WalkthroughController extends Component {
         } else {
             this.state.expandedProducts.add(productId);
             if (!this.state.productDetails[productId]) {
-                await this.loadProductDetails(productId, quantIds);
+                await this.loadProductDetails(productId, exitKeys);
             }
         }
 
         this.state.expandedProducts = new Set(this.state.expandedProducts);
     }
 
-    async loadProductDetails(productId, quantIds) {
+    async loadProductDetails(productId, exitKeys) {
         try {
             const details = await this.orm.call(
                 "stock.quant",
                 "get_walkthrough_details",
                 [],
-                { quant_ids: quantIds }
+                { exit_keys: exitKeys, filters: this.withDateRange(this.lastFilters) }
             );
             this.state.productDetails[productId] = details;
         } catch (error) {
@@ -184,20 +292,25 @@ export class WalkthroughController extends Component {
                     (p) => p.product_id === parseInt(productId)
                 );
                 if (product) {
-                    await this.loadProductDetails(parseInt(productId), product.quant_ids);
+                    await this.loadProductDetails(parseInt(productId), product.exit_keys);
                 }
                 break;
             }
         }
     }
 
+    /** Lote de una llave de salida "<lot_id>-<location_id>". */
+    exitLotId(detailId) {
+        return parseInt(String(detailId).split("-")[0]);
+    }
+
     async onPhotoClick(detailId) {
         try {
             const photos = await this.orm.call(
                 "stock.quant",
                 "get_lot_photos",
                 [],
-                { quant_id: detailId }
+                { lot_id: this.exitLotId(detailId) }
             );
 
             if (photos.error) {
@@ -266,7 +379,7 @@ export class WalkthroughController extends Component {
                 "stock.quant",
                 "get_lot_notes",
                 [],
-                { quant_id: detailId }
+                { lot_id: this.exitLotId(detailId) }
             );
 
             if (notes.error) {
@@ -278,6 +391,7 @@ export class WalkthroughController extends Component {
             this.dialog.add(NotesDialog, {
                 notesData: notes,
                 detailId,
+                lotId: this.exitLotId(detailId),
                 onReload: async () => await self.reloadProductDetailsForDetail(detailId),
                 title: `Notas y Detalles - ${notes.lot_name}`,
                 size: "lg",
@@ -302,7 +416,7 @@ export class WalkthroughController extends Component {
                 "stock.quant",
                 "get_lot_history",
                 [],
-                { quant_id: detailId }
+                { lot_id: this.exitLotId(detailId) }
             );
 
             if (history.error) {
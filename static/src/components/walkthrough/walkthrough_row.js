@@ -36,7 +36,7 @@ export class WalkthroughRow extends ProductRow {
 
     handleFilterClick(filterType) {
         if (!this.props.isExpanded) {
-            this.props.onToggle(this.props.product.quant_ids);
+            this.props.onToggle(this.props.product.exit_keys);
         }
 
         if (this.state.activeFilter === filterType && filterType !== "all") {
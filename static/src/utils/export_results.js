@@ -0,0 +1,21 @@
+/** @odoo-module **/
+/**
+ * Descarga de lo que muestra la vista (Inventario Visual o Walkthrough) en
+ * CSV / XLSX. El archivo lo arma el servidor por tandas
+ * (/inventory_visual_enhanced/export, controllers/main.py): el navegador
+ * solo recibe el archivo, nunca las filas en JSON.
+ */
+
+import { download } from "@web/core/network/download";
+
+export async function exportResults({ mode, fileFormat, filters }) {
+    await download({
+        url: "/inventory_visual_enhanced/export",
+        data: {
+            mode,
+            file_format: fileFormat,
+            filters: JSON.stringify(filters || {}),
+            csrf_token: odoo.csrf_token,
+        },
+    });
+}
@@ -0,0 +1,168 @@
+/** @odoo-module **/
+/**
+ * Copia local (IndexedDB) de las últimas búsquedas del Inventario Visual,
+ * para las tabletas del patio con mala señal. OPCIONAL: se activa por
+ * usuario y por dispositivo desde la vista (localStorage).
+ *
+ * Por búsqueda se guarda: la lista de productos, el detalle de los
+ * productos que se expandieron y la VERSIÓN del inventario del servidor
+ * con la que se armó (stock.quant.get_inventory_version). Aparte, las
+ * miniaturas de fotos por quant.
+ *
+ * La vista abre al instante con lo guardado y revalida en segundo plano:
+ * si la versión no cambió no se vuelve a pedir nada; si no hay conexión,
+ * lo guardado se marca como desactualizado.
+ *
+ * Todo aquí es "mejor esfuerzo": si IndexedDB no está disponible (modo
+ * privado, cuota llena) las funciones regresan null / no hacen nada y la
+ * vista sigue como siempre, en línea.
+ */
+
+import { user } from "@web/core/user";
+
+const DB_VERSION = 1;
+const SEARCHES = "searches";
+const THUMBS = "thumbs";
+// Búsquedas que se conservan por usuario y dispositivo.
+const MAX_SEARCHES = 10;
+
+let dbPromise = null;
+
+function enabledKey() {
+    return `inventory_visual_enhanced.offline.${user.userId}`;
+}
+
+export function isOfflineCacheEnabled() {
+    try {
+        return window.localStorage.getItem(enabledKey()) === "1";
+    } catch {
+        return false;
+    }
+}
+
+export async function setOfflineCacheEnabled(enabled) {
+    try {
+        if (enabled) {
+            window.localStorage.setItem(enabledKey(), "1");
+        } else {
+            window.localStorage.removeItem(enabledKey());
+            await clearOfflineCache();
+        }
+    } catch (err) {
+        console.warn("[SIN CONEXIÓN] No se pudo cambiar la preferencia:", err);
+    }
+}
+
+function request(req) {
+    return new Promise((resolve, reject) => {
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+    });
+}
+
+function openDb() {
+    if (dbPromise) return dbPromise;
+    if (typeof indexedDB === "undefined") {
+        return Promise.resolve(null);
+    }
+    const req = indexedDB.open(`inventory_visual_enhanced_${user.userId}`, DB_VERSION);
+    req.onupgradeneeded = () => {
+        const db = req.result;
+        if (!db.objectStoreNames.contains(SEARCHES)) {
+            db.createObjectStore(SEARCHES, { keyPath: "key" });
+        }
+        if (!db.objectStoreNames.contains(THUMBS)) {
+            db.createObjectStore(THUMBS, { keyPath: "quantId" });
+        }
+    };
+    dbPromise = request(req).catch((err) => {
+        console.warn("[SIN CONEXIÓN] IndexedDB no disponible:", err);
+        return null;
+    });
+    return dbPromise;
+}
+
+async function withStore(name, mode, fn) {
+    const db = await openDb();
+    if (!db) return null;
+    try {
+        const tx = db.transaction(name, mode);
+        // Se escucha ANTES de operar: la transacción se cierra sola en
+        // cuanto no le quedan peticiones.
+        const done = new Promise((resolve, reject) => {
+            tx.oncomplete = resolve;
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error);
+        });
+        const result = await fn(tx.objectStore(name));
+        await done;
+        return result;
+    } catch (err) {
+        console.warn("[SIN CONEXIÓN] Error en la copia local:", err);
+        return null;
+    }
+}
+
+/** Llave estable de una búsqueda: mismos filtros, misma llave. */
+export function searchKey(filters) {
+    const clean = {};
+    for (const k of Object.keys(filters || {}).sort()) {
+        const v = filters[k];
+        if (v !== null && v !== undefined && v !== "") {
+            clean[k] = v;
+        }
+    }
+    return JSON.stringify(clean);
+}
+
+export function loadSearch(filters) {
+    return withStore(SEARCHES, "readonly", (store) => request(store.get(searchKey(filters))));
+}
+
+export async function saveSearch(filters, { version, products }) {
+    const key = searchKey(filters);
+    await withStore(SEARCHES, "readwrite", async (store) => {
+        const previous = await request(store.get(key));
+        // Con la misma versión el detalle ya guardado sigue valiendo.
+        const details = previous && previous.version === version ? previous.details : {};
+        store.put({ key, filters, version, products, details, savedAt: Date.now() });
+    });
+    await pruneSearches();
+}
+
+export function saveDetails(filters, productId, details) {
+    return withStore(SEARCHES, "readwrite", async (store) => {
+        const entry = await request(store.get(searchKey(filters)));
+        if (!entry) return;
+        entry.details = { ...(entry.details || {}), [productId]: details };
+        store.put(entry);
+    });
+}
+
+async function pruneSearches() {
+    await withStore(SEARCHES, "readwrite", async (store) => {
+        const all = await request(store.getAll());
+        all.sort((a, b) => b.savedAt - a.savedAt);
+        for (const old of all.slice(MAX_SEARCHES)) {
+            store.delete(old.key);
+        }
+    });
+}
+
+export function saveThumbnails(byQuant) {
+    return withStore(THUMBS, "readwrite", (store) => {
+        for (const [quantId, data] of Object.entries(byQuant || {})) {
+            store.put({ quantId: Number(quantId), data, savedAt: Date.now() });
+        }
+    });
+}
+
+export async function loadThumbnails(quantId) {
+    const entry = await withStore(THUMBS, "readonly", (store) => request(store.get(quantId)));
+    return entry ? entry.data : null;
+}
+
+export async function clearOfflineCache() {
+    await withStore(SEARCHES, "readwrite", (store) => store.clear());
+    await withStore(THUMBS, "readwrite", (store) => store.clear());
+}
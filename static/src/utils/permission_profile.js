@@ -0,0 +1,41 @@
+/** @odoo-module **/
+/**
+ * Perfil de permisos del Inventario Visual ({is_sales_user,
+ * is_inventory_user, is_purchase_user}) compartido por todas las vistas.
+ *
+ * Viene en session_info (models/ir_http.py): abrir el Inventario Visual o
+ * el Walkthrough ya no cuesta dos RPC. Si la sesión no lo trae (sesión
+ * vieja, usuario portal) se pide UNA vez a get_permission_profile. Vive en
+ * memoria mientras dure la carga del cliente web, que es lo mismo que dura
+ * session_info: un cambio de grupos se ve al recargar.
+ */
+
+import { session } from "@web/session";
+import { user } from "@web/core/user";
+
+const EMPTY_PROFILE = {
+    is_sales_user: false,
+    is_inventory_user: false,
+    is_purchase_user: false,
+};
+
+let cached = null;
+
+export function loadPermissionProfile(orm) {
+    const uid = user.userId;
+    if (cached && cached.uid === uid) {
+        return cached.promise;
+    }
+    const promise = session.iv_permission_profile
+        ? Promise.resolve({ ...EMPTY_PROFILE, ...session.iv_permission_profile })
+        : orm.call("stock.quant", "get_permission_profile", []).then(
+              (profile) => ({ ...EMPTY_PROFILE, ...profile }));
+    cached = { uid, promise };
+    // Un fallo de red no debe quedar cacheado: el siguiente intento reintenta.
+    promise.catch(() => {
+        if (cached && cached.promise === promise) {
+            cached = null;
+        }
+    });
+    return promise;
+}
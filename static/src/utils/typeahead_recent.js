@@ -0,0 +1,72 @@
+/** @odoo-module **/
+/**
+ * Últimas selecciones del typeahead del apartado (clientes, proyectos,
+ * embajadores), por usuario y por dispositivo (localStorage).
+ *
+ * El diálogo las muestra AL INSTANTE, filtradas por lo que se va
+ * escribiendo, mientras responde stock.quant.typeahead; la respuesta del
+ * servidor (que ya pone primero lo que el vendedor usa) reemplaza la lista.
+ *
+ * Los proyectos son POR CLIENTE: se guardan con el cliente como "scope" y
+ * solo se ofrecen con ese mismo cliente seleccionado.
+ *
+ * "Mejor esfuerzo": sin localStorage (modo privado, cuota llena) regresa
+ * listas vacías y el diálogo funciona como siempre.
+ */
+
+import { user } from "@web/core/user";
+
+// Selecciones que se muestran; se guardan hasta MAX_STORED por tipo (los
+// proyectos se reparten entre varios clientes).
+const MAX_RECENT = 8;
+const MAX_STORED = 32;
+
+function storageKey(kind) {
+    return `inventory_visual_enhanced.typeahead.${kind}.${user.userId}`;
+}
+
+function load(kind) {
+    try {
+        const entries = JSON.parse(window.localStorage.getItem(storageKey(kind)) || "[]");
+        return Array.isArray(entries) ? entries : [];
+    } catch {
+        return [];
+    }
+}
+
+function matches(record, term) {
+    if (!term) return true;
+    return ["name", "display_name", "vat", "ref", "email"].some(
+        (key) => record[key] && String(record[key]).toLowerCase().includes(term)
+    );
+}
+
+/**
+ * Selecciones recientes de `kind` que coinciden con `term` (más reciente
+ * primero), sin la llave interna de scope.
+ */
+export function getRecentPicks(kind, term = "", scope = null) {
+    const text = (term || "").trim().toLowerCase();
+    return load(kind)
+        .filter((entry) => (entry.scope || null) === (scope || null))
+        .map((entry) => entry.record)
+        .filter((record) => record && matches(record, text))
+        .slice(0, MAX_RECENT);
+}
+
+/** Registra `record` como la selección más reciente de `kind`. */
+export function rememberPick(kind, record, scope = null) {
+    if (!record || !record.id) return;
+    try {
+        const entries = load(kind).filter(
+            (entry) => !(entry.record && entry.record.id === record.id
+                && (entry.scope || null) === (scope || null))
+        );
+        entries.unshift({ scope: scope || null, record });
+        window.localStorage.setItem(
+            storageKey(kind), JSON.stringify(entries.slice(0, MAX_STORED))
+        );
+    } catch (err) {
+        console.warn("[TYPEAHEAD] No se pudo guardar la selección:", err);
+    }
+}
@@ -0,0 +1,151 @@
+/**
+ * Worker de fotografías del Inventario Visual.
+ *
+ * Script CLÁSICO de Web Worker (NO es @odoo-module y NO va en el bundle de
+ * assets): se sirve tal cual desde /static y lo levanta
+ * utils/photo_pipeline.js. Todo lo pesado de la galería corre aquí para no
+ * congelar la UI del teléfono con una foto de 12 MP:
+ *
+ * - compress: redimensiona, aplana las anotaciones del editor y re-codifica
+ *   (WebP o JPEG) con el mismo ciclo de calidad que tenía el diálogo.
+ * - decode: base64 → bytes (descarga, compartir y copiar).
+ *
+ * Los bytes regresan como ArrayBuffer TRANSFERIBLE: no se copian entre hilos.
+ */
+
+const DEFAULT_CONFIG = {
+    maxWidth: 1280,
+    maxHeight: 1280,
+    quality: 0.6,
+    maxSizeKB: 200,
+    minQuality: 0.3,
+};
+
+function drawAnnotations(ctx, paths, sourceSize, width, height) {
+    if (!paths || !paths.length || !sourceSize || !sourceSize.width || !sourceSize.height) {
+        return;
+    }
+    const scaleX = width / sourceSize.width;
+    const scaleY = height / sourceSize.height;
+
+    for (const path of paths) {
+        if (!path || path.length === 0) continue;
+
+        ctx.beginPath();
+        ctx.strokeStyle = path[0].color;
+        ctx.lineWidth = path[0].size * Math.min(scaleX, scaleY);
+        ctx.lineCap = "round";
+        ctx.lineJoin = "round";
+        ctx.moveTo(path[0].x * scaleX, path[0].y * scaleY);
+
+        for (let i = 1; i < path.length; i++) {
+            ctx.lineTo(path[i].x * scaleX, path[i].y * scaleY);
+        }
+        ctx.stroke();
+        ctx.closePath();
+    }
+}
+
+async function encode(canvas, mimeType, quality) {
+    return canvas.convertToBlob({ type: mimeType, quality });
+}
+
+async function compress(payload) {
+    const config = Object.assign({}, DEFAULT_CONFIG, payload.config || {});
+    const { maxWidth, maxHeight, quality, maxSizeKB, minQuality } = config;
+
+    const bitmap = await createImageBitmap(payload.file);
+    try {
+        let width = bitmap.width;
+        let height = bitmap.height;
+
+        if (width > maxWidth || height > maxHeight) {
+            const ratio = Math.min(maxWidth / width, maxHeight / height);
+            width = Math.round(width * ratio);
+            height = Math.round(height * ratio);
+        }
+
+        const canvas = new OffscreenCanvas(width, height);
+        const ctx = canvas.getContext("2d");
+
+        const paint = (w, h, withAnnotations) => {
+            ctx.fillStyle = "#FFFFFF";
+            ctx.fillRect(0, 0, w, h);
+            ctx.imageSmoothingEnabled = true;
+            ctx.imageSmoothingQuality = "high";
+            ctx.drawImage(bitmap, 0, 0, w, h);
+            if (withAnnotations) {
+                drawAnnotations(ctx, payload.paths, payload.sourceSize, w, h);
+            }
+        };
+        paint(width, height, true);
+
+        // WebP si el navegador lo codifica; si no, convertToBlob regresa PNG
+        // y se cae a JPEG (mismo criterio que el toDataURL anterior).
+        let mimeType = "image/webp";
+        let currentQuality = quality;
+        let blob = await encode(canvas, mimeType, currentQuality);
+        if (blob.type !== "image/webp") {
+            mimeType = "image/jpeg";
+            blob = await encode(canvas, mimeType, currentQuality);
+        }
+        const extension = mimeType === "image/webp" ? "webp" : "jpg";
+
+        while (blob.size / 1024 > maxSizeKB && currentQuality > minQuality) {
+            currentQuality -= 0.1;
+            blob = await encode(canvas, mimeType, currentQuality);
+        }
+
+        if (blob.size / 1024 > maxSizeKB * 1.5) {
+            const scale = 0.7;
+            canvas.width = Math.round(width * scale);
+            canvas.height = Math.round(height * scale);
+            paint(canvas.width, canvas.height, true);
+            blob = await encode(canvas, mimeType, minQuality);
+        }
+
+        const buffer = await blob.arrayBuffer();
+        return {
+            result: {
+                buffer,
+                mimeType,
+                extension,
+                finalSizeKB: buffer.byteLength / 1024,
+                finalQuality: currentQuality,
+                dimensions: { width: canvas.width, height: canvas.height },
+            },
+            transfer: [buffer],
+        };
+    } finally {
+        bitmap.close();
+    }
+}
+
+function decode(payload) {
+    const binary = atob(payload.base64 || "");
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return {
+        result: { buffer: bytes.buffer, mimeType: payload.mimeType || "image/png" },
+        transfer: [bytes.buffer],
+    };
+}
+
+const HANDLERS = { compress, decode };
+
+self.onmessage = async (ev) => {
+    const { id, type, payload } = ev.data || {};
+    const handler = HANDLERS[type];
+    if (!handler) {
+        self.postMessage({ id, error: `Operación desconocida: ${type}` });
+        return;
+    }
+    try {
+        const { result, transfer } = await handler(payload || {});
+        self.postMessage({ id, result }, transfer);
+    } catch (err) {
+        self.postMessage({ id, error: (err && err.message) || String(err) });
+    }
+};
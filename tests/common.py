@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""Datos SINTÉTICOS para medir el Inventario Visual.
+
+IvSyntheticDataCase._iv_build_dataset arma, dentro de la transacción de la
+prueba, un inventario configurable:
+
+- products:            productos con lote (N)
+- blocks_per_product:  bloques por producto
+- lots_per_block:      placas (lotes) por bloque (M); cada placa con su quant
+- formato_ratio:       fracción de lotes tipo formato (parcialidades)
+- transit_ratio:       fracción de lotes en una ubicación de tránsito
+- pending_moves:       líneas de movimiento reservadas (entregas
+                       confirmadas sin validar) (K)
+- sale_lines:          líneas de venta confirmadas con lotes y desglose
+- holds:               apartados activos (si existe stock.lot.hold)
+- delivered:           lotes entregados a cliente (salidas del Walkthrough)
+- packing_rows:        renglones de packing list (si existe el modelo)
+
+Los modelos y campos de módulos que NO son dependencia (apartados,
+tránsito, packing list, campos de stock_lot_dimensions) se llenan solo si
+existen en la base de prueba; lo que falte se omite y queda en los
+conteos del dataset.
+"""
+import json
+
+from odoo import Command, fields
+from odoo.tests.common import TransactionCase
+
+IV_DATASET_PRESETS = {
+    'small': {
+        'products': 3, 'blocks_per_product': 2, 'lots_per_block': 5,
+        'pending_moves': 5, 'sale_lines': 5, 'holds': 5,
+        'delivered': 5, 'packing_rows': 10,
+    },
+    'medium': {
+        'products': 10, 'blocks_per_product': 4, 'lots_per_block': 15,
+        'pending_moves': 50, 'sale_lines': 50, 'holds': 40,
+        'delivered': 60, 'packing_rows': 200,
+    },
+    'large': {
+        'products': 25, 'blocks_per_product': 8, 'lots_per_block': 25,
+        'pending_moves': 300, 'sale_lines': 300, 'holds': 250,
+        'delivered': 400, 'packing_rows': 2000,
+    },
+}
+_DEFAULTS = {
+    'products': 3, 'blocks_per_product': 2, 'lots_per_block': 5,
+    'formato_ratio': 0.2, 'transit_ratio': 0.1,
+    'pending_moves': 0, 'sale_lines': 0, 'holds': 0,
+    'delivered': 0, 'packing_rows': 0,
+}
+
+
+class IvSyntheticDataCase(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Como un usuario real (admin con ventas/inventario), no como
+        # superusuario: los permisos de la vista se revisan por grupo.
+        cls.env = cls.env(user=cls.env.ref('base.user_admin'))
+        cls.Quant = cls.env['stock.quant']
+        cls.warehouse = cls.env['stock.warehouse'].search(
+            [('company_id', '=', cls.env.company.id)], limit=1)
+        cls.stock_location = cls.warehouse.lot_stock_id
+        cls.customer_location = cls.env.ref('stock.stock_location_customers')
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _iv_vals(cls, model_name, vals):
+        """Solo los campos que existen; selecciones con un valor válido."""
+        Model = cls.env[model_name]
+        result = {}
+        for name, value in vals.items():
+            field = Model._fields.get(name)
+            if not field:
+                continue
+            if field.type == 'selection' and isinstance(field.selection, (list, tuple)):
+                keys = [key for key, _label in field.selection]
+                if value not in keys:
+                    continue
+            result[name] = value
+        return result
+
+    @classmethod
+    def _iv_create_optional(cls, model_name, vals_list):
+        """Crea en un modelo opcional; si falta el modelo o un campo
+        obligatorio, no crea nada (y no rompe la transacción)."""
+        if model_name not in cls.env or not vals_list:
+            return cls.env[model_name] if model_name in cls.env else None
+        try:
+            with cls.env.cr.savepoint():
+                return cls.env[model_name].sudo().create(
+                    [cls._iv_vals(model_name, vals) for vals in vals_list])
+        except Exception:
+            return cls.env[model_name]
+
+    # ------------------------------------------------------------------
+    # Dataset
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _iv_build_dataset(cls, prefix='IVB', **sizes):
+        opts = dict(_DEFAULTS, **sizes)
+        env = cls.env
+        data = {'prefix': prefix, 'counts': {}}
+
+        categ = env['product.category'].create({'name': '%s Mármol' % prefix})
+        product_vals = []
+        for p in range(opts['products']):
+            product_vals.append(cls._iv_vals('product.product', {
+                'name': '%s Producto %03d' % (prefix, p),
+                'default_code': '%s-%03d' % (prefix, p),
+                'type': 'consu',
+                'is_storable': True,
+                'detailed_type': 'product',
+                'tracking': 'lot',
+                'categ_id': categ.id,
+                'x_unidad_del_producto': 'Placa',
+                'list_price': 100.0,
+            }))
+        products = env['product.product'].create(product_vals)
+
+        transit_location = env['stock.location'].create({
+            'name': '%s Tránsito' % prefix,
+            'usage': 'transit',
+            'location_id': cls.warehouse.view_location_id.id,
+        })
+
+        lot_vals = []
+        blocks = []
+        for product in products:
+            for b in range(opts['blocks_per_product']):
+                block = '%s-BL%02d-%04d' % (prefix, b, product.id)
+                blocks.append(block)
+                for n in range(opts['lots_per_block']):
+                    lot_vals.append(cls._iv_vals('stock.lot', {
+                        'name': '%s-%03d' % (block, n),
+                        'product_id': product.id,
+                        'company_id': env.company.id,
+                        'x_bloque': block,
+                        'x_numero_placa': str(n + 1),
+                        'x_atado': 'A%02d' % (n // 10),
+                        'x_grosor': 2.0,
+                        'x_alto': 180.0 + n,
+                        'x_ancho': 120.0,
+                        'x_tipo': 'placa',
+                        'x_color': 'Blanco',
+                        'x_contenedor': '%s-CONT%02d' % (prefix, b),
+                        'x_pedimento': '%s-PED%02d' % (prefix, b),
+                    }))
+        lots = env['stock.lot'].create(lot_vals)
+
+        # Formatos (parcialidades) y tránsito por proporción fija.
+        step_formato = int(1 / opts['formato_ratio']) if opts['formato_ratio'] else 0
+        step_transit = int(1 / opts['transit_ratio']) if opts['transit_ratio'] else 0
+        if step_formato and 'x_tipo' in lots._fields:
+            formato_lots = lots.filtered(lambda lot: lot.id % step_formato == 0)
+            vals = cls._iv_vals('stock.lot', {'x_tipo': 'formato'})
+            if vals:
+                formato_lots.write(vals)
+        transit_lots = (
+            lots.filtered(lambda lot: lot.id % step_transit == 1)
+            if step_transit else env['stock.lot'])
+
+        for lot in lots:
+            location = transit_location if lot in transit_lots else cls.stock_location
+            cls.Quant._update_available_quantity(
+                lot.product_id, location, 5.0, lot_id=lot)
+
+        stock_lots = lots - transit_lots
+        data.update({
+            'category': categ,
+            'products': products,
+            'lots': lots,
+            'blocks': blocks,
+            'transit_location': transit_location,
+            'transit_lots': transit_lots,
+        })
+
+        partner = env['res.partner'].create({
+            'name': '%s Cliente' % prefix, 'customer_rank': 1})
+        data['partner'] = partner
+
+        # Entregas a cliente validadas → salidas del Walkthrough.
+        delivered = stock_lots[:opts['delivered']]
+        if delivered:
+            cls._iv_picking(delivered, partner, qty=5.0, validate=True)
+        data['delivered_lots'] = delivered
+
+        # Entregas confirmadas y reservadas → líneas pendientes.
+        available = stock_lots - delivered
+        pending = available[:opts['pending_moves']]
+        if pending:
+            cls._iv_picking(pending, partner, qty=2.0, validate=False)
+        data['pending_lots'] = pending
+
+        # Ventas confirmadas con lote(s) y desglose.
+        orders = env['sale.order']
+        sale_lots = available[len(pending):len(pending) + opts['sale_lines']]
+        if sale_lots:
+            line_vals = []
+            for lot in sale_lots:
+                vals = {
+                    'product_id': lot.product_id.id,
+                    'product_uom_qty': 2.0,
+                    'price_unit': 100.0,
+                    'lot_ids': [Command.set(lot.ids)],
+                    'x_lot_breakdown_json': json.dumps({str(lot.id): 2.0}),
+                }
+                line_vals.append(Command.create(cls._iv_vals('sale.order.line', vals)))
+            orders = env['sale.order'].create({
+                'partner_id': partner.id,
+                'order_line': line_vals,
+            })
+            orders.action_confirm()
+        data['sale_orders'] = orders
+
+        # Apartados activos.
+        hold_lots = available[len(pending) + len(sale_lots):][:opts['holds']]
+        now = fields.Datetime.now()
+        holds = cls._iv_create_optional('stock.lot.hold', [{
+            'lot_id': lot.id,
+            'partner_id': partner.id,
+            'user_id': env.uid,
+            'fecha_inicio': now,
+            'fecha_expiracion': fields.Datetime.add(now, days=7),
+            'notas': 'benchmark',
+        } for lot in hold_lots])
+        data['holds'] = holds
+
+        # Tránsito: líneas del módulo de tránsito, si está.
+        transit_lines = cls._iv_create_optional('stock.transit.line', [{
+            'lot_id': lot.id,
+            'product_id': lot.product_id.id,
+        } for lot in transit_lots])
+        data['transit_lines'] = transit_lines
+
+        # Packing list: renglones por placa, si está el módulo.
+        packing_vals = []
+        for lot in lots[:opts['packing_rows']]:
+            packing_vals.append({
+                'product_id': lot.product_id.id,
+                'bloque': lot.x_bloque if 'x_bloque' in lot._fields else '',
+                'numero_placa': lot.x_numero_placa if 'x_numero_placa' in lot._fields else '',
+                'lot_name': lot.name,
+            })
+        packing_rows = cls._iv_create_optional(
+            'supplier.shipment.packing.row', packing_vals)
+        data['packing_rows'] = packing_rows
+
+        env.flush_all()
+        data['counts'] = {
+            'products': len(products),
+            'lots': len(lots),
+            'quants': cls.Quant.search_count([('lot_id', 'in', lots.ids)]),
+            'transit_lots': len(transit_lots),
+            'pending_move_lines': env['stock.move.line'].search_count([
+                ('lot_id', 'in', pending.ids), ('state', '!=', 'done')]),
+            'sale_lines': len(orders.order_line),
+            'holds': len(holds) if holds is not None else 0,
+            'delivered_lots': len(delivered),
+            'transit_lines': len(transit_lines) if transit_lines is not None else 0,
+            'packing_rows': len(packing_rows) if packing_rows is not None else 0,
+        }
+        return data
+
+    @classmethod
+    def _iv_picking(cls, lots, partner, qty, validate):
+        """Una entrega con un movimiento por lote, reservada por lote; si
+        validate, se valida."""
+        picking_type = cls.warehouse.out_type_id
+        picking = cls.env['stock.picking'].create({
+            'picking_type_id': picking_type.id,
+            'partner_id': partner.id,
+            'location_id': cls.stock_location.id,
+            'location_dest_id': cls.customer_location.id,
+            'move_ids': [Command.create(cls._iv_vals('stock.move', {
+                'product_id': lot.product_id.id,
+                'product_uom_qty': qty,
+                'product_uom': lot.product_id.uom_id.id,
+                'location_id': cls.stock_location.id,
+                'location_dest_id': cls.customer_location.id,
+                'name': lot.name,
+            })) for lot in lots],
+        })
+        picking.action_confirm()
+        # La reserva automática elige lotes por FIFO: se rehace con el
+        # lote exacto de cada movimiento.
+        for move, lot in zip(picking.move_ids, lots):
+            move.move_line_ids.unlink()
+            move.move_line_ids = [Command.create({
+                'product_id': lot.product_id.id,
+                'lot_id': lot.id,
+                'quantity': qty,
+                'location_id': cls.stock_location.id,
+                'location_dest_id': cls.customer_location.id,
+            })]
+        picking.move_ids._recompute_state()
+        if validate:
+            picking.move_ids.picked = True
+            picking._action_done()
+        return picking
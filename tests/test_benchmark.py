@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Benchmark de las RPC del Inventario Visual sobre datos sintéticos.
+
+NO corre con las pruebas normales (etiqueta -standard). Se lanza así:
+
+    odoo-bin -d <base_de_prueba> -i inventory_visual_enhanced \\
+        --test-tags /inventory_visual_enhanced:iv_benchmark --stop-after-init
+
+Variables de entorno:
+
+- IV_BENCH_SIZES:   tamaños a correr, de tests/common.IV_DATASET_PRESETS
+                    (default "small,medium").
+- IV_BENCH_REPEAT:  corridas por caso (default 3). La primera es en FRÍO
+                    (cachés del registro y del ORM vacías); el resto en
+                    caliente.
+- IV_BENCH_REPORT:  ruta del reporte JSON (default
+                    <tmp>/iv_benchmark_<base>.json).
+
+El reporte trae, por tamaño de dataset, endpoint y forma de filtros:
+tiempo en frío, mediana en caliente, consultas SQL en frío y en caliente
+y filas regresadas; además los conteos reales del dataset. Compararlo
+contra el del último deploy es la forma de cachar regresiones en los
+recorridos de quants.
+"""
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from odoo import release
+from odoo.tests import tagged
+
+from .common import IV_DATASET_PRESETS, IvSyntheticDataCase
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'iv_benchmark')
+class TestInventoryVisualBenchmark(IvSyntheticDataCase):
+
+    def _bench(self, endpoint, shape, call, repeat):
+        """Corre `call` `repeat` veces y regresa la fila del reporte."""
+        times = []
+        queries = []
+        result = None
+        for run in range(repeat):
+            if run == 0:
+                self.env.registry.clear_cache()
+            self.env.invalidate_all()
+            count_before = self.env.cr.sql_log_count
+            start = time.perf_counter()
+            result = call()
+            times.append(time.perf_counter() - start)
+            queries.append(self.env.cr.sql_log_count - count_before)
+        warm = times[1:] or times
+        warm_queries = queries[1:] or queries
+        return {
+            'endpoint': endpoint,
+            'shape': shape,
+            'runs': repeat,
+            'cold_time': round(times[0], 4),
+            'warm_median_time': round(statistics.median(warm), 4),
+            'cold_sql_count': queries[0],
+            'warm_sql_count': int(statistics.median(warm_queries)),
+            'rows_returned': self._rows(result),
+        }
+
+    @staticmethod
+    def _rows(result):
+        if isinstance(result, list):
+            return len(result)
+        if isinstance(result, dict):
+            for key in ('products', 'orders', 'details'):
+                if isinstance(result.get(key), list):
+                    return len(result[key])
+        return 0
+
+    def _cases(self, data):
+        """(endpoint, forma, llamada) sobre el dataset."""
+        Quant = self.Quant
+        prefix = data['prefix']
+        products = data['products']
+        lots = data['lots']
+        block = data['blocks'][0]
+        first_product = products[0]
+        product_quants = Quant.search([
+            ('product_id', '=', first_product.id), ('quantity', '>', 0)])
+        some_lots = ','.join(lots[:20].mapped('name'))
+        cases = [
+            ('get_inventory_grouped_by_product', 'product_name:prefix',
+             lambda: Quant.get_inventory_grouped_by_product({'product_name': prefix})),
+            ('get_inventory_grouped_by_product', 'product_name:uno',
+             lambda: Quant.get_inventory_grouped_by_product(
+                 {'product_name': first_product.default_code})),
+            ('get_inventory_grouped_by_product', 'bloque',
+             lambda: Quant.get_inventory_grouped_by_product({'bloque': block})),
+            ('get_inventory_grouped_by_product', 'categoria_name',
+             lambda: Quant.get_inventory_grouped_by_product(
+                 {'categoria_name': data['category'].name})),
+            ('get_inventory_grouped_by_product', 'numero_serie:20',
+             lambda: Quant.get_inventory_grouped_by_product({'numero_serie': some_lots})),
+            ('get_inventory_grouped_by_product', 'stock_mode:transit',
+             lambda: Quant.get_inventory_grouped_by_product(
+                 {'stock_mode': 'transit', 'product_name': prefix})),
+            ('get_quant_details', 'ids:producto',
+             lambda: Quant.get_quant_details(product_quants.ids)),
+            ('get_walkthrough_grouped_by_product', 'product_name:prefix',
+             lambda: Quant.get_walkthrough_grouped_by_product({'product_name': prefix})),
+            ('get_lot_history', 'lot_id',
+             lambda: Quant.get_lot_history(lot_id=lots[0].id)),
+            ('get_block_purchase_report', 'bloque',
+             lambda: Quant.get_block_purchase_report(block)),
+        ]
+        if data['delivered_lots']:
+            walk = Quant.get_walkthrough_grouped_by_product({'product_name': prefix})
+            exit_keys = [key for product in walk.get('products') or []
+                         for key in product.get('exit_keys') or []]
+            cases.append((
+                'get_walkthrough_details', 'exit_keys:producto',
+                lambda: Quant.get_walkthrough_details(exit_keys[:200]),
+            ))
+        if data['sale_orders']:
+            cases.append((
+                'get_sale_order_info', 'ids:pedidos',
+                lambda: Quant.get_sale_order_info(data['sale_orders'].ids),
+            ))
+        return cases
+
+    def test_benchmark_visual_inventory_rpcs(self):
+        sizes = [
+            size.strip() for size in
+            os.environ.get('IV_BENCH_SIZES', 'small,medium').split(',')
+            if size.strip() in IV_DATASET_PRESETS
+        ]
+        repeat = max(int(os.environ.get('IV_BENCH_REPEAT', '3')), 1)
+        report = {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'odoo_version': release.version,
+            'database': self.env.cr.dbname,
+            'repeat': repeat,
+            'datasets': [],
+        }
+
+        for size in sizes:
+            # Cada tamaño en su propio savepoint: se arma, se mide y se
+            # deshace, para que el siguiente no herede datos.
+            savepoint = self.env.cr.savepoint()
+            try:
+                data = self._iv_build_dataset(
+                    prefix='IVB%s' % size[:1].upper(), **IV_DATASET_PRESETS[size])
+                results = [
+                    self._bench(endpoint, shape, call, repeat)
+                    for endpoint, shape, call in self._cases(data)
+                ]
+                report['datasets'].append({
+                    'size': size,
+                    'params': IV_DATASET_PRESETS[size],
+                    'counts': data['counts'],
+                    'results': results,
+                })
+                for row in results:
+                    _logger.info(
+                        "[IV BENCH] %-6s %-36s %-22s frío %.3fs/%s q · caliente %.3fs/%s q · %s filas",
+                        size, row['endpoint'], row['shape'], row['cold_time'],
+                        row['cold_sql_count'], row['warm_median_time'],
+                        row['warm_sql_count'], row['rows_returned'])
+            finally:
+                savepoint.close(rollback=True)
+                self.env.invalidate_all()
+
+        path = os.environ.get('IV_BENCH_REPORT') or os.path.join(
+            tempfile.gettempdir(), 'iv_benchmark_%s.json' % self.env.cr.dbname)
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2, ensure_ascii=False)
+        _logger.info("[IV BENCH] Reporte: %s", path)
+
+        self.assertTrue(report['datasets'], "IV_BENCH_SIZES no trae ningún tamaño válido")
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Regresión de N+1: el número de consultas SQL de los puntos de entrada
+del Inventario Visual NO debe crecer con el número de quants.
+
+Se arman dos datasets con la MISMA forma (productos, bloques, proporción
+de formatos / tránsito / ventas / apartados / entregas) y distinto número
+de placas por bloque: el grande trae ~5x quants. Cada endpoint se corre
+una vez para calentar las cachés del registro (ACL, parámetros,
+ir.model.fields), se vacía la caché del ORM y se cuentan las consultas de
+la segunda corrida. El grande puede costar a lo más _SLACK consultas más
+que el chico: una consulta por quant (el N+1 de siempre) rebasa eso por
+decenas.
+
+    odoo-bin -d <base_de_prueba> -i inventory_visual_enhanced \\
+        --test-tags /inventory_visual_enhanced:iv_query_count --stop-after-init
+"""
+from odoo.tests import tagged
+
+from .common import IvSyntheticDataCase
+
+# Holgura para ramas que dependen de los datos (p. ej. un origin que sí
+# resuelve orden en un dataset y en el otro no), no para consultas por quant.
+_SLACK = 3
+
+_SHAPE = {
+    'products': 2, 'blocks_per_product': 2,
+    'formato_ratio': 0.2, 'transit_ratio': 0.1,
+}
+
+
+@tagged('post_install', '-at_install', 'iv_query_count')
+class TestInventoryVisualQueryCounts(IvSyntheticDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.small = cls._iv_build_dataset(
+            prefix='IVQS', lots_per_block=4, pending_moves=2, sale_lines=2,
+            holds=2, delivered=2, packing_rows=8, **_SHAPE)
+        cls.large = cls._iv_build_dataset(
+            prefix='IVQL', lots_per_block=20, pending_moves=10, sale_lines=10,
+            holds=10, delivered=10, packing_rows=80, **_SHAPE)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _count_queries(self, call):
+        call()
+        self.env.invalidate_all()
+        before = self.env.cr.sql_log_count
+        result = call()
+        return self.env.cr.sql_log_count - before, result
+
+    def _assert_constant(self, label, call_for):
+        """call_for(data) -> callable; compara chico contra grande."""
+        small_count, small_result = self._count_queries(call_for(self.small))
+        large_count, large_result = self._count_queries(call_for(self.large))
+        self.assertLessEqual(
+            large_count, small_count + _SLACK,
+            "%s: %s consultas con %s quants vs %s con %s (¿N+1?)" % (
+                label, large_count, self.large['counts']['quants'],
+                small_count, self.small['counts']['quants']))
+        return small_result, large_result
+
+    def _quants(self, data, usage):
+        return self.Quant.search([
+            ('lot_id', 'in', data['lots'].ids),
+            ('location_id.usage', '=', usage),
+            ('quantity', '>', 0),
+        ])
+
+    # ------------------------------------------------------------------
+    # Pruebas
+    # ------------------------------------------------------------------
+
+    def test_grouped_search(self):
+        small, large = self._assert_constant(
+            'get_inventory_grouped_by_product',
+            lambda data: lambda: self.Quant.get_inventory_grouped_by_product(
+                {'product_name': data['prefix']}))
+        self.assertEqual(len(small['products']), _SHAPE['products'])
+        self.assertEqual(len(large['products']), _SHAPE['products'])
+
+        self._assert_constant(
+            'get_inventory_grouped_by_product (tránsito)',
+            lambda data: lambda: self.Quant.get_inventory_grouped_by_product(
+                {'product_name': data['prefix'], 'stock_mode': 'transit'}))
+
+    def test_quant_details_internal(self):
+        small, large = self._assert_constant(
+            'get_quant_details (interno)',
+            lambda data: lambda: self.Quant.get_quant_details(
+                self._quants(data, 'internal').ids))
+        self.assertGreater(len(large), len(small))
+        # Las ventas y entregas pendientes del dataset SÍ se detectan.
+        self.assertTrue(any(row['en_orden_venta'] for row in large))
+
+    def test_quant_details_transit(self):
+        for data in (self.small, self.large):
+            self.assertTrue(
+                self._quants(data, 'transit'),
+                "%s: el dataset no trae quants en tránsito" % data['prefix'])
+        self._assert_constant(
+            'get_quant_details (tránsito)',
+            lambda data: lambda: self.Quant.get_quant_details(
+                self._quants(data, 'transit').ids))
+
+    def test_packing_list_override(self):
+        # Con el módulo de packing list instalado el renglón, el viaje y el
+        # embarque se resuelven en lote (_iv_batch_packing_context); sin él,
+        # el override sale antes de buscar nada. En ambos casos, constante.
+        small, large = self._assert_constant(
+            'get_quant_details (packing list)',
+            lambda data: lambda: self.Quant.get_quant_details(
+                (self._quants(data, 'internal') | self._quants(data, 'transit')).ids))
+        for row in small + large:
+            self.assertIn('has_packing_list', row)
+        packing_rows = self.large['packing_rows']
+        if packing_rows and 'numero_placa' in packing_rows._fields \
+                and any(packing_rows.mapped('numero_placa')):
+            # Los renglones del dataset SÍ se encuentran por número de placa.
+            self.assertTrue(any(row['packing_row_id'] for row in large))
+
+    def test_walkthrough_details(self):
+        def call_for(data):
+            keys = [
+                self.Quant._walkthrough_exit_key(lot, self.customer_location)
+                for lot in data['delivered_lots']
+            ]
+            return lambda: self.Quant.get_walkthrough_details(keys)
+
+        small, large = self._assert_constant('get_walkthrough_details', call_for)
+        self.assertEqual(len(small), len(self.small['delivered_lots']))
+        self.assertEqual(len(large), len(self.large['delivered_lots']))
+        # El ícono de foto del bloque se lee de block_has_photo, igual que en
+        # el detalle del inventario.
+        for row in small + large:
+            self.assertIsInstance(row.get('block_has_photo'), bool)
@@ -7,11 +7,26 @@ dígitos) y los atributos que normalmente se capturan en recepción
 Cada lote nace con su quant en la ubicación elegida: si trae cantidad,
 se aplica como ajuste de inventario (trazable); con cantidad 0 el quant
 queda listo para capturar la contada en la lista y Aplicar.
-"""
-import re
 
+La creación vive en som.formato.lot.job (un solo ajuste para toda la
+corrida); las corridas grandes se van a segundo plano.
+"""
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
+from odoo.tools import sql
+from odoo.addons.inventory_visual_enhanced.models.som_formato_lot_job import _SYNC_MAX_LOTS
+
+# Tope de una corrida (en segundo plano arriba de _SYNC_MAX_LOTS).
+_MAX_LOTS = 10000
+
+# Serie de un nombre de lote "PREFIJO-NNN" (o solo "NNN", prefijo ''):
+# prefijo y consecutivo como expresiones de un índice parcial de stock_lot,
+# así el siguiente número es un max() sobre el índice, exacto sin importar
+# el tamaño de la serie. Índice y consulta usan EXACTAMENTE estos textos
+# (si no, PostgreSQL no lo reconoce).
+_SERIES_WHERE = r"name ~ '^(.+-)?[0-9]+$'"
+_SERIES_PREFIX = r"COALESCE(substring(name from '^(.+)-[0-9]+$'), '')"
+_SERIES_NUMBER = r"(substring(name from '([0-9]+)$'))::numeric"
 
 
 class SomFormatoLotCreate(models.TransientModel):
@@ -36,7 +51,10 @@ class SomFormatoLotCreate(models.TransientModel):
              'Vacío = solo el número.')
     next_number = fields.Integer(string='Número inicial', default=1, required=True)
     padding = fields.Integer(string='Dígitos', default=2, required=True)
-    lot_count = fields.Integer(string='Lotes a crear', default=1, required=True)
+    lot_count = fields.Integer(
+        string='Lotes a crear', default=1, required=True,
+        help='Hasta %s lotes se crean al momento; más se procesan en segundo '
+             'plano y se avisa al terminar.' % _SYNC_MAX_LOTS)
     name_preview = fields.Char(
         string='Se crearán', compute='_compute_name_preview')
 
@@ -67,37 +85,44 @@ class SomFormatoLotCreate(models.TransientModel):
                 last = wiz._format_name(wiz.next_number + count - 1)
                 wiz.name_preview = '%s … %s (%s lotes)' % (first, last, count)
 
+    def init(self):
+        super().init()
+        sql.create_index(
+            self.env.cr, 'stock_lot_iv_series_idx', 'stock_lot',
+            ['product_id', _SERIES_PREFIX, _SERIES_NUMBER], where=_SERIES_WHERE)
+
     @api.onchange('prefix', 'product_id')
     def _onchange_suggest_next_number(self):
         """Sugiere el consecutivo siguiente de la serie para el producto:
-        busca los lotes existentes que siguen el patrón y continúa."""
+        el mayor número de los lotes que siguen el patrón, más uno."""
         for wiz in self:
             if not wiz.product_id:
                 continue
-            prefix = (wiz.prefix or '').strip()
-            domain = [('product_id', '=', wiz.product_id.id)]
-            if prefix:
-                domain.append(('name', '=like', prefix + '-%'))
-            lots = self.env['stock.lot'].with_context(
-                active_test=False).search(domain, order='id desc', limit=1000)
-            pattern = (
-                re.compile(r'^%s-(\d+)$' % re.escape(prefix))
-                if prefix else re.compile(r'^(\d+)$')
-            )
-            best = 0
-            for lot in lots:
-                match = pattern.match(lot.name or '')
-                if match:
-                    best = max(best, int(match.group(1)))
-            wiz.next_number = best + 1
+            wiz.next_number = wiz._iv_series_max(
+                wiz.product_id.id, (wiz.prefix or '').strip()) + 1
+
+    def _iv_series_max(self, product_id, prefix):
+        """Mayor consecutivo de la serie `prefix` del producto (0 si no
+        hay), con stock_lot_iv_series_idx. Incluye lotes archivados y
+        respeta las compañías permitidas, como el search que reemplaza."""
+        self.env['stock.lot'].flush_model(['name', 'product_id', 'company_id'])
+        self.env.cr.execute(
+            "SELECT MAX(" + _SERIES_NUMBER + ") FROM stock_lot"
+            " WHERE " + _SERIES_WHERE +
+            " AND product_id = %s AND " + _SERIES_PREFIX + " = %s"
+            " AND (company_id IS NULL OR company_id = ANY(%s))",
+            (product_id, prefix, self.env.companies.ids),
+        )
+        best = self.env.cr.fetchone()[0]
+        return int(best) if best else 0
 
     def action_create_lots(self):
         self.ensure_one()
 
         if self.lot_count <= 0:
             raise UserError(_('Indica cuántos lotes crear.'))
-        if self.lot_count > 500:
-            raise UserError(_('Máximo 500 lotes por corrida.'))
+        if self.lot_count > _MAX_LOTS:
+            raise UserError(_('Máximo %s lotes por corrida.') % _MAX_LOTS)
         if self.next_number <= 0:
             raise UserError(_('El número inicial debe ser mayor a cero.'))
         if self.qty_per_lot < 0:
@@ -117,37 +142,31 @@ class SomFormatoLotCreate(models.TransientModel):
                 'Ajusta la serie o el número inicial.'
             ) % ', '.join(sorted(existing.mapped('name'))))
 
-        company = self.env.company
         Lot = self.env['stock.lot']
-        lot_vals_list = []
-        for name in names:
-            vals = {
-                'name': name,
-                'product_id': self.product_id.id,
-                'company_id': company.id,
+        lot_values = {}
+        if 'x_tipo' in Lot._fields:
+            lot_values['x_tipo'] = 'formato'
+        for fname in ('x_bloque', 'x_grosor', 'x_fecha_lote',
+                      'x_contenedor', 'x_pedimento',
+                      'x_referencia_proveedor'):
+            value = self[fname]
+            if value and fname in Lot._fields:
+                lot_values[fname] = fields.Date.to_string(value) if fname == 'x_fecha_lote' else value
+
+        Job = self.env['som.formato.lot.job']
+        if len(names) > _SYNC_MAX_LOTS:
+            job = Job._iv_enqueue(
+                self.product_id, self.location_id, self.qty_per_lot, names, lot_values)
+            return {
+                'type': 'ir.actions.act_window',
+                'res_model': 'som.formato.lot.job',
+                'res_id': job.id,
+                'view_mode': 'form',
+                'target': 'current',
             }
-            if 'x_tipo' in Lot._fields:
-                vals['x_tipo'] = 'formato'
-            for fname in ('x_bloque', 'x_grosor', 'x_fecha_lote',
-                          'x_contenedor', 'x_pedimento',
-                          'x_referencia_proveedor'):
-                value = self[fname]
-                if value and fname in Lot._fields:
-                    vals[fname] = value
-            lot_vals_list.append(vals)
-
-        lots = Lot.create(lot_vals_list)
-
-        Quant = self.env['stock.quant'].with_context(inventory_mode=True)
-        for lot in lots:
-            quant = Quant.create({
-                'product_id': self.product_id.id,
-                'lot_id': lot.id,
-                'location_id': self.location_id.id,
-                'inventory_quantity': self.qty_per_lot or 0.0,
-            })
-            if self.qty_per_lot > 0:
-                quant.action_apply_inventory()
+
+        lots = Job._iv_create_formato_lots(
+            self.product_id, self.location_id, self.qty_per_lot, names, lot_values)
 
         # Regresa a Ajustes de Formatos mostrando SOLO lo recién creado.
         action = self.env['ir.actions.act_window']._for_xml_id(